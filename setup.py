@@ -28,7 +28,8 @@ setuptools.setup(
     test_suite="tests",
     install_requires=[
         "numpy",
-        "jupyter"
+        "jupyter",
+        "PyOpenGL"
     ],
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,25 @@
+# author: Kaan Eraslan
+# scenes shared by the culling, bvh and picking tests
+
+import numpy as np
+
+from tutorials.utils.culling import frustumPlanes
+from tutorials.utils.transform import lookAtMatrices
+from tutorials.utils.transform import perspectiveMatrices
+
+
+def randomBoxes(size: int, seed=0, spread=30.0, maxHalfSize=2.0):
+    "mins and maxs of (size, 3) boxes centered in [-spread, spread]"
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-spread, spread, (size, 3))
+    halfSizes = rng.uniform(0.1, maxHalfSize, (size, 3))
+    return ((centers - halfSizes).astype(np.float32),
+            (centers + halfSizes).astype(np.float32))
+
+
+def cameraPlanes(position=(0.0, 0.0, 10.0), target=(0.0, 0.0, 0.0),
+                 aspect=4.0 / 3.0, zFar=50.0):
+    "frustum planes of a 45 degree camera looking at target"
+    view = lookAtMatrices(position, target, [0.0, 1.0, 0.0])[0]
+    projection = perspectiveMatrices(45.0, aspect, 0.1, zFar)[0]
+    return frustumPlanes(projection @ view)
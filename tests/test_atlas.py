@@ -0,0 +1,85 @@
+# author: Kaan Eraslan
+# rectangle packing of texture atlases
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide2")
+
+from tutorials.utils.atlas import SkylinePacker
+from tutorials.utils.atlas import TextureAtlas
+from tutorials.utils.atlas import nextPowerOfTwo
+from tutorials.utils.atlas import packRectangles
+
+
+def assertPacked(width: int, height: int, sizes, positions):
+    "rectangles inside the bin without overlaps"
+    sizes = np.asarray(sizes)
+    assert np.all(positions >= 0)
+    assert np.all(positions[:, 0] + sizes[:, 0] <= width)
+    assert np.all(positions[:, 1] + sizes[:, 1] <= height)
+    covered = np.zeros((height, width), dtype=np.int64)
+    for (x, y), (w, h) in zip(positions, sizes):
+        covered[y:y + h, x:x + w] += 1
+    assert covered.max() <= 1
+    assert covered.sum() == int((sizes[:, 0] * sizes[:, 1]).sum())
+
+
+def test_next_power_of_two():
+    assert [nextPowerOfTwo(v) for v in (1, 2, 3, 64, 65)] == [
+        1, 2, 4, 64, 128]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_rectangles_do_not_overlap(seed):
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, 100, (int(rng.integers(1, 80)), 2))
+    width, height, positions = packRectangles(sizes)
+    assert width == nextPowerOfTwo(width)
+    assert height == nextPowerOfTwo(height)
+    assert width * height >= int((sizes[:, 0] * sizes[:, 1]).sum())
+    assertPacked(width, height, sizes, positions)
+
+
+def test_same_sized_rectangles_fill_the_bin():
+    sizes = np.full((16, 2), 32)
+    width, height, positions = packRectangles(sizes)
+    assert (width, height) == (128, 128)
+    assertPacked(width, height, sizes, positions)
+
+
+def test_full_packer():
+    packer = SkylinePacker(8, 8)
+    assert packer.insert(8, 6) == (0, 0)
+    assert packer.insert(4, 2) == (0, 6)
+    assert packer.insert(4, 2) == (4, 6)
+    assert packer.insert(1, 1) is None
+    assert packer.skyline == [(0, 8, 8)]
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        packRectangles(np.empty((0, 2)))
+    with pytest.raises(ValueError):
+        packRectangles([[0, 4]])
+    with pytest.raises(ValueError):
+        packRectangles([[64, 64], [64, 64]], maxSize=64)
+
+
+def test_atlas_uvs_point_at_images():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (h, w, 4), dtype=np.uint8)
+              for h, w in [(16, 16), (5, 30), (40, 8)]]
+    atlas = TextureAtlas(images, padding=2)
+    for index, image in enumerate(images):
+        u, v = atlas.remapUVs(np.array([[0.0, 0.0]]), index)[0]
+        x = int(round(u * atlas.width))
+        y = int(round(v * atlas.height))
+        height, width = image.shape[:2]
+        assert np.array_equal(atlas.pixels[y:y + height, x:x + width],
+                              image)
+        # padding repeats the edge
+        assert np.array_equal(atlas.pixels[y - 2, x:x + width], image[0])
+        u, v = atlas.remapUVs(np.array([[1.0, 1.0]]), index)[0]
+        assert np.isclose(u * atlas.width, x + width)
+        assert np.isclose(v * atlas.height, y + height)
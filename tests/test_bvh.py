@@ -0,0 +1,107 @@
+# author: Kaan Eraslan
+# bounding volume hierarchy queries against brute force
+
+import numpy as np
+import pytest
+
+from tutorials.utils.bvh import BVH
+from tutorials.utils.bvh import expandRanges
+from tutorials.utils.bvh import inverseDirections
+from tutorials.utils.bvh import mortonCodes
+from tutorials.utils.bvh import rayBoxDistances
+from tutorials.utils.culling import aabbVisibility
+
+from tests.helpers import cameraPlanes
+from tests.helpers import randomBoxes
+
+
+SIZES = [0, 1, 9, 1000]
+
+
+def bruteForceRays(origins, directions, mins, maxs):
+    "nearest box of each ray testing every box"
+    if mins.shape[0] == 0:
+        return (np.full(origins.shape[0], -1),
+                np.full(origins.shape[0], np.inf, dtype=np.float32))
+    distances = rayBoxDistances(origins[:, np.newaxis],
+                                inverseDirections(directions)[:, np.newaxis],
+                                mins[np.newaxis], maxs[np.newaxis])
+    hits = np.argmin(distances, axis=1)
+    nearest = distances[np.arange(origins.shape[0]), hits]
+    hits[np.isinf(nearest)] = -1
+    return hits, nearest
+
+
+def test_expand_ranges():
+    starts = np.array([0, 5, 7, 9])
+    ends = np.array([2, 5, 10, 8])
+    assert expandRanges(starts, ends).tolist() == [0, 1, 7, 8, 9]
+    assert expandRanges(starts[:0], ends[:0]).size == 0
+
+
+def test_morton_codes_follow_axes():
+    points = np.array([[0, 0, 0], [0, 0, 1], [0, 1, 0], [1, 0, 0]],
+                      dtype=np.float32)
+    codes = mortonCodes(points)
+    assert codes[0] == 0
+    assert codes[1] < codes[2] < codes[3]
+    assert mortonCodes(np.empty((0, 3))).size == 0
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_frustum_query_matches_brute_force(size):
+    mins, maxs = randomBoxes(size)
+    bvh = BVH(mins, maxs, leafSize=4)
+    for position, target in [([0.0, 0.0, 40.0], [0.0, 0.0, 0.0]),
+                             ([25.0, 10.0, -5.0], [-10.0, 0.0, 5.0]),
+                             ([0.0, 0.0, 0.0], [0.0, 0.0, -1.0])]:
+        planes = cameraPlanes(position, target)
+        expected = aabbVisibility(planes, mins, maxs)
+        found = bvh.queryFrustum(planes)
+        # every visible box exactly once
+        assert np.unique(found).size == found.size
+        assert np.array_equal(np.sort(found), np.flatnonzero(expected))
+        assert np.array_equal(bvh.frustumMask(planes), expected)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_ray_query_matches_brute_force(size):
+    mins, maxs = randomBoxes(size, seed=1)
+    bvh = BVH(mins, maxs)
+    rng = np.random.default_rng(2)
+    origins = rng.uniform(-40.0, 40.0, (200, 3)).astype(np.float32)
+    # aim at boxes so that most rays hit something
+    targets = (rng.uniform(-30.0, 30.0, (200, 3)) if size == 0 else
+               ((mins + maxs) * 0.5)[rng.integers(0, size, 200)])
+    directions = (targets - origins).astype(np.float32)
+    # axis aligned rays have zero direction components
+    directions[::10, :2] = 0.0
+    hits, distances = bvh.queryRays(origins, directions)
+    expectedHits, expectedDistances = bruteForceRays(origins, directions,
+                                                     mins, maxs)
+    assert np.array_equal(hits == -1, expectedHits == -1)
+    assert np.allclose(distances, expectedDistances)
+    # overlapping boxes may tie, the chosen box should be as near
+    hit = hits >= 0
+    chosen = rayBoxDistances(origins[hit], inverseDirections(directions[hit]),
+                             mins[hits[hit]], maxs[hits[hit]])
+    assert np.allclose(chosen, expectedDistances[hit])
+
+
+def test_refit_after_moving():
+    mins, maxs = randomBoxes(1000, seed=3)
+    bvh = BVH(mins, maxs)
+    offset = np.random.default_rng(4).uniform(-5.0, 5.0, (1000, 3))
+    mins = (mins + offset).astype(np.float32)
+    maxs = (maxs + offset).astype(np.float32)
+    bvh.refit(mins, maxs)
+    planes = cameraPlanes([0.0, 0.0, 40.0], [0.0, 0.0, 0.0])
+    assert np.array_equal(bvh.frustumMask(planes),
+                          aabbVisibility(planes, mins, maxs))
+
+
+def test_refit_needs_same_count():
+    mins, maxs = randomBoxes(10)
+    bvh = BVH(mins, maxs)
+    with pytest.raises(ValueError):
+        bvh.refit(mins[:5], maxs[:5])
@@ -0,0 +1,82 @@
+# author: Kaan Eraslan
+# cached camera matrices against freshly computed ones
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide2")
+
+from tutorials.utils.camera import CameraCore
+from tutorials.utils.quaternion import fromAxisAngle
+from tutorials.utils.transform import batchMatMul
+from tutorials.utils.transform import lookAtMatrices
+from tutorials.utils.transform import perspectiveMatrices
+from tutorials.utils.utils import normalize_tuple
+
+
+def assertMatches(camera: CameraCore):
+    "cached matrices equal matrices computed from the camera state"
+    view = lookAtMatrices(camera.position, camera.position + camera.front,
+                          camera.up)[0]
+    projection = perspectiveMatrices(camera.zoom, camera.aspect,
+                                     camera.zNear, camera.zFar)[0]
+    assert np.allclose(camera.getViewArray(), view, atol=1e-5)
+    assert np.allclose(camera.getProjectionArray(), projection, rtol=1e-5)
+    assert np.allclose(camera.getViewProjectionArray(),
+                       batchMatMul(projection, view), atol=1e-4)
+
+
+def test_matrices_follow_every_change():
+    camera = CameraCore()
+    camera.movementSensitivity = 1.0
+    assertMatches(camera)
+    camera.setPosition(1.0, 2.0, 3.0)
+    assertMatches(camera)
+    for direction in camera.availableMoves:
+        camera.move(direction, 0.3)
+        assertMatches(camera)
+    camera.moveLocal(2.0, -1.0)
+    assertMatches(camera)
+    camera.lookAround(25.0, -10.0, True)
+    assertMatches(camera)
+    camera.setPerspective(16.0 / 9.0, 0.5, 50.0)
+    assertMatches(camera)
+    camera.zoomInOut(5.0)
+    assertMatches(camera)
+
+
+def test_matrices_follow_quaternion_turns():
+    camera = CameraCore()
+    camera.movementSensitivity = 1.0
+    camera.setQuaternionMode(True)
+    assertMatches(camera)
+    for _ in range(5):
+        camera.lookAround(30.0, 12.0, True)
+        camera.move("forward", 0.5)
+        assertMatches(camera)
+    camera.setOrientation(fromAxisAngle(40.0, [0.0, 1.0, 0.0]))
+    assertMatches(camera)
+
+
+def test_unchanged_camera_returns_cached_matrices():
+    camera = CameraCore()
+    camera.setPosition(0.0, 1.0, 5.0)
+    viewProjection = camera.getViewProjectionArray()
+    expected = viewProjection.copy()
+    assert not camera.viewDirty and not camera.projectionDirty
+    assert camera.getViewProjectionArray() is viewProjection
+    assert np.array_equal(camera.getViewProjectionArray(), expected)
+    assert camera.getViewMatrix() is camera.getViewMatrix()
+    assert camera.getViewProjectionMatrix() is \
+        camera.getViewProjectionMatrix()
+    # a change drops the cached qt matrices
+    viewQt = camera.getViewMatrix()
+    camera.move("forward", 1.0)
+    assert camera.viewDirty
+    assert camera.getViewMatrix() is not viewQt
+    assert not np.array_equal(camera.getViewProjectionArray(), expected)
+
+
+def test_normalize_tuple():
+    assert normalize_tuple((3.0, 0.0, 4.0)) == (0.6, 0.0, 0.8)
+    assert normalize_tuple((0.0, 0.0, 0.0)) == (0.0, 0.0, 0.0)
@@ -0,0 +1,79 @@
+# author: Kaan Eraslan
+# frustum culling against a corner by corner reference
+
+import numpy as np
+
+from tutorials.utils.culling import aabbFrustumTest
+from tutorials.utils.culling import aabbInsideFrustum
+from tutorials.utils.culling import aabbVisibility
+from tutorials.utils.culling import sphereVisibility
+
+from tests.helpers import cameraPlanes
+from tests.helpers import randomBoxes
+
+
+def cornerDistances(planes: np.ndarray, mins: np.ndarray, maxs: np.ndarray):
+    "(N, 6, 8) signed distances of box corners to the planes"
+    corners = np.stack([np.where([i & 1, i & 2, i & 4], maxs, mins)
+                        for i in range(8)], axis=1).astype(np.float64)
+    planes = planes.astype(np.float64)
+    return (np.einsum("ncj,pj->npc", corners, planes[:, :3]) +
+            planes[:, 3][np.newaxis, :, np.newaxis])
+
+
+def test_planes_are_normalized_and_face_inside():
+    planes = cameraPlanes()
+    assert planes.shape == (6, 4)
+    assert np.allclose(np.linalg.norm(planes[:, :3], axis=1), 1.0)
+    # the camera target is inside every plane
+    assert np.all(planes[:, 3] > 0)
+
+
+def test_aabb_masks_match_corner_reference():
+    planes = cameraPlanes()
+    mins, maxs = randomBoxes(2000, maxHalfSize=3.0)
+    distances = cornerDistances(planes, mins, maxs)
+    farthest = distances.max(axis=2)
+    nearest = distances.min(axis=2)
+    # boxes within rounding of a plane may go either way
+    clear = ((np.abs(farthest) > 1e-3).all(axis=1) &
+             (np.abs(nearest) > 1e-3).all(axis=1))
+    touching = (farthest >= 0).all(axis=1)
+    inside = (nearest >= 0).all(axis=1)
+    assert touching.any() and inside.any() and not touching.all()
+    visible = aabbVisibility(planes, mins, maxs)
+    contained = aabbInsideFrustum(planes, mins, maxs)
+    assert np.array_equal(visible[clear], touching[clear])
+    assert np.array_equal(contained[clear], inside[clear])
+
+
+def test_single_pass_matches_separate_tests():
+    planes = cameraPlanes()
+    mins, maxs = randomBoxes(500, seed=1)
+    touching, inside = aabbFrustumTest(planes, mins, maxs)
+    assert np.array_equal(touching, aabbVisibility(planes, mins, maxs))
+    assert np.array_equal(inside, aabbInsideFrustum(planes, mins, maxs))
+    assert not np.any(inside & ~touching)
+
+
+def test_spheres():
+    planes = cameraPlanes()
+    centers = np.array([[0.0, 0.0, 0.0],     # in front of the camera
+                        [0.0, 0.0, 20.0],    # behind it
+                        [0.0, 0.0, 10.5],    # behind, reaching the near plane
+                        [0.0, 0.0, -45.0]],  # crossing the far plane
+                       dtype=np.float32)
+    radii = np.array([1.0, 1.0, 1.0, 10.0], dtype=np.float32)
+    assert sphereVisibility(planes, centers, radii).tolist() == [
+        True, False, True, True]
+    # without radius only the first center is inside
+    assert sphereVisibility(planes, centers, 0.0).tolist() == [
+        True, False, False, False]
+
+
+def test_empty_input():
+    planes = cameraPlanes()
+    empty = np.empty((0, 3), dtype=np.float32)
+    assert aabbVisibility(planes, empty, empty).shape == (0,)
+    touching, inside = aabbFrustumTest(planes, empty, empty)
+    assert touching.shape == inside.shape == (0,)
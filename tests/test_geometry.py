@@ -0,0 +1,141 @@
+# author: Kaan Eraslan
+# free list allocation and geometry pool churn
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide2")
+pytest.importorskip("OpenGL")
+
+from tutorials.utils.geometry import FreeListAllocator
+from tutorials.utils.geometry import GeometryPool
+from tutorials.utils.vertexlayout import VertexLayout
+
+
+def assertTiled(allocator: FreeListAllocator):
+    "free and live ranges cover the space once, free ones are merged"
+    ranges = sorted([(offset, size, False) for offset, size in
+                     zip(allocator.offsets, allocator.sizes)] +
+                    [(offset, size, True) for offset, size in
+                     allocator.used.items()])
+    end = 0
+    previousUsed = True
+    for offset, size, used in ranges:
+        assert offset == end
+        assert size > 0
+        # two free ranges next to each other should have been merged
+        assert used or previousUsed
+        end = offset + size
+        previousUsed = used
+    assert end == allocator.capacity
+    assert allocator.offsets == sorted(allocator.offsets)
+
+
+def test_allocate_first_fit():
+    allocator = FreeListAllocator(10)
+    assert allocator.allocate(4) == 0
+    assert allocator.allocate(4) == 4
+    assert allocator.allocate(4) is None
+    allocator.free(0)
+    assert allocator.allocate(2) == 0
+    assert allocator.allocate(2) == 2
+    assert allocator.allocate(2) == 8
+    assert allocator.freeSize() == 0
+    with pytest.raises(ValueError):
+        allocator.allocate(0)
+
+
+def test_random_allocations_stay_tiled():
+    rng = np.random.default_rng(0)
+    allocator = FreeListAllocator(1000)
+    live = {}
+    for step in range(5000):
+        if live and rng.random() < 0.45:
+            offset = int(rng.choice(list(live)))
+            allocator.free(offset)
+            del live[offset]
+        else:
+            size = int(rng.integers(1, 60))
+            offset = allocator.allocate(size)
+            if offset is None:
+                assert allocator.largestFree() < size
+                if rng.random() < 0.1:
+                    allocator.grow(allocator.capacity + 200)
+                continue
+            # no overlap with live ranges
+            for other, otherSize in live.items():
+                assert offset + size <= other or other + otherSize <= offset
+            live[offset] = size
+        assertTiled(allocator)
+        assert allocator.used == live
+        assert allocator.usedSize() + allocator.freeSize() == \
+            allocator.capacity
+        assert 0.0 <= allocator.fragmentation() < 1.0
+
+
+def test_reset_packs_ranges():
+    allocator = FreeListAllocator(100)
+    allocator.reset({0: 10, 10: 30})
+    assertTiled(allocator)
+    assert allocator.allocate(60) == 40
+    with pytest.raises(ValueError):
+        allocator.reset({0: 101})
+
+
+def test_pool_churn_keeps_meshes():
+    """
+    Meshes added and removed without a context.
+
+    The buffers are not created so only the cpu copies are updated, they
+    are what gets uploaded
+    """
+    layout = VertexLayout([("aPos", np.float32, 3)])
+    pool = GeometryPool(layout, vertexCapacity=64, indexCapacity=96)
+    rng = np.random.default_rng(1)
+    meshes = {}  # handle: (positions, indices)
+    for step in range(400):
+        if meshes and rng.random() < 0.4:
+            handle = list(meshes)[int(rng.integers(len(meshes)))]
+            pool.remove(handle)
+            del meshes[handle]
+            continue
+        vertexCount = int(rng.integers(1, 40))
+        positions = rng.normal(size=(vertexCount, 3)).astype(np.float32)
+        indices = None
+        if rng.random() < 0.7:
+            indices = rng.integers(0, vertexCount, int(rng.integers(1, 60)))
+        vertices = np.zeros(vertexCount, dtype=layout.dtype)
+        vertices["aPos"] = positions
+        handle = pool.add(vertices, indices)
+        meshes[handle] = (positions, indices)
+        if step % 50 == 0:
+            pool.defragment()
+        # every live mesh is where its handle says, even after moves
+        for mesh, (meshPositions, meshIndices) in meshes.items():
+            start = mesh.baseVertex
+            assert np.array_equal(
+                pool.vertices["aPos"][start:start + mesh.vertexCount],
+                meshPositions)
+            if meshIndices is None:
+                assert mesh.indexCount == 0
+                continue
+            start = mesh.firstIndex
+            assert np.array_equal(
+                pool.indices[start:start + mesh.indexCount], meshIndices)
+        assertTiled(pool.vertexAllocator)
+        assertTiled(pool.indexAllocator)
+        assert pool.stats()["meshes"] == len(meshes)
+    pool.defragment()
+    assert pool.vertexAllocator.fragmentation() == 0.0
+    assert pool.indexAllocator.fragmentation() == 0.0
+
+
+def test_pool_rejects_bad_indices():
+    layout = VertexLayout([("aPos", np.float32, 3)])
+    pool = GeometryPool(layout, vertexCapacity=8, indexCapacity=8)
+    vertices = np.zeros(3, dtype=layout.dtype)
+    with pytest.raises(ValueError):
+        pool.add(vertices, [0, 1, 3])
+    handle = pool.add(vertices)
+    with pytest.raises(ValueError):
+        pool.commands([handle])
@@ -0,0 +1,72 @@
+# author: Kaan Eraslan
+# mip chains built on the cpu
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide2")
+
+from tutorials.utils.mipmaps import buildMipChain
+from tutorials.utils.mipmaps import mipLevelCount
+from tutorials.utils.mipmaps import resampleWeights
+from tutorials.utils.mipmaps import resize
+
+
+def randomImage(height: int, width: int, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+
+def test_level_count():
+    assert mipLevelCount(1, 1) == 1
+    assert mipLevelCount(256, 256) == 9
+    assert mipLevelCount(300, 20) == 9
+    assert mipLevelCount(1, 1024) == 11
+
+
+@pytest.mark.parametrize("filterName", ["box", "lanczos"])
+@pytest.mark.parametrize("height, width", [(64, 64), (37, 100), (1, 9)])
+def test_chain_sizes(filterName, height, width):
+    levels = buildMipChain(randomImage(height, width), filterName)
+    assert len(levels) == mipLevelCount(width, height)
+    for level, pixels in enumerate(levels):
+        assert pixels.dtype == np.uint8
+        assert pixels.shape == (max(1, height >> level),
+                                max(1, width >> level), 4)
+    assert levels[-1].shape == (1, 1, 4)
+
+
+def test_box_is_the_mean_of_2x2_blocks():
+    image = randomImage(16, 16)
+    level = buildMipChain(image, "box")[1]
+    blocks = image.astype(np.float64).reshape(8, 2, 8, 2, 4).mean(
+        axis=(1, 3))
+    assert np.abs(level.astype(np.float64) - blocks).max() <= 0.5 + 1e-6
+
+
+@pytest.mark.parametrize("filterName", ["box", "lanczos"])
+def test_constant_image_stays_constant(filterName):
+    image = np.empty((40, 24, 4), dtype=np.uint8)
+    image[:] = (10, 200, 128, 255)
+    for pixels in buildMipChain(image, filterName):
+        assert np.all(pixels == (10, 200, 128, 255))
+
+
+@pytest.mark.parametrize("filterName", ["box", "lanczos"])
+def test_weights_sum_to_one(filterName):
+    for size, newSize in [(64, 32), (7, 3), (5, 11), (1, 1)]:
+        indices, weights = resampleWeights(size, newSize, filterName)
+        assert indices.min() >= 0 and indices.max() < size
+        assert np.allclose(weights.sum(axis=1), 1.0, atol=1e-6)
+
+
+def test_resize():
+    image = randomImage(30, 20)
+    assert resize(image, 20, 30).shape == (30, 20, 4)
+    assert np.array_equal(resize(image, 20, 30), image)
+    assert resize(image, 64, 8, "box").shape == (8, 64, 4)
+
+
+def test_unknown_filter():
+    with pytest.raises(ValueError):
+        buildMipChain(randomImage(4, 4), "bicubic")
@@ -0,0 +1,67 @@
+# author: Kaan Eraslan
+# ray picking of boxes
+
+import numpy as np
+
+from tutorials.utils.bvh import inverseDirections
+from tutorials.utils.bvh import rayBoxDistances
+from tutorials.utils.picking import RayPicker
+from tutorials.utils.picking import cursorRay
+from tutorials.utils.transform import lookAtMatrices
+from tutorials.utils.transform import perspectiveMatrices
+
+from tests.helpers import randomBoxes
+
+
+def test_distances_match_slab_test():
+    rng = np.random.default_rng(1)
+    for trial in range(100):
+        mins, maxs = randomBoxes(int(rng.integers(1, 200)), seed=trial,
+                                 spread=10.0)
+        origin = rng.uniform(-15.0, 15.0, 3).astype(np.float32)
+        direction = rng.normal(size=3).astype(np.float32)
+        if trial % 3 == 0:
+            # parallel to a slab
+            direction[trial % 2] = 0.0
+        picker = RayPicker(mins, maxs)
+        expected = rayBoxDistances(origin[np.newaxis],
+                                   inverseDirections(direction), mins, maxs)
+        assert np.allclose(picker.distances(origin, direction), expected,
+                           rtol=1e-5, atol=1e-5)
+
+
+def test_pick_nearest():
+    mins = np.array([[-1, -1, -10], [-1, -1, -5], [5, 5, -5]],
+                    dtype=np.float32)
+    maxs = mins + 2.0
+    picker = RayPicker(mins, maxs)
+    index, distance = picker.pick([0.0, 0.0, 0.0], [0.0, 0.0, -1.0])
+    assert index == 1
+    assert np.isclose(distance, 3.0)
+    # starting inside a box hits it at once
+    index, distance = picker.pick([0.0, 0.0, -9.0], [0.0, 0.0, 1.0])
+    assert index == 0
+    assert distance == 0.0
+
+
+def test_pick_miss_and_empty():
+    mins, maxs = randomBoxes(50, spread=10.0)
+    picker = RayPicker(mins, maxs)
+    assert picker.pick([0.0, 100.0, 0.0], [0.0, 1.0, 0.0]) == (-1, np.inf)
+    assert RayPicker().pick([0.0, 0.0, 0.0], [1.0, 0.0, 0.0]) == (-1, np.inf)
+
+
+def test_cursor_ray_through_screen_center():
+    position = np.array([3.0, 2.0, 10.0], dtype=np.float32)
+    view = lookAtMatrices(position, [0.0, 0.0, 0.0], [0.0, 1.0, 0.0])[0]
+    projection = perspectiveMatrices(45.0, 800 / 600, 0.1, 100.0)[0]
+    origin, direction = cursorRay(400, 300, 800, 600,
+                                  np.linalg.inv(projection @ view))
+    front = -position / np.linalg.norm(position)
+    assert np.allclose(direction, front, atol=1e-4)
+    # the ray starts on the near plane
+    assert np.isclose(np.dot(origin - position, front), 0.1, atol=1e-3)
+    # a cursor above the center points higher
+    _, upper = cursorRay(400, 100, 800, 600,
+                         np.linalg.inv(projection @ view))
+    assert upper[1] > direction[1]
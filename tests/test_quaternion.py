@@ -0,0 +1,96 @@
+# author: Kaan Eraslan
+# batched quaternions against rotation matrices
+
+import numpy as np
+
+from tutorials.utils.quaternion import conjugateQuaternions
+from tutorials.utils.quaternion import fromAxisAngle
+from tutorials.utils.quaternion import fromYawPitch
+from tutorials.utils.quaternion import identityQuaternions
+from tutorials.utils.quaternion import multiplyQuaternions
+from tutorials.utils.quaternion import normalizeQuaternions
+from tutorials.utils.quaternion import quaternionMatrices
+from tutorials.utils.quaternion import rotateVectors
+from tutorials.utils.quaternion import slerp
+from tutorials.utils.transform import rotateMatrices
+
+
+def randomRotations(size: int, seed=0):
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(-180.0, 180.0, size).astype(np.float32)
+    axes = rng.normal(size=(size, 3)).astype(np.float32)
+    return angles, axes
+
+
+def test_matrices_match_rotate_matrices():
+    angles, axes = randomRotations(100)
+    quats = fromAxisAngle(angles, axes)
+    assert np.allclose(np.linalg.norm(quats, axis=1), 1.0, atol=1e-6)
+    assert np.allclose(quaternionMatrices(quats),
+                       rotateMatrices(angles, axes), atol=1e-5)
+
+
+def test_rotate_vectors_matches_matrices():
+    angles, axes = randomRotations(100, seed=1)
+    quats = fromAxisAngle(angles, axes)
+    vecs = np.random.default_rng(2).normal(size=(100, 3)).astype(np.float32)
+    expected = np.einsum("nij,nj->ni", quaternionMatrices(quats)[:, :3, :3],
+                         vecs)
+    assert np.allclose(rotateVectors(quats, vecs), expected, atol=1e-5)
+
+
+def test_right_hand_rule():
+    quat = fromAxisAngle(90.0, [0.0, 0.0, 1.0])
+    assert np.allclose(rotateVectors(quat, [1.0, 0.0, 0.0]),
+                       [[0.0, 1.0, 0.0]], atol=1e-6)
+
+
+def test_product_applies_right_operand_first():
+    angles, axes = randomRotations(50, seed=3)
+    quats1 = fromAxisAngle(angles, axes)
+    quats2 = fromAxisAngle(angles[::-1], axes[::-1])
+    product = multiplyQuaternions(quats1, quats2)
+    expected = np.matmul(quaternionMatrices(quats1),
+                         quaternionMatrices(quats2))
+    assert np.allclose(quaternionMatrices(product), expected, atol=1e-5)
+
+
+def test_conjugate_inverts():
+    angles, axes = randomRotations(20, seed=4)
+    quats = fromAxisAngle(angles, axes)
+    product = multiplyQuaternions(quats, conjugateQuaternions(quats))
+    assert np.allclose(product, identityQuaternions(20), atol=1e-6)
+
+
+def test_normalize_keeps_zero_rows():
+    quats = np.array([[2.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]])
+    assert np.allclose(normalizeQuaternions(quats),
+                       [[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0]])
+
+
+def test_slerp():
+    start = fromAxisAngle(0.0, [0.0, 1.0, 0.0])
+    end = fromAxisAngle(90.0, [0.0, 1.0, 0.0])
+    assert np.allclose(slerp(start, end, 0.0), start, atol=1e-6)
+    assert np.allclose(slerp(start, end, 1.0), end, atol=1e-6)
+    assert np.allclose(slerp(start, end, [0.5, 0.25]),
+                       fromAxisAngle([45.0, 22.5], [0.0, 1.0, 0.0]),
+                       atol=1e-6)
+    # -end is the same rotation, the shortest arc is taken
+    assert np.allclose(slerp(start, -end, 0.5),
+                       fromAxisAngle(45.0, [0.0, 1.0, 0.0]), atol=1e-6)
+    # nearly equal quaternions
+    near = fromAxisAngle(0.01, [0.0, 1.0, 0.0])
+    assert np.allclose(np.linalg.norm(slerp(start, near, 0.5)), 1.0)
+
+
+def test_yaw_pitch_front_vector():
+    yaws = np.array([0.0, -90.0, 30.0, 120.0], dtype=np.float32)
+    pitches = np.array([0.0, 0.0, 20.0, -45.0], dtype=np.float32)
+    fronts = rotateVectors(fromYawPitch(yaws, pitches), [1.0, 0.0, 0.0])
+    yaws = np.radians(yaws)
+    pitches = np.radians(pitches)
+    expected = np.stack([np.cos(yaws) * np.cos(pitches),
+                         np.sin(pitches),
+                         np.sin(yaws) * np.cos(pitches)], axis=1)
+    assert np.allclose(fronts, expected, atol=1e-6)
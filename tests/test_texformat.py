@@ -0,0 +1,98 @@
+# author: Kaan Eraslan
+# gltex files written and read back
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PySide2")
+
+from tutorials.utils.mipmaps import buildMipChain
+from tutorials.utils.texformat import ALIGNMENT
+from tutorials.utils.texformat import HEADER
+from tutorials.utils.texformat import loadTexture
+from tutorials.utils.texformat import readTexture
+from tutorials.utils.texformat import texturePath
+from tutorials.utils.texformat import writeTexture
+
+
+def randomLevels(height: int, width: int, filterName="box"):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    return buildMipChain(image, filterName)
+
+
+def writeImage(tmp_path, levels, filterName="box"):
+    "fake image file and its gltex file, the gltex one is newer"
+    imagePath = str(tmp_path / "image.png")
+    with open(imagePath, "wb") as f:
+        f.write(b"not decoded by these tests")
+    path = texturePath(imagePath)
+    writeTexture(path, levels, filterName)
+    stat = os.stat(imagePath)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    return imagePath, path
+
+
+@pytest.mark.parametrize("height, width", [(32, 32), (13, 50), (1, 1)])
+def test_round_trip(tmp_path, height, width):
+    levels = randomLevels(height, width)
+    path = str(tmp_path / "texture.gltex")
+    writeTexture(path, levels, "lanczos")
+    readLevels, filterName = readTexture(path)
+    assert filterName == "lanczos"
+    assert len(readLevels) == len(levels)
+    for written, read in zip(levels, readLevels):
+        assert read.shape == written.shape
+        assert np.array_equal(read, written)
+    assert os.path.getsize(path) % ALIGNMENT == 0
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_levels_are_read_only_views(tmp_path):
+    path = str(tmp_path / "texture.gltex")
+    writeTexture(path, randomLevels(8, 8), "box")
+    levels, _ = readTexture(path)
+    with pytest.raises(ValueError):
+        levels[0][0, 0, 0] = 1
+
+
+def test_load_up_to_date_file(tmp_path):
+    levels = randomLevels(16, 8)
+    imagePath, _ = writeImage(tmp_path, levels)
+    loaded = loadTexture(imagePath, "box")
+    assert len(loaded) == len(levels)
+    assert np.array_equal(loaded[-1], levels[-1])
+    # without a filter only the base level is needed
+    assert len(loadTexture(imagePath)) == 1
+    # a chain built with another filter is not reused
+    assert loadTexture(imagePath, "lanczos") is None
+
+
+def test_stale_or_missing_file_is_ignored(tmp_path):
+    imagePath, path = writeImage(tmp_path, randomLevels(4, 4))
+    stat = os.stat(path)
+    os.utime(imagePath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert loadTexture(imagePath, "box") is None
+    os.remove(path)
+    assert loadTexture(imagePath, "box") is None
+
+
+def test_corrupt_files(tmp_path):
+    path = str(tmp_path / "texture.gltex")
+    writeTexture(path, randomLevels(16, 16), "box")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:len(data) // 2])
+    with pytest.raises(ValueError):
+        readTexture(path)
+    with open(path, "wb") as f:
+        f.write(b"PNG!" + data[4:])
+    with pytest.raises(ValueError):
+        readTexture(path)
+    with open(path, "wb") as f:
+        f.write(data[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        readTexture(path)
@@ -0,0 +1,114 @@
+# author: Kaan Eraslan
+# batched transformation matrices against the single matrix functions
+
+import numpy as np
+import pytest
+
+from tutorials.utils.transform import affineInverse
+from tutorials.utils.transform import batchInverse
+from tutorials.utils.transform import batchMatMul
+from tutorials.utils.transform import lookAtMatrices
+from tutorials.utils.transform import perspectiveMatrices
+from tutorials.utils.transform import rotateMatrices
+from tutorials.utils.transform import toColumnMajor
+from tutorials.utils.transform import translateMatrices
+
+
+def randomCameras(size: int, seed=0):
+    "positions, targets and world ups of cameras"
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-20.0, 20.0, (size, 3))
+    targets = rng.uniform(-20.0, 20.0, (size, 3))
+    worldUps = np.tile([0.0, 1.0, 0.0], (size, 1))
+    return positions, targets, worldUps
+
+
+def glmLookAt(eye, center, up):
+    "glm::lookAt written out, transposed to row major"
+    f = (center - eye) / np.linalg.norm(center - eye)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    result = np.identity(4)
+    result[0, :3] = s
+    result[1, :3] = u
+    result[2, :3] = -f
+    result[0, 3] = -np.dot(s, eye)
+    result[1, 3] = -np.dot(u, eye)
+    result[2, 3] = np.dot(f, eye)
+    return result
+
+
+def test_look_at_matches_glm():
+    positions, targets, worldUps = randomCameras(50)
+    mats = lookAtMatrices(positions, targets, worldUps)
+    assert mats.shape == (50, 4, 4) and mats.dtype == np.float32
+    for mat, position, target, worldUp in zip(mats, positions, targets,
+                                              worldUps):
+        assert np.allclose(mat, glmLookAt(position, target, worldUp),
+                           atol=1e-4)
+    # the camera position goes to the origin, the target in front of it
+    eye = mats[0] @ np.append(positions[0], 1.0)
+    assert np.allclose(eye[:3], 0.0, atol=1e-4)
+    ahead = mats[0] @ np.append(targets[0], 1.0)
+    assert np.allclose(ahead[:2], 0.0, atol=1e-3) and ahead[2] < 0
+
+
+def test_look_at_matches_single_matrix_functions():
+    pytest.importorskip("PySide2")
+    from tutorials.utils.utils import computeLookAtMatrixNp
+    from tutorials.utils.utils import computeLookAtPure
+    positions, targets, worldUps = randomCameras(20, seed=1)
+    mats = lookAtMatrices(positions, targets, worldUps)
+    for mat, position, target, worldUp in zip(mats, positions, targets,
+                                              worldUps):
+        assert np.allclose(
+            mat, computeLookAtMatrixNp(position, target, worldUp),
+            atol=1e-4)
+        assert np.allclose(
+            mat, np.array(computeLookAtPure(tuple(position), tuple(target),
+                                            tuple(worldUp))),
+            atol=1e-4)
+
+
+def test_perspective_matches_single_matrix_function():
+    pytest.importorskip("PySide2")
+    from tutorials.utils.utils import computePerspectiveNp
+    fieldOfViews = np.array([30.0, 45.0, 90.0])
+    aspects = np.array([1.0, 4.0 / 3.0, 16.0 / 9.0])
+    mats = perspectiveMatrices(fieldOfViews, aspects, 0.1, 100.0)
+    for mat, fieldOfView, aspect in zip(mats, fieldOfViews, aspects):
+        assert np.allclose(
+            mat, computePerspectiveNp(fieldOfView, aspect, 0.1, 100.0),
+            rtol=1e-5)
+
+
+def test_perspective_maps_near_and_far_planes():
+    mat = perspectiveMatrices(60.0, 1.5, 0.5, 50.0)[0]
+    near = mat @ np.array([0.0, 0.0, -0.5, 1.0])
+    far = mat @ np.array([0.0, 0.0, -50.0, 1.0])
+    assert np.isclose(near[2] / near[3], -1.0, atol=1e-5)
+    assert np.isclose(far[2] / far[3], 1.0, atol=1e-5)
+
+
+def test_inverses_match_linalg():
+    rng = np.random.default_rng(2)
+    angles = rng.uniform(-180.0, 180.0, 30)
+    axes = rng.normal(size=(30, 3))
+    models = batchMatMul(translateMatrices(rng.uniform(-5.0, 5.0, (30, 3))),
+                         rotateMatrices(angles, axes))
+    expected = np.linalg.inv(models.astype(np.float64))
+    assert np.allclose(batchInverse(models), expected, atol=1e-5)
+    assert np.allclose(affineInverse(models), expected, atol=1e-5)
+    views = lookAtMatrices(*randomCameras(30, seed=3))
+    assert np.allclose(affineInverse(views),
+                       np.linalg.inv(views.astype(np.float64)), atol=1e-4)
+    # a single matrix is a batch of one
+    assert affineInverse(models[0]).shape == (1, 4, 4)
+
+
+def test_column_major():
+    mats = translateMatrices([[1.0, 2.0, 3.0]])
+    columns = toColumnMajor(mats)
+    assert columns.flags["C_CONTIGUOUS"]
+    assert columns.reshape(-1)[12:15].tolist() == [1.0, 2.0, 3.0]
@@ -0,0 +1,44 @@
+# author: Kaan Eraslan
+# uploads skipped by the uniform cache
+
+import pytest
+
+pytest.importorskip("OpenGL")
+
+from tutorials.utils.uniforms import UniformCache
+
+
+class RecordingProgram:
+    "program recording uploads instead of calling opengl"
+
+    def __init__(self):
+        self.uploads = []
+
+    def setUniformValue(self, location, value):
+        self.uploads.append((location, value))
+
+
+def makeCache(monkeypatch):
+    monkeypatch.setattr(UniformCache, "resolve", lambda self: None)
+    cache = UniformCache(RecordingProgram())
+    cache.locations = {"scale": 0, "flag": 1}
+    return cache
+
+
+def test_equal_values_are_skipped(monkeypatch):
+    cache = makeCache(monkeypatch)
+    assert cache.setUniformValue("scale", 0.5)
+    assert not cache.setUniformValue("scale", 0.5)
+    assert cache.setUniformValue("scale", 0.25)
+    assert not cache.setUniformValue("missing", 1.0)
+    assert cache.stats() == {"uploads": 2, "avoided": 1}
+
+
+def test_equal_values_of_another_type_are_uploaded(monkeypatch):
+    cache = makeCache(monkeypatch)
+    assert cache.setUniformValue("flag", True)
+    assert cache.setUniformValue("flag", 1)
+    assert cache.setUniformValue("flag", 1.0)
+    assert not cache.setUniformValue("flag", 1.0)
+    uploaded = [type(value) for _, value in cache.program.uploads]
+    assert uploaded == [bool, int, float]
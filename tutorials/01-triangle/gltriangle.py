@@ -8,7 +8,6 @@ import ctypes
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLContext
 from PySide2.QtGui import QVector4D
 
@@ -20,6 +19,7 @@ from PySide2.QtCore import QCoreApplication
 
 from PySide2.shiboken2 import VoidPtr
 
+
 try:
     from OpenGL import GL as pygl
 except ImportError:
@@ -32,6 +32,11 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.buffers import allocateArray
+
 
 class TriangleGL(QOpenGLWidget):
     def __init__(self, parent=None):
@@ -52,6 +57,7 @@ class TriangleGL(QOpenGLWidget):
             } for name in availableShaders
         }
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
 
         # opengl data related
         self.context = QOpenGLContext()
@@ -66,41 +72,14 @@ class TriangleGL(QOpenGLWidget):
              0.0, 0.5, 0.0],  # x, y, z
             dtype=ctypes.c_float
         )
+        # how the vertex data is laid out in the buffer, here a single
+        # attribute of 3 floats at location 0 of the vertex shader
+        self.vertexLayout = VertexLayout([("aPos", np.float32, 3)])
         # triangle color
         self.triangleColor = QVector4D(0.5, 0.5, 0.0, 0.0)  # yellow triangle
         # notice the correspondance the vec4 of fragment shader 
         # and our choice here
 
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
-        else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
-
     def getGlInfo(self):
         "Get opengl info"
         info = """
@@ -129,20 +108,18 @@ class TriangleGL(QOpenGLWidget):
         funcs.glClearColor(1, 1, 1, 1)
 
         # deal with shaders
+        # the shader cache compiles the vertex and fragment shaders, binds
+        # the attribute locations and links them into a program the first
+        # time. Later starts reuse the linked program binary stored on disk
+        # as long as shader sources and driver stay the same.
         shaderName = "triangle"
-        vshader = self.loadVertexShader(shaderName)
-        fshader = self.loadFragmentShader(shaderName)
-
-        # creating shader program
-        self.program = QOpenGLShaderProgram(self.context)
-        self.program.addShader(vshader)  # adding vertex shader
-        self.program.addShader(fshader)  # adding fragment shader
-
-        # bind attribute to a location
-        self.program.bindAttributeLocation("aPos", 0)
-
-        # link shader program
-        isLinked = self.program.link()
+        self.program = self.shaderCache.loadProgram(
+            self.context,
+            self.shaders[shaderName],
+            # bind attribute to a location
+            attrLocs=self.vertexLayout.attributeLocations(),
+            glInfo=self.getGlInfo())
+        isLinked = self.program.isLinked()
         print("shader program is linked: ", isLinked)
 
         # bind the program
@@ -171,19 +148,12 @@ class TriangleGL(QOpenGLWidget):
         print('vao created: ', isVao)
         print('vbo created: ', isVbo)
 
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
         # allocate space on buffer
-        self.vbo.allocate(self.vertexData.tobytes(),
-                          floatSize * self.vertexData.size)
-        funcs.glEnableVertexAttribArray(0)
-        nullptr = VoidPtr(0)
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    3 * floatSize,
-                                    nullptr)
+        allocateArray(self.vbo, self.vertexData, np.float32)
+        # enable the attributes and tell where they are in the buffer:
+        # location, number of components, type, stride and offset all
+        # come from the vertex layout
+        self.vertexLayout.setupAttributes(funcs)
         self.vbo.release()
         self.program.release()
         vaoBinder = None
@@ -213,6 +183,7 @@ class TriangleGL(QOpenGLWidget):
         self.program.bind()
         funcs.glDrawArrays(pygl.GL_TRIANGLES,  # mode
                            0,  # first
-                           3)  # count
+                           self.vertexLayout.vertexCount(
+                               self.vertexData))  # count
         self.program.release()
         vaoBinder = None
@@ -8,7 +8,6 @@ import ctypes
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLContext
 from PySide2.QtGui import QVector4D
 
@@ -33,6 +32,12 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.buffers import IndexBuffer
+from tutorials.utils.buffers import allocateArray
+
 
 class RectangleGL(QOpenGLWidget):
     "Texture loading opengl widget"
@@ -54,12 +59,14 @@ class RectangleGL(QOpenGLWidget):
             } for name in availableShaders
         }
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
 
         # opengl data related
         self.context = QOpenGLContext()
         self.program = QOpenGLShaderProgram()
         self.vao = QOpenGLVertexArrayObject()
         self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.indexBuffer = IndexBuffer()
         self.indices = np.array([
             0, 1, 3,  # first triangle
             1, 2, 3  # second triangle
@@ -73,39 +80,10 @@ class RectangleGL(QOpenGLWidget):
             -0.5, -0.5, 0.0,  # bottom left
             -0.5, 0.5,  0.0,  # top left
         ], dtype=ctypes.c_float)
+        self.vertexLayout = VertexLayout([("aPos", np.float32, 3)])
 
         self.rectColor = QVector4D(0.0, 1.0, 1.0, 0.0)
 
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
-        else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
-
     def getGlInfo(self):
         "Get opengl info"
         info = """
@@ -127,6 +105,7 @@ class RectangleGL(QOpenGLWidget):
         del self.program
         self.program = None
         self.vbo.release()
+        self.indexBuffer.destroy()
         self.doneCurrent()
 
     def resizeGL(self, width: int, height: int):
@@ -147,21 +126,14 @@ class RectangleGL(QOpenGLWidget):
         funcs.initializeOpenGLFunctions()
         funcs.glClearColor(1, 1, 1, 1)
 
-        # shader
+        # shader program, compiled once then loaded from shader cache
         shaderName = "triangle"
-        vshader = self.loadVertexShader(shaderName)
-        fshader = self.loadFragmentShader(shaderName)
-
-        # create shader program
-        self.program = QOpenGLShaderProgram(self.context)
-        self.program.addShader(vshader)
-        self.program.addShader(fshader)
-
-        # bind attribute location
-        self.program.bindAttributeLocation("aPos", 0)
-
-        # link shader program
-        isLinked = self.program.link()
+        self.program = self.shaderCache.loadProgram(
+            self.context,
+            self.shaders[shaderName],
+            attrLocs=self.vertexLayout.attributeLocations(),
+            glInfo=self.getGlInfo())
+        isLinked = self.program.isLinked()
         print("shader program is linked: ", isLinked)
 
         # activate shader program to set uniform an attribute values
@@ -182,11 +154,8 @@ class RectangleGL(QOpenGLWidget):
         isVbo = self.vbo.create()
         isVboBound = self.vbo.bind()
 
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
         # allocate vbo
-        self.vbo.allocate(self.vertexData.tobytes(),
-                          floatSize * self.vertexData.size)
+        allocateArray(self.vbo, self.vertexData, np.float32)
 
         print("vao created: ", isVao)
         print("vbo created: ", isVbo)
@@ -194,14 +163,14 @@ class RectangleGL(QOpenGLWidget):
 
         # dealing with attributes
         # vertex array position
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    3 * floatSize,
-                                    VoidPtr(0))
-        funcs.glEnableVertexAttribArray(0)
-        
+        self.vertexLayout.setupAttributes(funcs)
+
+        # upload indices once, the vao remembers the index buffer
+        self.indexBuffer.create()
+        self.indexBuffer.setIndices(self.indices,
+                                    vertexCount=self.vertexLayout.vertexCount(
+                                        self.vertexData))
+
         self.vbo.release()
         vaoBinder = None
 
@@ -216,11 +185,6 @@ class RectangleGL(QOpenGLWidget):
         self.program.bind()
 
         # draw stuff
-        funcs.glDrawElements(
-            pygl.GL_TRIANGLES,
-            self.indices.size,
-            pygl.GL_UNSIGNED_INT,
-            self.indices.tobytes())
-            # VoidPtr(self.indices.tobytes() * ctypes.sizeof(ctypes.c_uint)))
+        self.indexBuffer.draw(funcs, pygl.GL_TRIANGLES)
         vaoBinder = None
         self.program.release()
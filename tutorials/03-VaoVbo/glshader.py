@@ -8,7 +8,6 @@ import ctypes
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLContext
 from PySide2.QtGui import QVector4D
 
@@ -20,6 +19,7 @@ from PySide2.QtCore import QCoreApplication
 
 from PySide2.shiboken2 import VoidPtr
 
+
 try:
     from OpenGL import GL as pygl
 except ImportError:
@@ -32,6 +32,12 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.vertexlayout import VertexArrayCache
+from tutorials.utils.geometry import GeometryPool
+
 
 class TriangleGL(QOpenGLWidget):
     def __init__(self, parent=None):
@@ -50,13 +56,12 @@ class TriangleGL(QOpenGLWidget):
             } for name in availableShaders
         }
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
 
         # opengl data related
         self.context = QOpenGLContext()
-        self.vao1 = QOpenGLVertexArrayObject()
-        self.vbo1 = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
-        self.vao2 = QOpenGLVertexArrayObject()
-        self.vbo2 = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.vao = None
+        self.vertexArrays = VertexArrayCache()
 
         self.program1 = QOpenGLShaderProgram()
         self.program2 = QOpenGLShaderProgram()
@@ -74,41 +79,19 @@ class TriangleGL(QOpenGLWidget):
              -0.7, -0.9, 0.0],  # x, y, z
             dtype=ctypes.c_float
         )
+        self.vertexLayout = VertexLayout([("aPos", np.float32, 3)])
+        # both triangles live in the same buffers and are drawn from a
+        # single vao, each one with its own base vertex
+        self.geometry = GeometryPool(self.vertexLayout,
+                                     vertexCapacity=1024,
+                                     indexCapacity=1024)
+        self.triangle1 = self.geometry.add(self.vertexData1)
+        self.triangle2 = self.geometry.add(self.vertexData2)
         # triangle color
         self.triangleColor1 = QVector4D(1.0, 0.0, 0.0, 0.0)  # yellow triangle
         self.triangleColor2 = QVector4D(
             0.0, 0.0, 0.5, 0.0)  # not yellow triangle
 
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
-        else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
-
     def getGlInfo(self):
         "Get opengl info"
         info = """
@@ -139,19 +122,13 @@ class TriangleGL(QOpenGLWidget):
         # deal with shaders
         # first shader
         shaderName = "triangle"
-        vshader = self.loadVertexShader(shaderName)
-        fshader = self.loadFragmentShader(shaderName)
-
-        # creating shader program
-        self.program1 = QOpenGLShaderProgram(self.context)
-        self.program1.addShader(vshader)  # adding vertex shader
-        self.program1.addShader(fshader)  # adding fragment shader
-
-        # bind attribute to a location
-        self.program1.bindAttributeLocation("aPos", 0)
-
-        # link shader program1
-        isLinked = self.program1.link()
+        glInfo = self.getGlInfo()
+        self.program1 = self.shaderCache.loadProgram(
+            self.context,
+            self.shaders[shaderName],
+            attrLocs=self.vertexLayout.attributeLocations(),
+            glInfo=glInfo)
+        isLinked = self.program1.isLinked()
         print("shader program1 is linked: ", isLinked)
 
         # bind the program1
@@ -164,19 +141,12 @@ class TriangleGL(QOpenGLWidget):
 
         # second shader
         shaderName = "triangle2"
-        vshader = self.loadVertexShader(shaderName)
-        fshader = self.loadFragmentShader(shaderName)
-
-        #
-        self.program2 = QOpenGLShaderProgram(self.context)
-        self.program2.addShader(vshader)  # adding vertex shader
-        self.program2.addShader(fshader)  # adding fragment shader
-
-        # bind attribute to a location
-        self.program2.bindAttributeLocation("aPos", 0)
-
-        # link shader program2
-        isLinked = self.program2.link()
+        self.program2 = self.shaderCache.loadProgram(
+            self.context,
+            self.shaders[shaderName],
+            attrLocs=self.vertexLayout.attributeLocations(),
+            glInfo=glInfo)
+        isLinked = self.program2.isLinked()
         print("shader program2 is linked: ", isLinked)
 
         # bind the program2
@@ -187,75 +157,24 @@ class TriangleGL(QOpenGLWidget):
         self.program2.setUniformValue(colorLoc,
                                       self.triangleColor2)
 
-        # self.useShader("triangle")
-
         # deal with vao and vbo
-
-        # create vao and vbo
-
-        # vao
-        isVao = self.vao1.create()
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao1)
-
-        # vbo
-        isVbo = self.vbo1.create()
-        isBound = self.vbo1.bind()
-
-        # check if vao and vbo are created
-        print('vao created: ', isVao)
-        print('vbo created: ', isVbo)
-
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
-        # allocate space on buffer
-        self.vbo1.allocate(self.vertexData1.tobytes(),
-                           floatSize * self.vertexData1.size)
-        funcs.glEnableVertexAttribArray(0)
-        nullptr = VoidPtr(0)
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    3 * floatSize,
-                                    nullptr)
-        self.vbo1.release()
-        vaoBinder = None
-
-        # second triangle vao vbo
-        # vao
-        isVao = self.vao2.create()
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao2)
-
-        # vbo
-        isVbo = self.vbo2.create()
-        isBound = self.vbo2.bind()
-
-        # check if vao and vbo are created
-        print('vao created: ', isVao)
-        print('vbo created: ', isVbo)
-
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
-        # allocate space on buffer
-        self.vbo2.allocate(self.vertexData2.tobytes(),
-                           floatSize * self.vertexData2.size)
-        funcs.glEnableVertexAttribArray(0)
-        nullptr = VoidPtr(0)
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    3 * floatSize,
-                                    nullptr)
-        self.vbo2.release()
+        # the pool uploads every mesh to its shared buffers
+        isVbo = self.geometry.create()
+        print('geometry buffers created: ', isVbo)
+        self.vao = self.vertexArrays.get(funcs,
+                                         self.geometry.bindings(),
+                                         self.geometry.indexBuffer)
         self.program2.release()
 
     def cleanUpGl(self):
         "Clean up everything"
         self.context.makeCurrent()
-        self.vbo.destroy()
-        del self.program
-        self.program = None
+        self.geometry.destroy()
+        self.vertexArrays.destroy()
+        del self.program1
+        del self.program2
+        self.program1 = None
+        self.program2 = None
         self.doneCurrent()
 
     def resizeGL(self, width: int, height: int):
@@ -271,17 +190,12 @@ class TriangleGL(QOpenGLWidget):
         funcs.glClear(pygl.GL_COLOR_BUFFER_BIT)
 
         # actual drawing
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao1)
+        # one vao for both triangles, only the program changes
+        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao)
         self.program1.bind()
-        funcs.glDrawArrays(pygl.GL_TRIANGLES,  # mode
-                           0,  # first
-                           3)  # count
-        vaoBinder = None
+        self.geometry.draw(funcs, self.triangle1, pygl.GL_TRIANGLES)
         self.program1.release()
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao2)
         self.program2.bind()
-        funcs.glDrawArrays(pygl.GL_TRIANGLES,  # mode
-                           0,  # first
-                           3)  # count
-        vaoBinder = None
+        self.geometry.draw(funcs, self.triangle2, pygl.GL_TRIANGLES)
         self.program2.release()
+        vaoBinder = None
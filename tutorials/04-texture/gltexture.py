@@ -10,7 +10,6 @@ from PySide2.QtGui import QImage
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLTexture
 from PySide2.QtGui import QOpenGLContext
 
@@ -36,6 +35,15 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.textures import sharedTextureManager
+from tutorials.utils.assets import sharedAssetLoader
+from tutorials.utils.buffers import IndexBuffer
+from tutorials.utils.buffers import allocateArray
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.vertexlayout import VertexArrayCache
+
 
 class TextureGL(QOpenGLWidget):
     "Texture loading opengl widget"
@@ -58,16 +66,24 @@ class TextureGL(QOpenGLWidget):
         }
         imdir = os.path.join(mediaDir, "images")
         imFName = "im"
-        imageFile = os.path.join(imdir, imFName + "0.png")
-        self.image = QImage(imageFile).mirrored()
+        self.imageFile = os.path.join(imdir, imFName + "0.png")
+        # images are decoded and uploaded once per share group
+        self.textures = sharedTextureManager()
+        # decoding starts now on worker threads
+        self.assets = sharedAssetLoader()
+        self.assets.request(self.imageFile)
+        self.assets.imageReady.connect(self.imageReady)
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
 
         # opengl data related
         self.context = QOpenGLContext()
         self.program = QOpenGLShaderProgram()
-        self.vao = QOpenGLVertexArrayObject()
+        self.vao = None
+        self.vertexArrays = VertexArrayCache()
         self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
         self.texture = None
+        self.indexBuffer = IndexBuffer()
         self.indices = np.array([
             0, 1, 3,  # first triangle
             1, 2, 3  # second triangle
@@ -81,36 +97,10 @@ class TextureGL(QOpenGLWidget):
             -0.5, -0.5, 0.0, 0.0, 0.0,  # bottom left
             -0.5, 0.5,  0.0, 0.0, 1.0  # top left
         ], dtype=ctypes.c_float)
-
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
-        else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
+        self.vertexLayout = VertexLayout([
+            ("aPos", np.float32, 3),  # viewport position
+            ("aTexCoord", np.float32, 2)  # texture coords
+        ])
 
     def getGlInfo(self):
         "Get opengl info"
@@ -129,10 +119,14 @@ class TextureGL(QOpenGLWidget):
 
     def cleanUpGl(self):
         "Clean up everything"
+        # the loader is shared and outlives the widget
+        self.assets.imageReady.disconnect(self.imageReady)
         self.context.makeCurrent()
         del self.program
         self.program = None
-        self.texture.release()
+        self.textures.release(self.texture)
+        self.indexBuffer.destroy()
+        self.vertexArrays.destroy()
         self.doneCurrent()
 
     def resizeGL(self, width: int, height: int):
@@ -153,22 +147,14 @@ class TextureGL(QOpenGLWidget):
         funcs.initializeOpenGLFunctions()
         funcs.glClearColor(1, 0, 1, 1)
 
-        # shader
+        # shader program, compiled once then loaded from shader cache
         shaderName = "texture"
-        vshader = self.loadVertexShader(shaderName)
-        fshader = self.loadFragmentShader(shaderName)
-
-        # create shader program
-        self.program = QOpenGLShaderProgram(self.context)
-        self.program.addShader(vshader)
-        self.program.addShader(fshader)
-
-        # bind attribute location
-        self.program.bindAttributeLocation("aPos", 0)
-        self.program.bindAttributeLocation("aTexCoord", 1)
-
-        # link shader program
-        isLinked = self.program.link()
+        self.program = self.shaderCache.loadProgram(
+            self.context,
+            self.shaders[shaderName],
+            attrLocs=self.vertexLayout.attributeLocations(),
+            glInfo=self.getGlInfo())
+        isLinked = self.program.isLinked()
         print("shader program is linked: ", isLinked)
 
         # activate shader program to set uniform an attribute values
@@ -179,52 +165,45 @@ class TextureGL(QOpenGLWidget):
         isVbo = self.vbo.create()
         isVboBound = self.vbo.bind()
 
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
         # allocate vbo
-        self.vbo.allocate(self.vertexData.tobytes(),
-                          floatSize * self.vertexData.size)
+        allocateArray(self.vbo, self.vertexData, np.float32)
+        self.vbo.release()
+
+        # upload indices once
+        self.indexBuffer.create()
+        self.indexBuffer.setIndices(
+            self.indices,
+            vertexCount=self.vertexLayout.vertexCount(self.vertexData))
+
+        # attributes and index buffer are recorded once in a vao
+        self.vao = self.vertexArrays.get(funcs,
+                                         [(self.vertexLayout, self.vbo)],
+                                         self.indexBuffer)
 
         # texture new school
-        self.texture = QOpenGLTexture(QOpenGLTexture.Target2D)
-        self.texture.create()
-        # new school
-        self.texture.bind()
-        self.texture.setData(self.image)
-        self.texture.setMinMagFilters(QOpenGLTexture.Linear,
-                                      QOpenGLTexture.Linear)
-        self.texture.setWrapMode(QOpenGLTexture.DirectionS,
-                                 QOpenGLTexture.Repeat)
-        self.texture.setWrapMode(QOpenGLTexture.DirectionT,
-                                 QOpenGLTexture.Repeat)
+        self.texture = self.textures.acquire(self.imageFile,
+                                             QOpenGLTexture.Linear,
+                                             QOpenGLTexture.Linear,
+                                             QOpenGLTexture.Repeat,
+                                             loader=self.assets)
+
+    def imageReady(self, path: str):
+        "an image is decoded, it is uploaded in the next frame"
+        self.update()
 
     def paintGL(self):
         "paint gl"
         funcs = self.context.functions()
+        # replace placeholders with decoded images
+        self.textures.uploadPending(self.assets)
         # clean up what was drawn
         funcs.glClear(pygl.GL_COLOR_BUFFER_BIT)
 
         self.program.bind()
-        self.program.enableAttributeArray(0)
-        self.program.enableAttributeArray(1)
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
-        # set attribute values
-        self.program.setAttributeBuffer(0,  # viewport position
-                                        pygl.GL_FLOAT,  # coord type
-                                        0,  # offset
-                                        3,
-                                        5 * floatSize
-                                        )
-        self.program.setAttributeBuffer(1,  # viewport position
-                                        pygl.GL_FLOAT,  # coord type
-                                        3 * floatSize,  # offset
-                                        2,
-                                        5 * floatSize
-                                        )
+        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao)
+
         # bind texture
         self.texture.bind()
-        funcs.glDrawElements(pygl.GL_TRIANGLES,
-                             self.indices.size, pygl.GL_UNSIGNED_INT,
-                             self.indices.tobytes())
+        self.indexBuffer.draw(funcs, pygl.GL_TRIANGLES)
+        vaoBinder = None
         # funcs.glDrawArrays(pygl.GL_TRIANGLES, 0, 6)
@@ -5,17 +5,12 @@ import numpy as np
 import os
 import sys
 import ctypes
-from tutorials.utils.camera import QtCamera
-from tutorials.utils.utils import computePerspectiveNp
-from tutorials.utils.utils import computePerspectiveQt
-from tutorials.utils.utils import arr2qmat
 
 from PySide2.QtGui import QVector3D
 from PySide2.QtGui import QImage
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLContext
 from PySide2.QtGui import QOpenGLTexture
 from PySide2.QtGui import QMatrix4x4
@@ -43,6 +38,25 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.camera import QtCamera
+from tutorials.utils.utils import computePerspectiveNp
+from tutorials.utils.utils import computePerspectiveQt
+from tutorials.utils.utils import arr2qmat
+from tutorials.utils.utils import vecs2arr
+from tutorials.utils.transform import translateMatrices
+from tutorials.utils.transform import rotateMatrices
+from tutorials.utils.transform import batchMatMul
+from tutorials.utils.instancing import InstanceBuffer
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.vertexlayout import VertexArrayCache
+from tutorials.utils.buffers import allocateArray
+from tutorials.utils.glstate import GLStateCache
+from tutorials.utils.uniforms import UniformCache
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.textures import sharedTextureManager
+from tutorials.utils.assets import sharedAssetLoader
+
 
 class CubeGL(QOpenGLWidget):
     "Cube gl widget"
@@ -63,7 +77,7 @@ class CubeGL(QOpenGLWidget):
         mediaDir = os.path.join(tutoPardir, "media")
         shaderDir = os.path.join(mediaDir, "shaders")
 
-        availableShaders = ["cube"]
+        availableShaders = ["cube", "cubeInstanced"]
         self.shaders = {
             name: {
                 "fragment": os.path.join(shaderDir, name + ".frag"),
@@ -71,22 +85,39 @@ class CubeGL(QOpenGLWidget):
             } for name in availableShaders
         }
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
+        # draw every cube with a single instanced draw call
+        self.instanced = "--instanced" in QCoreApplication.arguments()
         imdir = os.path.join(mediaDir, "images")
         imFName = "im"
-        imageFile1 = os.path.join(imdir, imFName + "0.png")
-        self.image1 = QImage(imageFile1).mirrored()
-        imageFile2 = os.path.join(imdir, imFName + "1.png")
-        self.image2 = QImage(imageFile2).mirrored()
+        self.imageFile1 = os.path.join(imdir, imFName + "0.png")
+        self.imageFile2 = os.path.join(imdir, imFName + "1.png")
+        # images are decoded and uploaded once per share group
+        self.textures = sharedTextureManager()
+        # decoding starts now on worker threads
+        self.assets = sharedAssetLoader()
+        self.assets.request(self.imageFile1,
+                            self.textures.mipFilter)
+        self.assets.request(self.imageFile2,
+                            self.textures.mipFilter)
+        self.assets.imageReady.connect(self.imageReady)
 
         # opengl data related
         self.context = QOpenGLContext()
-        self.vao = QOpenGLVertexArrayObject()
+        self.vao = None
+        self.vertexArrays = VertexArrayCache()
+        self.glState = None
+        # texture manager generation seen by glState
+        self.textureGeneration = None
+        self.uniforms = None
         self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
         self.program = QOpenGLShaderProgram()
         self.texture1 = None
         self.texture2 = None
         self.texUnit1 = 0
         self.texUnit2 = 1
+        self.instanceBuffer = InstanceBuffer(location=2)
+        self.instancesDirty = True
 
         # vertex data
         self.cubeVertices = np.array([
@@ -134,6 +165,10 @@ class CubeGL(QOpenGLWidget):
             -0.5,  0.5, -0.5,  0.0, 1.0
         ], dtype=ctypes.c_float
         )
+        self.vertexLayout = VertexLayout([
+            ("aPos", np.float32, 3),
+            ("aTexCoord", np.float32, 2)
+        ])
         # cube worldSpace coordinates
         self.cubeCoords = [
             QVector3D(0.0,  0.0,  0.0),
@@ -147,71 +182,30 @@ class CubeGL(QOpenGLWidget):
             QVector3D(1.5,  0.2, -1.5),
             QVector3D(-1.3,  1.0, -1.5)
         ]
+        self.cubePositions = vecs2arr(self.cubeCoords)
         # notice the correspondance the vec4 of fragment shader
         # and our choice here
 
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
-        else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def useShaders(
-        self,
-        shaderProgram: QOpenGLShaderProgram,
-        shaders: {"shaderName": ["shaderType"]},
-        attrLocs: dict
-    ):
-        ""
-        print("program shaders: ",
-              shaderProgram.shaders())
-        for shaderName, shaderTypes in shaders.items():
-            #
-            if len(shaderTypes) == 2:
-                self.useShaderSingleName(
-                    shaderProgram=shaderProgram,
-                    shaderName=shaderName,
-                    attrLocs=attrLocs
-                )
-            elif len(shaderTypes) == 1:
-                shaderType = shaderTypes[0]
-                if shaderType == "vertex":
-                    shader = self.loadVertexShader(
-                        shaderName)
-                else:
-                    shader = self.loadFragmentShader(
-                        shaderName
-                    )
-
-                shaderProgram.addShader(shader)
-                # adding shader
-                self.bindLinkProgram(
-                    shaderProgram,
-                    attrLocs)
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
+    def setCubePositions(self, positions: np.ndarray):
+        "Set world space coordinates of cubes from a (N, 3) array"
+        self.cubePositions = np.asarray(positions, dtype=np.float32)
+        # only the non instanced path needs QVector3D objects
+        self.cubeCoords = None
+        self.instancesDirty = True
+        self.update()
+
+    def getCubeCoords(self):
+        "QVector3D positions for the per cube loop, built on first use"
+        if self.cubeCoords is None:
+            self.cubeCoords = [QVector3D(*pos) for pos in self.cubePositions]
+        return self.cubeCoords
+
+    def computeCubeModels(self):
+        "Compute model matrices of all cubes at once"
+        translations = translateMatrices(self.cubePositions)
+        angles = 30.0 * np.arange(self.cubePositions.shape[0])
+        rotations = rotateMatrices(angles, (0.7, 0.2, 0.5))
+        return batchMatMul(translations, rotations)
 
     def getGlInfo(self):
         "Get opengl info"
@@ -230,11 +224,14 @@ class CubeGL(QOpenGLWidget):
 
     def cleanUpGl(self):
         "Clean up everything"
+        # the loader is shared and outlives the widget
+        self.assets.imageReady.disconnect(self.imageReady)
         self.context.makeCurrent()
         self.vbo.destroy()
-        self.texture1.destroy()
-        self.texture2.destroy()
-        self.vao.destroy()
+        self.instanceBuffer.destroy()
+        self.textures.release(self.texture1)
+        self.textures.release(self.texture2)
+        self.vertexArrays.destroy()
         del self.program
         self.program = None
         self.doneCurrent()
@@ -243,6 +240,8 @@ class CubeGL(QOpenGLWidget):
         "Resize the viewport"
         funcs = self.context.functions()
         funcs.glViewport(0, 0, width, height)
+        # the widget recreates its framebuffer, which changes bindings
+        self.glState.invalidate()
 
     def initializeGL(self):
         print('gl initial')
@@ -257,28 +256,33 @@ class CubeGL(QOpenGLWidget):
         funcs = self.context.functions()
         funcs.initializeOpenGLFunctions()
         funcs.glClearColor(0.0, 0.4, 0.4, 0)
-        funcs.glEnable(pygl.GL_DEPTH_TEST)
-        funcs.glEnable(pygl.GL_TEXTURE_2D)
+        # bindings and capabilities go through the state cache so that
+        # unchanged ones are not sent again
+        self.glState = GLStateCache(funcs)
+        self.glState.enable(pygl.GL_DEPTH_TEST)
+        self.glState.enable(pygl.GL_TEXTURE_2D)
 
         # create uniform values for shaders
         # deal with shaders
 
         # cube shader
-        self.program = QOpenGLShaderProgram(
-            self.context
-        )
-        vshader = self.loadVertexShader("cube")
-        fshader = self.loadFragmentShader("cube")
-        self.program.addShader(vshader)  # adding vertex shader
-        self.program.addShader(fshader)  # adding fragment shader
-        self.program.bindAttributeLocation(
-            "aPos", 0)
-        self.program.bindAttributeLocation(
-            "aTexCoord", 1)
-
-        isLinked = self.program.link()
+        shaderPaths = {"fragment": self.shaders["cube"]["fragment"]}
+        attrLocs = self.vertexLayout.attributeLocations()
+        if self.instanced:
+            shaderPaths["vertex"] = self.shaders["cubeInstanced"]["vertex"]
+            attrLocs.update(self.instanceBuffer.layout.attributeLocations())
+        else:
+            shaderPaths["vertex"] = self.shaders["cube"]["vertex"]
+        self.program = self.shaderCache.loadProgram(
+            self.context,
+            shaderPaths,
+            attrLocs=attrLocs,
+            glInfo=self.getGlInfo())
+        isLinked = self.program.isLinked()
         print("cube shader program is linked: ",
               isLinked)
+        # uniform locations are resolved once here
+        self.uniforms = UniformCache(self.program)
         # bind the program
         self.program.bind()
 
@@ -289,113 +293,105 @@ class CubeGL(QOpenGLWidget):
             self.width() / self.height(),
             0.2, 100.0)
 
-        self.program.setUniformValue('projection',
-                                     projectionMatrix)
+        self.uniforms.setUniformValue('projection',
+                                      projectionMatrix)
 
         # set view/camera matrix
         viewMatrix = self.camera.getViewMatrix()
-        self.program.setUniformValue('view',
-                                     viewMatrix)
-        self.program.setUniformValue('myTexture1', self.texUnit1)
-        self.program.setUniformValue('myTexture2', self.texUnit2)
+        self.uniforms.setUniformValue('view',
+                                      viewMatrix)
+        self.uniforms.setUniformValue('myTexture1', self.texUnit1)
+        self.uniforms.setUniformValue('myTexture2', self.texUnit2)
         #
         # deal with vaos and vbo
         # vbo
         isVbo = self.vbo.create()
         isVboBound = self.vbo.bind()
 
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
         # allocate space on vbo buffer
-        self.vbo.allocate(
-            self.cubeVertices.tobytes(),
-            floatSize * self.cubeVertices.size)
-        self.vao.create()
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao)
-        funcs.glEnableVertexAttribArray(0)  # viewport
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    5 * floatSize,
-                                    VoidPtr(0)
-                                    )
-        funcs.glEnableVertexAttribArray(1)
-        funcs.glVertexAttribPointer(1,
-                                    2,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    5 * floatSize,
-                                    VoidPtr(3 * floatSize)
-                                    )
+        allocateArray(self.vbo, self.cubeVertices, np.float32)
+        self.vbo.release()
+        bindings = [(self.vertexLayout, self.vbo)]
+        if self.instanced:
+            self.instanceBuffer.create()
+            self.instanceBuffer.setMatrices(self.computeCubeModels())
+            self.instancesDirty = False
+            bindings.append((self.instanceBuffer.layout,
+                             self.instanceBuffer.vbo))
+        # attribute pointers are recorded once in a vao
+        self.vao = self.vertexArrays.get(funcs, bindings)
         # deal with textures
         # first texture
-        self.texture1 = QOpenGLTexture(
-            QOpenGLTexture.Target2D)
-        self.texture1.create()
-        self.texture1.bind(self.texUnit1)
-        self.texture1.setData(self.image1)
-        self.texture1.setMinMagFilters(
+        # mip levels come precomputed from the disk cache
+        self.texture1 = self.textures.acquire(
+            self.imageFile1,
+            QOpenGLTexture.NearestMipMapLinear,
             QOpenGLTexture.Nearest,
-            QOpenGLTexture.Nearest)
-        self.texture1.setWrapMode(
-            QOpenGLTexture.DirectionS,
-            QOpenGLTexture.Repeat)
-        self.texture1.setWrapMode(
-            QOpenGLTexture.DirectionT,
-            QOpenGLTexture.Repeat)
-
+            QOpenGLTexture.Repeat,
+            loader=self.assets)
         # second texture
-        self.texture2 = QOpenGLTexture(
-            QOpenGLTexture.Target2D)
-        self.texture2.create()
-        self.texture2.bind(self.texUnit2)
-        self.texture2.setData(self.image2)
-        self.texture2.setMinMagFilters(
+        self.texture2 = self.textures.acquire(
+            self.imageFile2,
+            QOpenGLTexture.LinearMipMapLinear,
             QOpenGLTexture.Linear,
-            QOpenGLTexture.Linear)
-        self.texture2.setWrapMode(
-            QOpenGLTexture.DirectionS,
-            QOpenGLTexture.Repeat)
-        self.texture2.setWrapMode(
-            QOpenGLTexture.DirectionT,
-            QOpenGLTexture.Repeat)
+            QOpenGLTexture.Repeat,
+            loader=self.assets)
 
-        self.vbo.release()
-        vaoBinder = None
         print("gl initialized")
 
+    def imageReady(self, path: str):
+        "an image is decoded, it is uploaded in the next frame"
+        self.update()
+
     def paintGL(self):
         "drawing loop"
         funcs = self.context.functions()
+        self.uniforms.beginFrame()
+        # replace placeholders with decoded images
+        self.textures.uploadPending(self.assets)
+        if self.textureGeneration != self.textures.generation:
+            # uploads recreate textures, cached bindings may be stale
+            self.glState.invalidateTextures()
+            self.textureGeneration = self.textures.generation
 
         # clean up what was drawn
         funcs.glClear(
             pygl.GL_COLOR_BUFFER_BIT | pygl.GL_DEPTH_BUFFER_BIT
         )
-        self.vao.bind()
-        self.vbo.bind()
+        self.glState.bindVertexArray(self.vao)
+        self.glState.bindBuffer(self.vbo)
 
         # actual drawing
-        self.program.bind()
+        self.glState.useProgram(self.program)
         rotvec = QVector3D(0.7, 0.2, 0.5)
         # bind textures
-        for i, pos in enumerate(self.cubeCoords):
-            #
-            cubeModel = QMatrix4x4()
-            cubeModel.translate(pos)
-            angle = 30 * i
-            cubeModel.rotate(angle, rotvec)
-            self.program.setUniformValue("model",
-                                         cubeModel)
-            self.texture1.bind(self.texUnit1)
-            self.texture2.bind(self.texUnit2)
-            funcs.glDrawArrays(
+        if self.instanced:
+            if self.instancesDirty:
+                self.instanceBuffer.setMatrices(self.computeCubeModels())
+                self.instancesDirty = False
+                self.glState.invalidateBuffer(QOpenGLBuffer.VertexBuffer)
+            self.glState.bindTexture(self.texture1, self.texUnit1)
+            self.glState.bindTexture(self.texture2, self.texUnit2)
+            self.instanceBuffer.draw(
                 pygl.GL_TRIANGLES,
                 0,
-                self.cubeVertices.size
-            )
-        self.vbo.release()
-        self.program.release()
-        self.texture1.release()
-        self.texture2.release()
\ No newline at end of file
+                self.vertexLayout.vertexCount(self.cubeVertices))
+        else:
+            for i, pos in enumerate(self.getCubeCoords()):
+                #
+                cubeModel = QMatrix4x4()
+                cubeModel.translate(pos)
+                angle = 30 * i
+                cubeModel.rotate(angle, rotvec)
+                self.uniforms.setUniformValue("model",
+                                              cubeModel)
+                # only the first cube really binds the textures
+                self.glState.bindTexture(self.texture1, self.texUnit1)
+                self.glState.bindTexture(self.texture2, self.texUnit2)
+                funcs.glDrawArrays(
+                    pygl.GL_TRIANGLES,
+                    0,
+                    self.vertexLayout.vertexCount(self.cubeVertices)
+                )
+        # nothing is released, the state cache keeps bindings from one
+        # frame to the next
\ No newline at end of file
@@ -29,6 +29,7 @@ class EventAppWindow(AppWindow):
         self.xSlider.valueChanged.connect(self.rotateCubes)
         self.ySlider.valueChanged.connect(self.rotateCubes)
         self.zSlider.valueChanged.connect(self.rotateCubes)
+        self.glWidget.cubeHovered.connect(self.showHoveredCube)
         #
         self.lastCamXVal = self.camX.value()
         #
@@ -65,6 +66,26 @@ class EventAppWindow(AppWindow):
                                  y=float(offsety))
         self.lastCamYVal = newVal
 
+    def showHoveredCube(self, index: int):
+        "Show the cube under the mouse"
+        if index == -1:
+            self.glLabel.setText("OpenGL Widget")
+        else:
+            self.glLabel.setText("OpenGL Widget: cube {0}".format(index))
+
+    def keyPressEvent(self, event):
+        "Movement keys are held down to move the camera"
+        if not event.isAutoRepeat() and self.glWidget.handleKey(event.key(),
+                                                                True):
+            return
+        super().keyPressEvent(event)
+
+    def keyReleaseEvent(self, event):
+        if not event.isAutoRepeat() and self.glWidget.handleKey(event.key(),
+                                                                False):
+            return
+        super().keyReleaseEvent(event)
+
     def rotateCubes(self):
         rx = self.xSlider.value()
         ry = self.ySlider.value()
@@ -5,17 +5,12 @@ import numpy as np
 import os
 import sys
 import ctypes
-from tutorials.utils.camera import QtCamera
-from tutorials.utils.utils import computePerspectiveNp
-from tutorials.utils.utils import computePerspectiveQt
-from tutorials.utils.utils import arr2qmat
 
 from PySide2.QtGui import QVector3D
 from PySide2.QtGui import QImage
 from PySide2.QtGui import QOpenGLVertexArrayObject
 from PySide2.QtGui import QOpenGLBuffer
 from PySide2.QtGui import QOpenGLShaderProgram
-from PySide2.QtGui import QOpenGLShader
 from PySide2.QtGui import QOpenGLContext
 from PySide2.QtGui import QOpenGLTexture
 from PySide2.QtGui import QMatrix4x4
@@ -27,6 +22,8 @@ from PySide2.QtWidgets import QMessageBox
 from PySide2.QtWidgets import QOpenGLWidget
 
 from PySide2.QtCore import QCoreApplication
+from PySide2.QtCore import Signal
+from PySide2.QtCore import Qt
 
 from PySide2.shiboken2 import VoidPtr
 
@@ -43,19 +40,58 @@ except ImportError:
     messageBox.exec_()
     sys.exit(1)
 
+# utils use PyOpenGL, imported once it is known to be installed
+from tutorials.utils.camera import CameraCore
+from tutorials.utils.utils import computePerspectiveNp
+from tutorials.utils.utils import computePerspectiveQt
+from tutorials.utils.utils import arr2qmat
+from tutorials.utils.utils import vecs2arr
+from tutorials.utils.transform import translateMatrices
+from tutorials.utils.transform import rotateMatrices
+from tutorials.utils.transform import batchMatMul
+from tutorials.utils.instancing import InstanceBuffer
+from tutorials.utils.culling import frustumPlanes
+from tutorials.utils.bvh import BVH
+from tutorials.utils.picking import RayPicker
+from tutorials.utils.vertexlayout import VertexLayout
+from tutorials.utils.vertexlayout import VertexArrayCache
+from tutorials.utils.buffers import allocateArray
+from tutorials.utils.glstate import GLStateCache
+from tutorials.utils.uniforms import UniformCache
+from tutorials.utils.scheduler import FrameScheduler
+from tutorials.utils.controls import InputController
+from tutorials.utils.shadercache import sharedShaderCache
+from tutorials.utils.textures import sharedTextureManager
+from tutorials.utils.assets import sharedAssetLoader
+from tutorials.utils.atlas import TextureArray
+
 
 class EventsGL(QOpenGLWidget):
     "Cube gl widget"
 
+    # index of the cube under the mouse, -1 if there is none
+    cubeHovered = Signal(int)
+
     def __init__(self, parent=None):
         QOpenGLWidget.__init__(self, parent)
+        self.setMouseTracking(True)
+        self.hoveredCube = -1
 
         # camera
-        self.camera = QtCamera()
-        self.camera.position = QVector3D(0.0, 0.0, 3.0)
-        self.camera.front = QVector3D(0.0, 0.0, -1.0)
-        self.camera.up = QVector3D(0.0, 1.0, 0.0)
+        # matrices are cached by the camera until it moves
+        self.camera = CameraCore()
+        self.camera.setPosition(0.0, 0.0, 3.0)
         self.camera.movementSensitivity = 0.05
+        # mouse and slider turns are applied to a quaternion
+        self.camera.setQuaternionMode(True)
+
+        # input is merged and applied once per presented frame
+        self.scheduler = FrameScheduler(self.update, maxFramesPerSecond=60)
+        self.controls = InputController()
+        # seconds of movement a button click is worth
+        self.clickMoveTime = 0.05
+        self.pendingRotation = None
+        self.lastMousePos = None
 
         # shaders etc
         tutoTutoDir = os.path.dirname(__file__)
@@ -64,7 +100,7 @@ class EventsGL(QOpenGLWidget):
         mediaDir = os.path.join(tutoPardir, "media")
         shaderDir = os.path.join(mediaDir, "shaders")
 
-        availableShaders = ["cube"]
+        availableShaders = ["cube", "cubeInstanced", "cubeArray"]
         self.shaders = {
             name: {
                 "fragment": os.path.join(shaderDir, name + ".frag"),
@@ -72,22 +108,48 @@ class EventsGL(QOpenGLWidget):
             } for name in availableShaders
         }
         self.core = "--coreprofile" in QCoreApplication.arguments()
+        self.shaderCache = sharedShaderCache()
+        # draw every cube with a single instanced draw call
+        self.instanced = "--instanced" in QCoreApplication.arguments()
+        # both images as layers of one texture array, bound once
+        self.useTextureArray = ("--texturearray" in
+                                QCoreApplication.arguments())
         imdir = os.path.join(mediaDir, "images")
         imFName = "im"
-        imageFile1 = os.path.join(imdir, imFName + "0.png")
-        self.image1 = QImage(imageFile1).mirrored()
-        imageFile2 = os.path.join(imdir, imFName + "1.png")
-        self.image2 = QImage(imageFile2).mirrored()
+        self.imageFile1 = os.path.join(imdir, imFName + "0.png")
+        self.imageFile2 = os.path.join(imdir, imFName + "1.png")
+        # images are decoded and uploaded once per share group
+        self.textures = sharedTextureManager()
+        # decoding starts now on worker threads
+        self.assets = sharedAssetLoader()
+        self.assets.request(self.imageFile1,
+                            self.textures.mipFilter)
+        self.assets.request(self.imageFile2,
+                            self.textures.mipFilter)
+        self.assets.imageReady.connect(self.imageReady)
 
         # opengl data related
         self.context = QOpenGLContext()
-        self.vao = QOpenGLVertexArrayObject()
+        self.vao = None
+        self.vertexArrays = VertexArrayCache()
+        self.glState = None
+        # texture manager generation seen by glState
+        self.textureGeneration = None
+        self.uniforms = None
         self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
         self.program = QOpenGLShaderProgram()
         self.texture1 = None
         self.texture2 = None
+        self.textureArray = None
         self.texUnit1 = 0
         self.texUnit2 = 1
+        # matrices change every frame while cubes rotate, they stream
+        # through a ring of buffer regions
+        self.instanceBuffer = InstanceBuffer(location=2, streaming=True)
+        self.instancesDirty = True
+        self.cubeModels = None
+        # cubes that passed the last frustum test
+        self.visibleCubes = None
 
         # vertex data
         self.cubeVertices = np.array([
@@ -135,6 +197,10 @@ class EventsGL(QOpenGLWidget):
             -0.5,  0.5, -0.5,  0.0, 1.0
         ], dtype=ctypes.c_float
         )
+        self.vertexLayout = VertexLayout([
+            ("aPos", np.float32, 3),
+            ("aTexCoord", np.float32, 2)
+        ])
         # cube worldSpace coordinates
         self.cubeCoords = [
             QVector3D(0.2,  1.1,  -1.0),
@@ -148,70 +214,88 @@ class EventsGL(QOpenGLWidget):
             QVector3D(1.5,  0.2, -1.5),
             QVector3D(-1.3,  1.0, -1.5)
         ]
+        self.cubePositions = vecs2arr(self.cubeCoords)
+        # bounding sphere of a unit cube whatever its rotation
+        self.cubeRadius = np.sqrt(3.0) / 2.0
+        self.cubeBVH = BVH(*self.cubeBounds())
+        self.cubePicker = RayPicker(*self.cubeBounds())
         self.rotateVector = QVector3D(0.7, 0.2, 0.5)
 
-    def loadShader(self,
-                   shaderName: str,
-                   shaderType: str):
-        "Load shader"
-        shader = self.shaders[shaderName]
-        shaderSourcePath = shader[shaderType]
-        if shaderType == "vertex":
-            shader = QOpenGLShader(QOpenGLShader.Vertex)
+    def setCubePositions(self, positions: np.ndarray):
+        "Set world space coordinates of cubes from a (N, 3) array"
+        self.cubePositions = np.asarray(positions, dtype=np.float32)
+        # only the non instanced path needs QVector3D objects
+        self.cubeCoords = None
+        mins, maxs = self.cubeBounds()
+        if mins.shape[0] == self.cubeBVH.count:
+            self.cubeBVH.refit(mins, maxs)
         else:
-            shader = QOpenGLShader(QOpenGLShader.Fragment)
-        #
-        isCompiled = shader.compileSourceFile(shaderSourcePath)
-
-        if isCompiled is False:
-            print(shader.log())
-            raise ValueError(
-                "{0} shader {2} known as {1} is not compiled".format(
-                    shaderType, shaderName, shaderSourcePath
-                )
-            )
-        return shader
-
-    def useShaders(
-        self,
-        shaderProgram: QOpenGLShaderProgram,
-        shaders: {"shaderName": ["shaderType"]},
-        attrLocs: dict
-    ):
-        ""
-        print("program shaders: ",
-              shaderProgram.shaders())
-        for shaderName, shaderTypes in shaders.items():
-            #
-            if len(shaderTypes) == 2:
-                self.useShaderSingleName(
-                    shaderProgram=shaderProgram,
-                    shaderName=shaderName,
-                    attrLocs=attrLocs
-                )
-            elif len(shaderTypes) == 1:
-                shaderType = shaderTypes[0]
-                if shaderType == "vertex":
-                    shader = self.loadVertexShader(
-                        shaderName)
-                else:
-                    shader = self.loadFragmentShader(
-                        shaderName
-                    )
-
-                shaderProgram.addShader(shader)
-                # adding shader
-                self.bindLinkProgram(
-                    shaderProgram,
-                    attrLocs)
-
-    def loadVertexShader(self, shaderName: str):
-        "load vertex shader"
-        return self.loadShader(shaderName, "vertex")
-
-    def loadFragmentShader(self, shaderName: str):
-        "load fragment shader"
-        return self.loadShader(shaderName, "fragment")
+            self.cubeBVH.build(mins, maxs)
+        self.cubePicker.setBoxes(mins, maxs)
+        self.instancesDirty = True
+        self.scheduler.requestFrame()
+
+    def cubeBounds(self):
+        """
+        Axis aligned boxes around cube bounding spheres.
+
+        They do not depend on the rotation of the cubes, so the bvh only
+        needs a refit when cubes are moved
+        """
+        return (self.cubePositions - self.cubeRadius,
+                self.cubePositions + self.cubeRadius)
+
+    def getCubeCoords(self):
+        "QVector3D positions for the per cube loop, built on first use"
+        if self.cubeCoords is None:
+            self.cubeCoords = [QVector3D(*pos) for pos in self.cubePositions]
+        return self.cubeCoords
+
+    def computeCubeModels(self):
+        "Compute model matrices of all cubes at once"
+        translations = translateMatrices(self.cubePositions)
+        angles = 30.0 * np.arange(self.cubePositions.shape[0])
+        rotations = rotateMatrices(angles, vecs2arr([self.rotateVector]))
+        return batchMatMul(translations, rotations)
+
+    def cullCubes(self):
+        "Mask of cubes whose bounds touch the view frustum"
+        planes = frustumPlanes(self.camera.getViewProjectionArray())
+        return self.cubeBVH.frustumMask(planes)
+
+    def getProjectionMatrix(self):
+        "Perspective projection of the camera for the widget size"
+        return self.camera.getProjectionMatrix()
+
+    def pickCube(self, x: float, y: float):
+        "Index of the nearest cube under a widget position, -1 on miss"
+        index, distance = self.camera.pick(x, y,
+                                           self.width(), self.height(),
+                                           self.cubePicker)
+        return index
+
+    def mousePressEvent(self, event):
+        "Start dragging the camera"
+        self.lastMousePos = event.pos()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        "Track the cube under the mouse, turn the camera while dragging"
+        if event.buttons() & Qt.LeftButton and self.lastMousePos is not None:
+            delta = event.pos() - self.lastMousePos
+            # widget y axis points down
+            self.turnAround(float(delta.x()), float(-delta.y()))
+            self.lastMousePos = event.pos()
+        index = self.pickCube(event.x(), event.y())
+        if index != self.hoveredCube:
+            self.hoveredCube = index
+            self.cubeHovered.emit(index)
+        super().mouseMoveEvent(event)
+
+    def focusOutEvent(self, event):
+        "Released keys are not seen without focus"
+        self.controls.clear()
+        super().focusOutEvent(event)
 
     def getGlInfo(self):
         "Get opengl info"
@@ -229,32 +313,57 @@ class EventsGL(QOpenGLWidget):
         return info
 
     def moveCamera(self, direction: str):
-        "Move camera to certain direction and update gl widget"
-        self.camera.move(direction, deltaTime=0.05)
-        self.update()
+        "Move camera to certain direction over the next frames"
+        self.controls.addMove(direction, self.clickMoveTime)
+        self.scheduler.requestFrame()
 
     def turnAround(self, x: float, y: float):
-        ""
-        self.camera.lookAround(xoffset=x,
-                               yoffset=y,
-                               pitchBound=True)
-        self.update()
+        "Turn camera, offsets are summed until the next frame"
+        self.controls.addTurn(x, y)
+        self.scheduler.requestFrame()
+
+    def handleKey(self, key: int, pressed: bool):
+        "Held movement keys move the camera, returns False for other keys"
+        if not self.controls.keyEvent(key, pressed):
+            return False
+        self.scheduler.requestFrame()
+        return True
 
     def rotateCubes(self, xval: float,
                     yval: float, zval: float):
-        ""
-        self.rotateVector.setZ(zval)
-        self.rotateVector.setY(yval)
-        self.rotateVector.setX(xval)
-        self.update()
+        "Rotate cubes, only the last rotation before a frame is used"
+        self.pendingRotation = (xval, yval, zval)
+        self.scheduler.requestFrame()
+
+    def applyPendingInput(self):
+        "Apply input received since the previous frame"
+        self.scheduler.beginFrame()
+        moving = self.controls.apply(self.camera,
+                                     self.scheduler.takeFixedSteps(),
+                                     self.scheduler.fixedStep)
+        if self.pendingRotation is not None:
+            xval, yval, zval = self.pendingRotation
+            self.rotateVector.setZ(zval)
+            self.rotateVector.setY(yval)
+            self.rotateVector.setX(xval)
+            self.instancesDirty = True
+            self.pendingRotation = None
+        if moving:
+            # remaining movement is played in the next frames
+            self.scheduler.requestFrame()
 
     def cleanUpGl(self):
         "Clean up everything"
+        # the loader is shared and outlives the widget
+        self.assets.imageReady.disconnect(self.imageReady)
         self.context.makeCurrent()
         self.vbo.destroy()
-        self.texture1.destroy()
-        self.texture2.destroy()
-        self.vao.destroy()
+        self.instanceBuffer.destroy()
+        if self.textureArray is not None:
+            self.textureArray.destroy()
+        self.textures.release(self.texture1)
+        self.textures.release(self.texture2)
+        self.vertexArrays.destroy()
         del self.program
         self.program = None
         self.doneCurrent()
@@ -263,6 +372,9 @@ class EventsGL(QOpenGLWidget):
         "Resize the viewport"
         funcs = self.context.functions()
         funcs.glViewport(0, 0, width, height)
+        # the widget recreates its framebuffer, which changes bindings
+        self.glState.invalidate()
+        self.camera.setPerspective(width / max(height, 1), 0.2, 100.0)
 
     def initializeGL(self):
         print('gl initial')
@@ -277,145 +389,175 @@ class EventsGL(QOpenGLWidget):
         funcs = self.context.functions()
         funcs.initializeOpenGLFunctions()
         funcs.glClearColor(0.0, 0.4, 0.4, 0)
-        funcs.glEnable(pygl.GL_DEPTH_TEST)
-        funcs.glEnable(pygl.GL_TEXTURE_2D)
+        # bindings and capabilities go through the state cache so that
+        # unchanged ones are not sent again
+        self.glState = GLStateCache(funcs)
+        self.glState.enable(pygl.GL_DEPTH_TEST)
+        self.glState.enable(pygl.GL_TEXTURE_2D)
 
         # create uniform values for shaders
         # deal with shaders
 
         # cube shader
-        self.program = QOpenGLShaderProgram(
-            self.context
-        )
-        vshader = self.loadVertexShader("cube")
-        fshader = self.loadFragmentShader("cube")
-        self.program.addShader(vshader)  # adding vertex shader
-        self.program.addShader(fshader)  # adding fragment shader
-        self.program.bindAttributeLocation(
-            "aPos", 0)
-        self.program.bindAttributeLocation(
-            "aTexCoord", 1)
-
-        isLinked = self.program.link()
+        if self.useTextureArray:
+            shaderPaths = {"fragment": self.shaders["cubeArray"]["fragment"]}
+        else:
+            shaderPaths = {"fragment": self.shaders["cube"]["fragment"]}
+        attrLocs = self.vertexLayout.attributeLocations()
+        if self.instanced:
+            shaderPaths["vertex"] = self.shaders["cubeInstanced"]["vertex"]
+            attrLocs.update(self.instanceBuffer.layout.attributeLocations())
+        else:
+            shaderPaths["vertex"] = self.shaders["cube"]["vertex"]
+        self.program = self.shaderCache.loadProgram(
+            self.context,
+            shaderPaths,
+            attrLocs=attrLocs,
+            glInfo=self.getGlInfo())
+        isLinked = self.program.isLinked()
         print("cube shader program is linked: ",
               isLinked)
+        # uniform locations are resolved once here
+        self.uniforms = UniformCache(self.program)
         # bind the program
         self.program.bind()
 
-        self.program.setUniformValue('myTexture1', self.texUnit1)
-        self.program.setUniformValue('myTexture2', self.texUnit2)
+        if self.useTextureArray:
+            self.uniforms.setUniformValue('myTextures', self.texUnit1)
+            self.uniforms.setUniformValue('layer1', 0)
+            self.uniforms.setUniformValue('layer2', 1)
+        else:
+            self.uniforms.setUniformValue('myTexture1', self.texUnit1)
+            self.uniforms.setUniformValue('myTexture2', self.texUnit2)
         #
         # deal with vaos and vbo
         # vbo
         isVbo = self.vbo.create()
         isVboBound = self.vbo.bind()
 
-        floatSize = ctypes.sizeof(ctypes.c_float)
-
         # allocate space on vbo buffer
-        self.vbo.allocate(
-            self.cubeVertices.tobytes(),
-            floatSize * self.cubeVertices.size)
-        self.vao.create()
-        vaoBinder = QOpenGLVertexArrayObject.Binder(self.vao)
-        funcs.glEnableVertexAttribArray(0)  # viewport
-        funcs.glVertexAttribPointer(0,
-                                    3,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    5 * floatSize,
-                                    VoidPtr(0)
-                                    )
-        funcs.glEnableVertexAttribArray(1)
-        funcs.glVertexAttribPointer(1,
-                                    2,
-                                    int(pygl.GL_FLOAT),
-                                    int(pygl.GL_FALSE),
-                                    5 * floatSize,
-                                    VoidPtr(3 * floatSize)
-                                    )
+        allocateArray(self.vbo, self.cubeVertices, np.float32)
+        self.vbo.release()
+        bindings = [(self.vertexLayout, self.vbo)]
+        if self.instanced:
+            self.instanceBuffer.create()
+            self.cubeModels = self.computeCubeModels()
+            self.instanceBuffer.setMatrices(self.cubeModels)
+            self.instancesDirty = False
+            bindings.append((self.instanceBuffer.layout,
+                             self.instanceBuffer.vbo))
+        # attribute pointers are recorded once in a vao
+        self.vao = self.vertexArrays.get(funcs, bindings)
         # deal with textures
-        # first texture
-        self.texture1 = QOpenGLTexture(
-            QOpenGLTexture.Target2D)
-        self.texture1.create()
-        self.texture1.bind(self.texUnit1)
-        self.texture1.setData(self.image1)
-        self.texture1.setMinMagFilters(
-            QOpenGLTexture.Nearest,
-            QOpenGLTexture.Nearest)
-        self.texture1.setWrapMode(
-            QOpenGLTexture.DirectionS,
-            QOpenGLTexture.Repeat)
-        self.texture1.setWrapMode(
-            QOpenGLTexture.DirectionT,
-            QOpenGLTexture.Repeat)
-
-        # second texture
-        self.texture2 = QOpenGLTexture(
-            QOpenGLTexture.Target2D)
-        self.texture2.create()
-        self.texture2.bind(self.texUnit2)
-        self.texture2.setData(self.image2)
-        self.texture2.setMinMagFilters(
-            QOpenGLTexture.Linear,
-            QOpenGLTexture.Linear)
-        self.texture2.setWrapMode(
-            QOpenGLTexture.DirectionS,
-            QOpenGLTexture.Repeat)
-        self.texture2.setWrapMode(
-            QOpenGLTexture.DirectionT,
-            QOpenGLTexture.Repeat)
+        if self.useTextureArray:
+            # layer 0 is the first image, layer 1 the second
+            # decoded on the loader, grey until both images are ready
+            self.textureArray = TextureArray(
+                [self.imageFile1, self.imageFile2],
+                self.textures.mipFilter)
+            self.textureArray.create(self.assets)
+        else:
+            # first texture
+            # mip levels come precomputed from the disk cache
+            self.texture1 = self.textures.acquire(
+                self.imageFile1,
+                QOpenGLTexture.NearestMipMapLinear,
+                QOpenGLTexture.Nearest,
+                QOpenGLTexture.Repeat,
+                loader=self.assets)
+            # second texture
+            self.texture2 = self.textures.acquire(
+                self.imageFile2,
+                QOpenGLTexture.LinearMipMapLinear,
+                QOpenGLTexture.Linear,
+                QOpenGLTexture.Repeat,
+                loader=self.assets)
 
-        self.vbo.release()
-        vaoBinder = None
         print("gl initialized")
 
+    def imageReady(self, path: str):
+        "an image is decoded, it is uploaded in the next frame"
+        self.scheduler.requestFrame()
+
+    def bindTextures(self):
+        "bind the texture array or both textures"
+        if self.textureArray is not None:
+            self.glState.bindTexture(self.textureArray.texture,
+                                     self.texUnit1)
+        else:
+            self.glState.bindTexture(self.texture1, self.texUnit1)
+            self.glState.bindTexture(self.texture2, self.texUnit2)
+
     def paintGL(self):
         "drawing loop"
         funcs = self.context.functions()
+        self.applyPendingInput()
+        # replace placeholders with decoded images
+        self.textures.uploadPending(self.assets)
+        if (self.textureArray is not None and
+                self.textureArray.uploadPending(self.assets)):
+            self.glState.invalidateTextures()
+        if self.textureGeneration != self.textures.generation:
+            # uploads recreate textures, cached bindings may be stale
+            self.glState.invalidateTextures()
+            self.textureGeneration = self.textures.generation
+        self.uniforms.beginFrame()
 
         # clean up what was drawn
         funcs.glClear(
             pygl.GL_COLOR_BUFFER_BIT | pygl.GL_DEPTH_BUFFER_BIT
         )
-        self.vao.bind()
-        self.vbo.bind()
+        self.glState.bindVertexArray(self.vao)
+        self.glState.bindBuffer(self.vbo)
 
         # actual drawing
-        self.program.bind()
+        self.glState.useProgram(self.program)
         # set projection matrix
-        projectionMatrix = QMatrix4x4()
-        projectionMatrix.perspective(
-            self.camera.zoom,
-            self.width() / self.height(),
-            0.2, 100.0)
+        projectionMatrix = self.getProjectionMatrix()
 
-        self.program.setUniformValue('projection',
-                                     projectionMatrix)
+        self.uniforms.setUniformValue('projection',
+                                      projectionMatrix)
 
         # set view/camera matrix
         viewMatrix = self.camera.getViewMatrix()
-        self.program.setUniformValue('view',
-                                     viewMatrix)
+        self.uniforms.setUniformValue('view',
+                                      viewMatrix)
+
+        # cubes outside of the frustum are not sent at all
+        visible = self.cullCubes()
 
         # bind textures
-        for i, pos in enumerate(self.cubeCoords):
-            #
-            cubeModel = QMatrix4x4()
-            cubeModel.translate(pos)
-            angle = 30 * i
-            cubeModel.rotate(angle, self.rotateVector)
-            self.program.setUniformValue("model",
-                                         cubeModel)
-            self.texture1.bind(self.texUnit1)
-            self.texture2.bind(self.texUnit2)
-            funcs.glDrawArrays(
+        if self.instanced:
+            if self.instancesDirty:
+                self.cubeModels = self.computeCubeModels()
+            if self.instancesDirty or not np.array_equal(visible,
+                                                         self.visibleCubes):
+                self.instanceBuffer.setMatrices(self.cubeModels[visible])
+                self.instanceBuffer.pointAttributes(funcs)
+                self.instancesDirty = False
+                self.glState.invalidateBuffer(QOpenGLBuffer.VertexBuffer)
+            self.bindTextures()
+            self.instanceBuffer.draw(
                 pygl.GL_TRIANGLES,
                 0,
-                36
-            )
-        self.vbo.release()
-        self.program.release()
-        self.texture1.release()
-        self.texture2.release()
\ No newline at end of file
+                self.vertexLayout.vertexCount(self.cubeVertices))
+        else:
+            cubeCoords = self.getCubeCoords()
+            for i in np.flatnonzero(visible):
+                #
+                cubeModel = QMatrix4x4()
+                cubeModel.translate(cubeCoords[i])
+                angle = 30 * int(i)
+                cubeModel.rotate(angle, self.rotateVector)
+                self.uniforms.setUniformValue("model",
+                                              cubeModel)
+                # only the first cube really binds the textures
+                self.bindTextures()
+                funcs.glDrawArrays(
+                    pygl.GL_TRIANGLES,
+                    0,
+                    self.vertexLayout.vertexCount(self.cubeVertices)
+                )
+        self.visibleCubes = visible
+        # nothing is released, the state cache keeps bindings from one
+        # frame to the next
\ No newline at end of file
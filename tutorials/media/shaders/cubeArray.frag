@@ -0,0 +1,20 @@
+// array textures are not part of glsl 1.10, the shader compiles with the
+// version of the other shaders and gets them from the extension
+#extension GL_EXT_texture_array : enable
+
+varying mediump vec2 TexCoord;
+
+// every image is a layer of one texture, switching images is only a
+// uniform change
+uniform sampler2DArray myTextures;
+uniform int layer1;
+uniform int layer2;
+
+void main(void)
+{
+    // same mix as cube.frag with layers picked by index
+    gl_FragColor = mix(
+        texture2DArray(myTextures, vec3(TexCoord, float(layer1))),
+        texture2DArray(myTextures, vec3(TexCoord, float(layer2))),
+        0.4);
+}
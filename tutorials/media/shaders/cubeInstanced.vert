@@ -0,0 +1,15 @@
+attribute highp vec3 aPos;
+attribute mediump vec2 aTexCoord;
+// per instance model matrix, takes 4 attribute locations one per column
+attribute highp mat4 aModel;
+
+uniform highp mat4 view;
+uniform highp mat4 projection;
+
+varying mediump vec2 TexCoord;
+
+void main(void)
+{
+    gl_Position = projection * view * aModel * vec4(aPos, 1.0);
+    TexCoord = aTexCoord;
+}
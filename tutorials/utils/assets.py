@@ -0,0 +1,110 @@
+# author: Kaan Eraslan
+# images decoded on worker threads
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide2.QtCore import QCoreApplication
+from PySide2.QtCore import QObject
+from PySide2.QtCore import Signal
+from PySide2.QtGui import QImage
+
+from tutorials.utils.mipmaps import decodeMipChain
+from tutorials.utils.texformat import loadTexture
+
+
+def decodeImage(path: str):
+    """
+    Decode an image ready to be uploaded.
+
+    The image is flipped for opengl texture coordinates and converted to
+    RGBA8888, which is what QOpenGLTexture would otherwise do on the gl
+    thread. QImage is reentrant so this runs on any thread
+    """
+    image = QImage(path)
+    if image.isNull():
+        raise ValueError("Could not load image {0}".format(path))
+    return image.mirrored().convertToFormat(QImage.Format_RGBA8888)
+
+
+def decodeTexture(path: str, mipFilter=None):
+    """
+    Texture data of an image, a QImage or a list of mip levels.
+
+    An up to date gltex file is memory mapped, the image is decoded only
+    if there is none
+    """
+    levels = loadTexture(path, mipFilter)
+    if levels is not None:
+        return levels
+    if mipFilter is None:
+        return decodeImage(path)
+    return decodeMipChain(path, mipFilter)
+
+
+class AssetLoader(QObject):
+    """
+    Decode images on a thread pool.
+
+    request starts decoding and returns at once, imageReady is emitted
+    with the real path of the image when it is decoded. The signal is
+    queued to the thread of the receivers, the gl thread only uploads.
+    With a mipFilter the result is a list of mip levels built with that
+    filter instead of a QImage.
+    """
+
+    imageReady = Signal(str)
+
+    def __init__(self, maxWorkers=None, parent=None):
+        super().__init__(parent)
+        if maxWorkers is None:
+            maxWorkers = min(8, os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        # (real path, mip filter): future of QImage or mip levels
+        self.futures = {}
+
+    def request(self, path: str, mipFilter=None):
+        "Start decoding an image unless it is already requested"
+        path = os.path.realpath(path)
+        key = (path, mipFilter)
+        future = self.futures.get(key)
+        if future is None:
+            future = self.executor.submit(decodeTexture, path, mipFilter)
+            self.futures[key] = future
+            future.add_done_callback(
+                lambda done: self.imageReady.emit(path))
+        return future
+
+    def isReady(self, path: str, mipFilter=None):
+        "True if the image is decoded or failed to decode"
+        future = self.futures.get((os.path.realpath(path), mipFilter))
+        return future is not None and future.done()
+
+    def image(self, path: str, mipFilter=None):
+        "Decoded image, waits for it if needed, raises decoding errors"
+        return self.request(path, mipFilter).result()
+
+    def forget(self, path: str, mipFilter=None):
+        "Drop a decoded image once it is uploaded"
+        self.futures.pop((os.path.realpath(path), mipFilter), None)
+
+    def shutdown(self):
+        "Stop worker threads, pending decodes are cancelled"
+        for future in self.futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
+        self.futures = {}
+
+
+_sharedLoader = None
+
+
+def sharedAssetLoader():
+    "Asset loader shared by all widgets, shut down when the application quits"
+    global _sharedLoader
+    if _sharedLoader is None:
+        _sharedLoader = AssetLoader()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_sharedLoader.shutdown)
+    return _sharedLoader
@@ -0,0 +1,309 @@
+# author: Kaan Eraslan
+# several images behind a single texture binding
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLTexture
+
+from tutorials.utils.assets import decodeTexture
+from tutorials.utils.buffers import dataPointer
+from tutorials.utils.mipmaps import buildMipChain
+from tutorials.utils.mipmaps import resize
+from tutorials.utils.mipmaps import uploadMipChain
+
+
+class SkylinePacker:
+    """
+    Pack rectangles into a fixed size bin with the skyline bottom left rule.
+
+    The skyline is the upper outline of the packed rectangles, stored as
+    segments of (x, y, width) from left to right. A rectangle goes where
+    its top is lowest, ties are broken by the narrower segment.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.skyline = [(0, 0, width)]
+
+    def fit(self, index: int, width: int, height: int):
+        "y of a rectangle starting at a segment or -1 if it does not fit"
+        x = self.skyline[index][0]
+        if x + width > self.width:
+            return -1
+        y = 0
+        remaining = width
+        while remaining > 0:
+            segmentX, segmentY, segmentWidth = self.skyline[index]
+            y = max(y, segmentY)
+            if y + height > self.height:
+                return -1
+            remaining -= segmentWidth
+            index += 1
+            if remaining > 0 and index == len(self.skyline):
+                return -1
+        return y
+
+    def insert(self, width: int, height: int):
+        "Position (x, y) of a new rectangle or None if the bin is full"
+        best = None
+        for index in range(len(self.skyline)):
+            y = self.fit(index, width, height)
+            if y < 0:
+                continue
+            score = (y + height, self.skyline[index][2])
+            if best is None or score < best[0]:
+                best = (score, index, y)
+        if best is None:
+            return None
+        _, index, y = best
+        x = self.skyline[index][0]
+        self.addSegment(index, x, y + height, width)
+        return x, y
+
+    def addSegment(self, index: int, x: int, y: int, width: int):
+        "raise the skyline under a new rectangle"
+        self.skyline.insert(index, (x, y, width))
+        right = x + width
+        # shrink or drop the segments now covered by the rectangle
+        index += 1
+        while index < len(self.skyline):
+            segmentX, segmentY, segmentWidth = self.skyline[index]
+            if segmentX >= right:
+                break
+            shrink = right - segmentX
+            if shrink < segmentWidth:
+                self.skyline[index] = (right, segmentY,
+                                       segmentWidth - shrink)
+                break
+            del self.skyline[index]
+        # merge neighbours of the same height
+        merged = [self.skyline[0]]
+        for segment in self.skyline[1:]:
+            if segment[1] == merged[-1][1]:
+                merged[-1] = (merged[-1][0], merged[-1][1],
+                              merged[-1][2] + segment[2])
+            else:
+                merged.append(segment)
+        self.skyline = merged
+
+
+def nextPowerOfTwo(value: int):
+    "smallest power of two not below value"
+    return 1 << max(0, int(value) - 1).bit_length()
+
+
+def packRectangles(sizes: np.ndarray, maxSize=8192):
+    """
+    Pack (N, 2) widths and heights into the smallest power of two bin.
+
+    Returns bin width, bin height and (N, 2) positions
+    """
+    sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+    if sizes.size == 0:
+        raise ValueError("Nothing to pack")
+    if sizes.min() <= 0 or sizes.max() > maxSize:
+        raise ValueError(
+            "Rectangles must be between 1 and {0} pixels".format(maxSize))
+    # tall rectangles first keep the skyline flat
+    order = np.lexsort((-sizes[:, 0], -sizes[:, 1]))
+    area = int((sizes[:, 0] * sizes[:, 1]).sum())
+    width = nextPowerOfTwo(sizes[:, 0].max())
+    height = nextPowerOfTwo(sizes[:, 1].max())
+    while width * height < area:
+        if width <= height:
+            width *= 2
+        else:
+            height *= 2
+    while width <= maxSize and height <= maxSize:
+        packer = SkylinePacker(width, height)
+        positions = np.zeros_like(sizes)
+        for index in order:
+            position = packer.insert(int(sizes[index, 0]),
+                                     int(sizes[index, 1]))
+            if position is None:
+                break
+            positions[index] = position
+        else:
+            return width, height, positions
+        if width <= height:
+            width *= 2
+        else:
+            height *= 2
+    raise ValueError(
+        "Rectangles do not fit in a {0}x{0} atlas".format(maxSize))
+
+
+class TextureAtlas:
+    """
+    Images packed side by side in one 2d texture.
+
+    uvRects holds a row of (u offset, v offset, u scale, v scale) per
+    image, texture coordinates of an image become uv * scale + offset.
+    Images are padded by copies of their edge pixels so that filtering
+    and the first mip levels do not bleed neighbours in. Repeat wrapping
+    does not work inside an atlas, use a texture array for tiled images.
+    """
+
+    def __init__(self, images: list, padding=4, maxSize=8192):
+        self.padding = padding
+        sizes = np.array([(image.shape[1] + 2 * padding,
+                           image.shape[0] + 2 * padding)
+                          for image in images], dtype=np.int64)
+        self.width, self.height, positions = packRectangles(sizes, maxSize)
+        self.pixels = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        self.uvRects = np.zeros((len(images), 4), dtype=np.float32)
+        for index, image in enumerate(images):
+            x, y = positions[index]
+            height, width = image.shape[:2]
+            self.pixels[y:y + height + 2 * padding,
+                        x:x + width + 2 * padding] = np.pad(
+                image, ((padding, padding), (padding, padding), (0, 0)),
+                mode="edge")
+            self.uvRects[index] = ((x + padding) / self.width,
+                                   (y + padding) / self.height,
+                                   width / self.width,
+                                   height / self.height)
+
+    def remapUVs(self, uvs: np.ndarray, index: int):
+        "(M, 2) texture coordinates of an image moved into the atlas"
+        rect = self.uvRects[index]
+        return uvs * rect[2:] + rect[:2]
+
+    def createTexture(self, filterName="lanczos",
+                      minFilter=QOpenGLTexture.LinearMipMapLinear,
+                      magFilter=QOpenGLTexture.Linear):
+        "Upload the atlas with a full mip chain"
+        texture = QOpenGLTexture(QOpenGLTexture.Target2D)
+        texture.create()
+        uploadMipChain(texture, buildMipChain(self.pixels, filterName))
+        texture.setMinMagFilters(minFilter, magFilter)
+        texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        return texture
+
+
+def uploadTextureArray(texture: QOpenGLTexture, layers: list):
+    "Allocate storage and upload the mip chains of same sized layers"
+    height, width = layers[0][0].shape[:2]
+    texture.setAutoMipMapGenerationEnabled(False)
+    texture.setFormat(QOpenGLTexture.RGBA8_UNorm)
+    texture.setSize(width, height)
+    texture.setLayers(len(layers))
+    texture.setMipLevels(len(layers[0]))
+    texture.allocateStorage(QOpenGLTexture.RGBA, QOpenGLTexture.UInt8)
+    for layer, levels in enumerate(layers):
+        for level, pixels in enumerate(levels):
+            texture.setData(level, layer,
+                            QOpenGLTexture.RGBA, QOpenGLTexture.UInt8,
+                            dataPointer(np.ascontiguousarray(pixels),
+                                        np.uint8))
+
+
+def placeholderLayers(count: int):
+    "a single grey pixel per layer, shown until the images are uploaded"
+    pixel = np.array([[[128, 128, 128, 255]]], dtype=np.uint8)
+    return [[pixel] for _ in range(count)]
+
+
+class TextureArray:
+    """
+    Texture array with one layer per image, layer indices follow paths.
+
+    Layers share a size, images of another size than the first one are
+    resampled to it. With an AssetLoader create returns at once with a
+    placeholder pixel in every layer and uploadPending uploads the images
+    once all of them are decoded. Storage of a texture array can not be
+    resized, the upload recreates the texture object. The context should
+    be current in create, uploadPending and destroy.
+    """
+
+    def __init__(self, paths: list,
+                 filterName="lanczos",
+                 minFilter=QOpenGLTexture.LinearMipMapLinear,
+                 magFilter=QOpenGLTexture.Linear,
+                 wrapMode=QOpenGLTexture.Repeat):
+        self.paths = list(paths)
+        self.filterName = filterName
+        self.minFilter = minFilter
+        self.magFilter = magFilter
+        self.wrapMode = wrapMode
+        self.texture = None
+        # placeholder layers until the decoded images are uploaded
+        self.pending = False
+
+    def create(self, loader=None):
+        "Upload the images, or placeholders while the loader decodes them"
+        if loader is None:
+            self.upload([decodeTexture(path, self.filterName)
+                         for path in self.paths])
+            return self.texture
+        for path in self.paths:
+            loader.request(path, self.filterName)
+        self.pending = True
+        if not self.uploadPending(loader):
+            self.upload(placeholderLayers(len(self.paths)))
+        return self.texture
+
+    def uploadPending(self, loader):
+        """
+        Replace the placeholders once every image is decoded.
+
+        Returns True if the texture object was recreated, bindings of the
+        previous one should be forgotten. Decoding errors keep the
+        placeholders
+        """
+        if not self.pending:
+            return False
+        if not all(loader.isReady(path, self.filterName)
+                   for path in self.paths):
+            return False
+        self.pending = False
+        try:
+            layers = [loader.image(path, self.filterName)
+                      for path in self.paths]
+        except (OSError, ValueError) as error:
+            print(error)
+            return False
+        finally:
+            for path in self.paths:
+                loader.forget(path, self.filterName)
+        self.upload(layers)
+        return True
+
+    def upload(self, layers: list):
+        "(re)create the texture with mip chains of each layer"
+        height, width = layers[0][0].shape[:2]
+        for index, levels in enumerate(layers):
+            if levels[0].shape[:2] != (height, width):
+                layers[index] = buildMipChain(
+                    resize(levels[0], width, height, self.filterName),
+                    self.filterName)
+        if self.texture is not None:
+            self.texture.destroy()
+        self.texture = QOpenGLTexture(QOpenGLTexture.Target2DArray)
+        self.texture.create()
+        uploadTextureArray(self.texture, layers)
+        self.texture.setMinMagFilters(self.minFilter, self.magFilter)
+        self.texture.setWrapMode(self.wrapMode)
+
+    def destroy(self):
+        "destroy the texture"
+        if self.texture is not None:
+            self.texture.destroy()
+        self.texture = None
+        self.pending = False
+
+
+def createTextureArray(paths: list,
+                       filterName="lanczos",
+                       minFilter=QOpenGLTexture.LinearMipMapLinear,
+                       magFilter=QOpenGLTexture.Linear,
+                       wrapMode=QOpenGLTexture.Repeat):
+    """
+    Texture array of images decoded here, before returning.
+
+    Use TextureArray with an AssetLoader to decode on worker threads
+    """
+    textureArray = TextureArray(paths, filterName, minFilter, magFilter,
+                                wrapMode)
+    return textureArray.create()
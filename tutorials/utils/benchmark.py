@@ -0,0 +1,301 @@
+# author: Kaan Eraslan
+# headless frame benchmark for the tutorial widgets
+#
+# Usage from the folder containing setup.py:
+#
+#   QT_QPA_PLATFORM=offscreen python -m tutorials.utils.benchmark \
+#       --frames 200 --output bench.json
+#
+# Widgets are never shown. Each one is hosted on a QOffscreenSurface and
+# draws into a framebuffer object. Unknown arguments such as --instanced
+# are passed on to QApplication so that the widgets can read them.
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from PySide2.QtGui import QOffscreenSurface
+from PySide2.QtGui import QOpenGLContext
+from PySide2.QtGui import QOpenGLFramebufferObject
+from PySide2.QtGui import QSurfaceFormat
+from PySide2.QtWidgets import QApplication
+
+from OpenGL import GL as pygl
+
+
+TUTORIALS_DIR = os.path.realpath(
+    os.path.join(os.path.dirname(__file__), os.pardir)
+)
+
+# widget class name: (tutorial folder, module name)
+WIDGETS = {
+    "TriangleGL": ("01-triangle", "gltriangle"),
+    "RectangleGL": ("02-rectangle", "glrectangle"),
+    "TextureGL": ("04-texture", "gltexture"),
+    "CubeGL": ("05-cube", "glcube"),
+    "EventsGL": ("06-events", "glevents"),
+}
+
+DRAW_FUNCTIONS = [
+    "glDrawArrays",
+    "glDrawElements",
+    "glDrawArraysInstanced",
+    "glDrawElementsInstanced",
+    "glDrawElementsBaseVertex",
+    "glDrawArraysIndirect",
+    "glDrawElementsIndirect",
+    "glMultiDrawArraysIndirect",
+    "glMultiDrawElementsIndirect",
+]
+
+
+def loadWidgetClass(name: str):
+    "Import a tutorial widget class from its tutorial folder"
+    if name not in WIDGETS:
+        raise ValueError(
+            "Unknown widget {0}, available widgets are {1}".format(
+                name, list(WIDGETS.keys())
+            )
+        )
+    folder, moduleName = WIDGETS[name]
+    path = os.path.join(TUTORIALS_DIR, folder, moduleName + ".py")
+    spec = importlib.util.spec_from_file_location(moduleName, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+class DrawCallCounter:
+    """
+    Count draw calls issued by a widget.
+
+    Draw calls reach the driver either through the functions of the widget
+    context or directly through PyOpenGL, both are intercepted.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.patched = {}
+
+    def wrap(self, func):
+        "wrap a draw function so that it is counted"
+        def counted(*args, **kwargs):
+            self.count += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def patchPyOpenGL(self):
+        "count draw calls made with PyOpenGL"
+        for name in DRAW_FUNCTIONS:
+            func = getattr(pygl, name, None)
+            if func is not None:
+                self.patched[name] = func
+                setattr(pygl, name, self.wrap(func))
+
+    def unpatchPyOpenGL(self):
+        "restore PyOpenGL draw functions"
+        for name, func in self.patched.items():
+            setattr(pygl, name, func)
+        self.patched = {}
+
+
+class CountingFunctions:
+    "QOpenGLFunctions proxy counting draw calls"
+
+    def __init__(self, funcs, counter: DrawCallCounter):
+        self._funcs = funcs
+        self._counter = counter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._funcs, name)
+        if name in DRAW_FUNCTIONS:
+            return self._counter.wrap(attr)
+        return attr
+
+
+class CountingContext:
+    "QOpenGLContext proxy whose functions count draw calls"
+
+    def __init__(self, context: QOpenGLContext, counter: DrawCallCounter):
+        self._context = context
+        self._counter = counter
+
+    def functions(self):
+        return CountingFunctions(self._context.functions(), self._counter)
+
+    def __getattr__(self, name: str):
+        return getattr(self._context, name)
+
+
+def timeCall(func, *args):
+    "Call func and return elapsed time in milliseconds"
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def summarize(samples: list):
+    "Summary statistics of timings in milliseconds"
+    arr = np.asarray(samples, dtype=np.float64)
+    if arr.size == 0:
+        return {"total": 0.0, "mean": 0.0, "min": 0.0, "max": 0.0,
+                "p95": 0.0}
+    return {
+        "total": float(arr.sum()),
+        "mean": float(arr.mean()),
+        "min": float(arr.min()),
+        "max": float(arr.max()),
+        "p95": float(np.percentile(arr, 95)),
+    }
+
+
+class OffscreenHost:
+    "An offscreen surface, a current context and a framebuffer object"
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        fmt = QSurfaceFormat.defaultFormat()
+        fmt.setDepthBufferSize(24)
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(fmt)
+        self.surface.create()
+        self.context = QOpenGLContext()
+        self.context.setFormat(fmt)
+        if not self.context.create():
+            raise RuntimeError("Could not create an opengl context")
+        if not self.context.makeCurrent(self.surface):
+            raise RuntimeError("Could not make the opengl context current")
+        self.fbo = QOpenGLFramebufferObject(
+            width, height, QOpenGLFramebufferObject.CombinedDepthStencil
+        )
+        self.fbo.bind()
+
+    def renderer(self):
+        "renderer string of the context"
+        return pygl.glGetString(pygl.GL_RENDERER).decode("utf-8")
+
+    def destroy(self):
+        self.fbo.release()
+        self.context.doneCurrent()
+
+
+def benchmarkWidget(name: str,
+                    host: OffscreenHost,
+                    frames: int,
+                    warmup: int):
+    "Render frames with a widget and collect its timings"
+    widgetClass = loadWidgetClass(name)
+    counter = DrawCallCounter()
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        widget = widgetClass()
+        constructTime = (time.perf_counter() - start) * 1000.0
+        widget.resize(host.width, host.height)
+        widget.context = CountingContext(widget.context, counter)
+        host.fbo.bind()
+        initTime = timeCall(widget.initializeGL)
+        resizeTime = timeCall(widget.resizeGL, host.width, host.height)
+        counter.patchPyOpenGL()
+        try:
+            for i in range(warmup):
+                widget.paintGL()
+            pygl.glFinish()
+            counter.count = 0
+            glState = getattr(widget, "glState", None)
+            if glState is not None:
+                glState.resetCounters()
+            uniforms = getattr(widget, "uniforms", None)
+            uniformCalls = {"uploads": 0, "avoided": 0}
+            paintTimes = []
+            finishTimes = []
+            for i in range(frames):
+                host.fbo.bind()
+                paintTimes.append(timeCall(widget.paintGL))
+                finishTimes.append(timeCall(pygl.glFinish))
+                if uniforms is not None:
+                    # uniform counters are per frame
+                    uniformCalls["uploads"] += uniforms.uploads
+                    uniformCalls["avoided"] += uniforms.avoided
+        finally:
+            counter.unpatchPyOpenGL()
+    frameTimes = np.add(paintTimes, finishTimes)
+    totalSeconds = float(frameTimes.sum()) / 1000.0
+    result = {
+        "widget": name,
+        "renderer": host.renderer(),
+        "width": host.width,
+        "height": host.height,
+        "frames": frames,
+        "phases": {
+            "construct": constructTime,
+            "initializeGL": initTime,
+            "resizeGL": resizeTime,
+            "paintGL": summarize(paintTimes),
+            "finish": summarize(finishTimes),
+            "frame": summarize(frameTimes),
+        },
+        "framesPerSecond": frames / totalSeconds if totalSeconds else 0.0,
+        "drawCalls": counter.count,
+        "drawCallsPerFrame": counter.count / frames if frames else 0.0,
+    }
+    if glState is not None:
+        # state changes sent to the driver and dropped by the cache
+        result["stateCalls"] = glState.stats()
+    if uniforms is not None:
+        result["uniformCalls"] = uniformCalls
+    textures = getattr(widget, "textures", None)
+    if textures is not None:
+        # shared between widgets, later widgets reuse earlier uploads
+        result["residentTextureBytes"] = textures.totalBytes()
+    return result
+
+
+def parseArguments(argv: list):
+    "parse benchmark arguments, unknown ones are left for qt"
+    parser = argparse.ArgumentParser(
+        description="Render tutorial widgets offscreen and time frames")
+    parser.add_argument("--widgets", nargs="+",
+                        default=list(WIDGETS.keys()),
+                        choices=list(WIDGETS.keys()))
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--output", default=None,
+                        help="json file, defaults to standard output")
+    parser.add_argument("--hardware", action="store_true",
+                        help="do not force mesa software rasterizer")
+    return parser.parse_known_args(argv)
+
+
+def main(argv=None):
+    args, qtArgs = parseArguments(sys.argv[1:] if argv is None else argv)
+    if not args.hardware:
+        # mesa picks llvmpipe or softpipe
+        os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+    app = QApplication([sys.argv[0]] + qtArgs)
+    host = OffscreenHost(args.width, args.height)
+    results = []
+    for name in args.widgets:
+        results.append(
+            benchmarkWidget(name, host, args.frames, args.warmup)
+        )
+    host.destroy()
+    report = json.dumps(results, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
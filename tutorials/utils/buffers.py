@@ -0,0 +1,246 @@
+# author: Kaan Eraslan
+# buffer objects helpers
+
+import ctypes
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLBuffer
+from PySide2.shiboken2 import VoidPtr
+
+from OpenGL import GL as pygl
+from OpenGL import error as glerror
+
+
+# smallest index type that can address a given number of vertices
+INDEX_TYPES = [
+    (np.uint8, pygl.GL_UNSIGNED_BYTE),
+    (np.uint16, pygl.GL_UNSIGNED_SHORT),
+    (np.uint32, pygl.GL_UNSIGNED_INT),
+]
+
+
+def dataPointer(array: np.ndarray, dtype=None):
+    """
+    VoidPtr over the data of an array, nothing is copied.
+
+    The array must be C contiguous and of dtype if one is given, and it
+    must stay alive until the gl call using the pointer returns
+    """
+    if not isinstance(array, np.ndarray):
+        raise ValueError(
+            "expected a numpy array, got {0}".format(type(array).__name__))
+    if not array.flags.c_contiguous:
+        raise ValueError("array is not C contiguous")
+    if dtype is not None and array.dtype != np.dtype(dtype):
+        raise ValueError(
+            "array has dtype {0}, expected {1}".format(array.dtype,
+                                                       np.dtype(dtype)))
+    return VoidPtr(array.ctypes.data, array.nbytes, False)
+
+
+def allocateArray(buffer: QOpenGLBuffer, array: np.ndarray, dtype=None):
+    "Allocate a bound buffer with the data of an array, no copy"
+    buffer.allocate(dataPointer(array, dtype), array.nbytes)
+
+
+def writeArray(buffer: QOpenGLBuffer, offset: int, array: np.ndarray,
+               dtype=None):
+    "Write an array at a byte offset of a bound buffer, no copy"
+    buffer.write(offset, dataPointer(array, dtype), array.nbytes)
+
+
+def alignedSize(size: int, alignment=256):
+    "size rounded up to a multiple of alignment"
+    return max(alignment, (size + alignment - 1) // alignment * alignment)
+
+
+class StreamingBuffer:
+    """
+    Buffer rewritten every frame without waiting for the gpu.
+
+    The storage is split in regions used in turn. A region is mapped with
+    unsynchronized writes while the gpu may still read the regions of the
+    previous frames, a fence placed after the draws reading a region is
+    waited for before the region is written again. With orphan the buffer
+    has a single region whose storage is given back to the driver before
+    every write, the driver then keeps the old storage alive until the gpu
+    is done with it.
+
+    write returns the byte offset of the data, attribute pointers or draw
+    offsets should use it.
+    """
+
+    def __init__(self,
+                 bufferType=QOpenGLBuffer.VertexBuffer,
+                 regionSize=64 * 1024,
+                 regions=3,
+                 orphan=False):
+        self.buffer = QOpenGLBuffer(bufferType)
+        self.buffer.setUsagePattern(QOpenGLBuffer.StreamDraw)
+        self.regionSize = alignedSize(regionSize)
+        self.orphan = orphan
+        self.regions = 1 if orphan else regions
+        self.region = -1
+        self.offset = 0
+        self.fences = [None] * self.regions
+        self.fencesSupported = True
+        self.mapSupported = True
+        self.writes = 0
+        self.waits = 0
+
+    def create(self):
+        "create and allocate the underlying buffer"
+        created = self.buffer.create()
+        self.buffer.bind()
+        self.buffer.allocate(self.regionSize * self.regions)
+        self.buffer.release()
+        return created
+
+    def grow(self, size: int):
+        "reallocate with regions of at least size bytes"
+        self.regionSize = alignedSize(1 << (size - 1).bit_length())
+        # the old storage is orphaned, its fences guard nothing now
+        self.deleteFences()
+        self.buffer.allocate(self.regionSize * self.regions)
+        self.region = -1
+
+    def write(self, array: np.ndarray, dtype=None):
+        "Write an array in the next region and return its byte offset"
+        pointer = dataPointer(array, dtype)
+        size = array.nbytes
+        self.buffer.bind()
+        if size > self.regionSize:
+            self.grow(size)
+        self.region = (self.region + 1) % self.regions
+        self.offset = self.region * self.regionSize
+        access = QOpenGLBuffer.RangeWrite | QOpenGLBuffer.RangeInvalidate
+        if self.orphan:
+            self.buffer.allocate(self.regionSize)
+        elif self.fencesSupported:
+            self.waitFence(self.region)
+            access |= QOpenGLBuffer.RangeUnsynchronized
+        if size:
+            mapped = None
+            if self.mapSupported:
+                mapped = self.buffer.mapRange(self.offset, size, access)
+                self.mapSupported = mapped is not None
+            if mapped is None:
+                self.buffer.write(self.offset, pointer, size)
+            else:
+                ctypes.memmove(int(mapped), array.ctypes.data, size)
+                self.buffer.unmap()
+        self.buffer.release()
+        self.writes += 1
+        return self.offset
+
+    def fence(self):
+        "Mark the end of the draws reading the region written last"
+        if self.orphan or not self.fencesSupported or self.region < 0:
+            return
+        self.deleteFence(self.region)
+        try:
+            self.fences[self.region] = pygl.glFenceSync(
+                pygl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        except (glerror.NullFunctionError, glerror.GLError):
+            # regions are then written with synchronized maps
+            self.fencesSupported = False
+
+    def waitFence(self, region: int):
+        "wait until the gpu is done reading a region"
+        sync = self.fences[region]
+        if sync is None:
+            return
+        status = pygl.glClientWaitSync(sync, pygl.GL_SYNC_FLUSH_COMMANDS_BIT,
+                                       0)
+        if status == pygl.GL_TIMEOUT_EXPIRED:
+            # more frames in flight than regions
+            self.waits += 1
+            pygl.glClientWaitSync(sync, pygl.GL_SYNC_FLUSH_COMMANDS_BIT,
+                                  1000000000)
+        self.deleteFence(region)
+
+    def deleteFence(self, region: int):
+        "delete the fence of a region"
+        if self.fences[region] is not None:
+            pygl.glDeleteSync(self.fences[region])
+            self.fences[region] = None
+
+    def deleteFences(self):
+        "delete all fences"
+        for region in range(self.regions):
+            self.deleteFence(region)
+
+    def stats(self):
+        "writes and writes that had to wait for the gpu"
+        return {"writes": self.writes, "waits": self.waits}
+
+    def destroy(self):
+        "destroy the underlying buffer"
+        self.deleteFences()
+        self.buffer.destroy()
+        self.region = -1
+
+
+def indexType(vertexCount: int):
+    "Smallest numpy and gl index types for vertexCount vertices"
+    for dtype, glType in INDEX_TYPES:
+        if vertexCount <= np.iinfo(dtype).max + 1:
+            return dtype, glType
+    raise ValueError(
+        "{0} vertices can not be indexed with 32 bit indices".format(
+            vertexCount
+        )
+    )
+
+
+class IndexBuffer:
+    """
+    Indices uploaded once to an element array buffer.
+
+    The element array buffer binding is part of the vertex array object
+    state, so if a vao is bound while the indices are set, binding the vao
+    later is enough to draw. Do not release the buffer while the vao is
+    bound, that would remove it from the vao.
+    """
+
+    def __init__(self):
+        self.ebo = QOpenGLBuffer(QOpenGLBuffer.IndexBuffer)
+        self.count = 0
+        self.dtype = None
+        self.glType = None
+
+    def create(self):
+        "create the underlying buffer"
+        return self.ebo.create()
+
+    def setIndices(self, indices: np.ndarray, vertexCount=None):
+        "Upload indices with the smallest type that fits vertexCount"
+        indices = np.asarray(indices).reshape(-1)
+        if vertexCount is None:
+            vertexCount = int(indices.max()) + 1 if indices.size else 0
+        if indices.size and int(indices.max()) >= vertexCount:
+            raise ValueError(
+                "index {0} is out of range for {1} vertices".format(
+                    int(indices.max()), vertexCount
+                )
+            )
+        self.dtype, self.glType = indexType(vertexCount)
+        data = np.ascontiguousarray(indices, dtype=self.dtype)
+        self.ebo.bind()
+        allocateArray(self.ebo, data)
+        self.count = data.size
+
+    def bind(self):
+        return self.ebo.bind()
+
+    def draw(self, funcs, mode: int, count=None, first=0):
+        "Draw count indices starting from first index"
+        count = self.count - first if count is None else count
+        offset = first * np.dtype(self.dtype).itemsize
+        funcs.glDrawElements(mode, count, self.glType, VoidPtr(offset))
+
+    def destroy(self):
+        "destroy the underlying buffer"
+        self.ebo.destroy()
+        self.count = 0
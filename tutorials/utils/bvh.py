@@ -0,0 +1,234 @@
+# author: Kaan Eraslan
+# bounding volume hierarchy over instance bounds
+#
+# The tree is an implicit complete binary tree kept in flat arrays: node i
+# has children 2i + 1 and 2i + 2, so every level is a contiguous slice and
+# building, refitting and querying are done a whole level at a time.
+
+import numpy as np
+
+from tutorials.utils.culling import aabbVisibility
+from tutorials.utils.culling import aabbFrustumTest
+
+
+def spreadBits(values: np.ndarray):
+    "insert two zero bits between the 10 lowest bits of each value"
+    x = values.astype(np.uint32) & np.uint32(0x3FF)
+    x = (x | (x << np.uint32(16))) & np.uint32(0x030000FF)
+    x = (x | (x << np.uint32(8))) & np.uint32(0x0300F00F)
+    x = (x | (x << np.uint32(4))) & np.uint32(0x030C30C3)
+    x = (x | (x << np.uint32(2))) & np.uint32(0x09249249)
+    return x
+
+
+def mortonCodes(points: np.ndarray):
+    "30 bit morton codes of points quantized in their bounding box"
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+    if points.shape[0] == 0:
+        return np.empty(0, dtype=np.uint32)
+    low = points.min(axis=0)
+    extent = points.max(axis=0) - low
+    extent[extent == 0] = 1.0
+    cells = ((points - low) / extent * 1023.0).astype(np.uint32)
+    return ((spreadBits(cells[:, 0]) << np.uint32(2)) |
+            (spreadBits(cells[:, 1]) << np.uint32(1)) |
+            spreadBits(cells[:, 2]))
+
+
+def expandRanges(starts: np.ndarray, ends: np.ndarray):
+    "concatenation of arange(start, end) for every range"
+    lengths = ends - starts
+    keep = lengths > 0
+    starts = starts[keep]
+    lengths = lengths[keep]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return (np.arange(total, dtype=np.int64) -
+            np.repeat(offsets - starts, lengths))
+
+
+def inverseDirections(directions: np.ndarray):
+    "1 / direction, zero components become a huge value of the same sign"
+    directions = np.asarray(directions, dtype=np.float32).reshape(-1, 3)
+    safe = np.where(np.abs(directions) < 1e-30,
+                    np.copysign(np.float32(1e-30), directions),
+                    directions)
+    return 1.0 / safe
+
+
+def rayBoxDistances(origins: np.ndarray,
+                    invDirections: np.ndarray,
+                    mins: np.ndarray,
+                    maxs: np.ndarray):
+    """
+    Slab test of rays against axis aligned boxes.
+
+    Arguments broadcast against each other as (M, 3) arrays. Returns the
+    distance along each ray to where it enters its box, 0 if the origin is
+    inside, inf if the box is missed or behind the ray.
+    """
+    t1 = (mins - origins) * invDirections
+    t2 = (maxs - origins) * invDirections
+    near = np.minimum(t1, t2).max(axis=-1)
+    far = np.maximum(t1, t2).min(axis=-1)
+    near = np.maximum(near, 0.0)
+    return np.where((near <= far) & (far >= 0.0), near, np.inf)
+
+
+class BVH:
+    """
+    Bounding volume hierarchy over axis aligned boxes.
+
+    Primitives are sorted along a morton curve and grouped in leaves of
+    leafSize primitives, the leaf count is padded to a power of two with
+    empty leaves whose bounds are nan. Queries go down the tree level by
+    level and only test the children of nodes that were hit, so hidden
+    parts of large scenes cost close to nothing.
+    """
+
+    def __init__(self, mins: np.ndarray, maxs: np.ndarray, leafSize=8):
+        self.leafSize = leafSize
+        self.build(mins, maxs)
+
+    def build(self, mins: np.ndarray, maxs: np.ndarray):
+        "Sort primitives and compute all bounds"
+        mins = np.asarray(mins, dtype=np.float32).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 3)
+        self.count = mins.shape[0]
+        self.order = np.argsort(mortonCodes((mins + maxs) * 0.5),
+                                kind="stable")
+        leaves = max(1, -(-self.count // self.leafSize))
+        self.depth = int(np.ceil(np.log2(leaves)))
+        self.leafCount = 1 << self.depth
+        nodeCount = 2 * self.leafCount - 1
+        self.nodeMins = np.full((nodeCount, 3), np.nan, dtype=np.float32)
+        self.nodeMaxs = np.full((nodeCount, 3), np.nan, dtype=np.float32)
+        self.leafStarts = np.arange(0, self.count, self.leafSize)
+        self.refit(mins, maxs)
+
+    def refit(self, mins: np.ndarray, maxs: np.ndarray):
+        """
+        Update bounds after primitives moved, the tree is kept.
+
+        Boxes are given in original order, their number should not change.
+        Queries get slower if primitives moved far away from their
+        neighbours, build again in that case.
+        """
+        mins = np.asarray(mins, dtype=np.float32).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 3)
+        if mins.shape[0] != self.count:
+            raise ValueError(
+                "refit expects {0} boxes, got {1}".format(
+                    self.count, mins.shape[0]))
+        self.primMins = mins[self.order]
+        self.primMaxs = maxs[self.order]
+        first = self.leafCount - 1
+        if self.count > 0:
+            leaves = self.leafStarts.shape[0]
+            self.nodeMins[first:first + leaves] = np.minimum.reduceat(
+                self.primMins, self.leafStarts, axis=0)
+            self.nodeMaxs[first:first + leaves] = np.maximum.reduceat(
+                self.primMaxs, self.leafStarts, axis=0)
+        # fmin and fmax skip the nan bounds of empty leaves
+        for depth in range(self.depth - 1, -1, -1):
+            start = (1 << depth) - 1
+            end = (1 << (depth + 1)) - 1
+            children = slice(end, 2 * end + 1)
+            np.fmin(self.nodeMins[children][0::2],
+                    self.nodeMins[children][1::2],
+                    out=self.nodeMins[start:end])
+            np.fmax(self.nodeMaxs[children][0::2],
+                    self.nodeMaxs[children][1::2],
+                    out=self.nodeMaxs[start:end])
+
+    def leafPrimitives(self, firstLeaves: np.ndarray, endLeaves: np.ndarray):
+        "sorted positions of primitives in leaf ranges"
+        starts = firstLeaves * self.leafSize
+        ends = np.minimum(endLeaves * self.leafSize, self.count)
+        return expandRanges(starts, ends)
+
+    def children(self, nodes: np.ndarray):
+        "children of nodes, left and right ones next to each other"
+        return (2 * nodes[:, np.newaxis] +
+                np.array([1, 2], dtype=np.int64)).ravel()
+
+    def queryFrustum(self, planes: np.ndarray):
+        "Indices of primitives whose boxes touch the frustum planes"
+        found = []
+        nodes = np.zeros(1, dtype=np.int64)
+        for depth in range(self.depth + 1):
+            if nodes.shape[0] == 0:
+                break
+            touching, inside = aabbFrustumTest(planes,
+                                               self.nodeMins[nodes],
+                                               self.nodeMaxs[nodes])
+            # every primitive under a node inside the frustum is visible
+            span = 1 << (self.depth - depth)
+            firstLeaves = (nodes[inside] - ((1 << depth) - 1)) * span
+            found.append(self.leafPrimitives(firstLeaves,
+                                             firstLeaves + span))
+            nodes = nodes[touching & ~inside]
+            if depth < self.depth:
+                nodes = self.children(nodes)
+        # leaves crossing a plane, test their primitives one by one
+        leaves = nodes - (self.leafCount - 1)
+        candidates = self.leafPrimitives(leaves, leaves + 1)
+        visible = aabbVisibility(planes,
+                                 self.primMins[candidates],
+                                 self.primMaxs[candidates])
+        found.append(candidates[visible])
+        return self.order[np.concatenate(found)]
+
+    def frustumMask(self, planes: np.ndarray):
+        "Visibility mask of primitives in original order"
+        mask = np.zeros(self.count, dtype=np.bool_)
+        mask[self.queryFrustum(planes)] = True
+        return mask
+
+    def queryRays(self, origins: np.ndarray, directions: np.ndarray):
+        """
+        Nearest box hit by each ray.
+
+        Returns the index of the hit primitive, -1 on a miss, and the
+        distance along the ray in units of the direction length.
+        """
+        origins = np.asarray(origins, dtype=np.float32).reshape(-1, 3)
+        invDirs = inverseDirections(directions)
+        rayCount = origins.shape[0]
+        hits = np.full(rayCount, -1, dtype=np.int64)
+        distances = np.full(rayCount, np.inf, dtype=np.float32)
+        # (ray, node) pairs still to test
+        rays = np.arange(rayCount, dtype=np.int64)
+        nodes = np.zeros(rayCount, dtype=np.int64)
+        for depth in range(self.depth + 1):
+            if nodes.shape[0] == 0:
+                return hits, distances
+            t = rayBoxDistances(origins[rays], invDirs[rays],
+                                self.nodeMins[nodes], self.nodeMaxs[nodes])
+            hit = np.isfinite(t)
+            rays = rays[hit]
+            nodes = nodes[hit]
+            if depth < self.depth:
+                rays = np.repeat(rays, 2)
+                nodes = self.children(nodes)
+        leaves = nodes - (self.leafCount - 1)
+        counts = (np.minimum((leaves + 1) * self.leafSize, self.count) -
+                  leaves * self.leafSize)
+        candidates = self.leafPrimitives(leaves, leaves + 1)
+        rays = np.repeat(rays, np.maximum(counts, 0))
+        t = rayBoxDistances(origins[rays], invDirs[rays],
+                            self.primMins[candidates],
+                            self.primMaxs[candidates])
+        hit = np.isfinite(t)
+        rays, candidates, t = rays[hit], candidates[hit], t[hit]
+        if rays.shape[0] == 0:
+            return hits, distances
+        # nearest hit per ray comes first after sorting by ray then distance
+        nearest = np.lexsort((t, rays))
+        rays, candidates, t = rays[nearest], candidates[nearest], t[nearest]
+        first = np.flatnonzero(np.r_[True, rays[1:] != rays[:-1]])
+        hits[rays[first]] = self.order[candidates[first]]
+        distances[rays[first]] = t[first]
+        return hits, distances
@@ -9,9 +9,17 @@ from tutorials.utils.utils import crossProduct
 from tutorials.utils.utils import scalar2vecMult
 from tutorials.utils.utils import vec2vecAdd
 from tutorials.utils.utils import vec2vecSubs
+from tutorials.utils.utils import qmat2arr
+from tutorials.utils.picking import cursorRay
+from tutorials.utils.quaternion import fromAxisAngle
+from tutorials.utils.quaternion import fromYawPitch
+from tutorials.utils.quaternion import multiplyQuaternions
+from tutorials.utils.quaternion import normalizeQuaternions
+from tutorials.utils.quaternion import quaternionMatrices
 from PySide2.QtGui import QVector3D
 from PySide2.QtGui import QMatrix4x4
 from PySide2.QtGui import QVector4D
+from PySide2.QtGui import QQuaternion
 
 
 class PureCamera:
@@ -188,6 +196,9 @@ class QtCamera:
         # Euler Angles for rotation
         self.yaw = -90.0
         self.pitch = 0.0
+        # orientation turned incrementally instead of euler angles
+        self.useQuaternion = False
+        self.orientation = QQuaternion()
 
         # camera options
         self.movementSpeed = 2.5
@@ -233,6 +244,37 @@ class QtCamera:
         elif direction == "left":
             self.position -= self.right * velocity
 
+    def moveLocal(self, forward: float, right: float):
+        "Move camera by distances along its front and right vectors"
+        self.position += self.front * forward + self.right * right
+
+    def setQuaternionMode(self, useQuaternion: bool):
+        "Turn the camera with a quaternion instead of euler angles"
+        self.useQuaternion = useQuaternion
+        if useQuaternion:
+            self.orientation = QQuaternion.fromAxisAndAngle(
+                QVector3D(0.0, 1.0, 0.0), -self.yaw
+            ) * QQuaternion.fromAxisAndAngle(
+                QVector3D(0.0, 0.0, 1.0), self.pitch)
+            self.updateFromOrientation()
+        else:
+            self.updateCameraVectors()
+
+    def updateFromOrientation(self):
+        "Camera vectors are the rotated x, y and z axes"
+        self.front = self.orientation.rotatedVector(QVector3D(1.0, 0.0, 0.0))
+        self.up = self.orientation.rotatedVector(QVector3D(0.0, 1.0, 0.0))
+        self.right = self.orientation.rotatedVector(QVector3D(0.0, 0.0, 1.0))
+
+    def turnOrientation(self, yawOffset: float, pitchOffset: float):
+        "Yaw around world up and pitch around camera right"
+        yawTurn = QQuaternion.fromAxisAndAngle(self.worldUp, -yawOffset)
+        pitchTurn = QQuaternion.fromAxisAndAngle(QVector3D(0.0, 0.0, 1.0),
+                                                 pitchOffset)
+        self.orientation = yawTurn * self.orientation * pitchTurn
+        self.orientation.normalize()
+        self.updateFromOrientation()
+
     def lookAround(self,
                    xoffset: float,
                    yoffset: float,
@@ -240,6 +282,7 @@ class QtCamera:
         "Look around with camera"
         xoffset *= self.movementSensitivity
         yoffset *= self.movementSensitivity
+        lastPitch = self.pitch
         self.yaw += xoffset
         self.pitch += yoffset
 
@@ -249,7 +292,10 @@ class QtCamera:
             elif self.pitch < -89.9:
                 self.pitch = -89.9
         #
-        self.updateCameraVectors()
+        if self.useQuaternion:
+            self.turnOrientation(xoffset, self.pitch - lastPitch)
+        else:
+            self.updateCameraVectors()
 
     def zoomInOut(self, yoffset: float,
                   zoomBound=45.0):
@@ -270,6 +316,21 @@ class QtCamera:
                     )
         return view
 
+    def getRay(self, x: float, y: float,
+               width: int, height: int,
+               projection: QMatrix4x4):
+        "World space ray under a widget position as origin and direction"
+        viewProjection = qmat2arr(projection * self.getViewMatrix())
+        return cursorRay(x, y, width, height, np.linalg.inv(viewProjection))
+
+    def pick(self, x: float, y: float,
+             width: int, height: int,
+             projection: QMatrix4x4,
+             picker):
+        "Nearest box of a RayPicker under a widget position and its distance"
+        origin, direction = self.getRay(x, y, width, height, projection)
+        return picker.pick(origin, direction)
+
     def setCameraWithVectors(self,
                              position=QVector3D(0.0, 0.0, 0.0),
                              worldUp=QVector3D(0.0, 1.0, 0.0),
@@ -338,3 +399,284 @@ class FPSCameraQt(QtCamera):
             self.position -= self.right * velocity
 
         self.position.setY(0.0)  # y val == 0
+
+
+class CameraCore:
+    """
+    Camera keeping its state in preallocated float32 arrays.
+
+    View, projection and view projection matrices are computed only after
+    the camera changed and are returned both as row major arrays and as
+    QMatrix4x4. The same objects are returned as long as the camera does
+    not change, they should not be modified by the caller. An idle camera
+    does not allocate anything.
+    """
+
+    __slots__ = (
+        "availableMoves",
+        "position", "front", "up", "right", "worldUp", "step",
+        "yaw", "pitch", "orientation", "useQuaternion",
+        "movementSpeed", "movementSensitivity", "zoom",
+        "aspect", "zNear", "zFar",
+        "view", "projection", "viewProjection",
+        "viewDirty", "projectionDirty", "viewProjectionDirty",
+        "viewQt", "projectionQt", "viewProjectionQt",
+    )
+
+    def __init__(self):
+        self.availableMoves = ("forward", "backward", "left", "right")
+        # Camera attributes
+        self.position = np.zeros(3, dtype=np.float32)
+        self.front = np.array([0.0, 0.0, -1.0], dtype=np.float32)
+        self.up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        self.right = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+        self.worldUp = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        self.step = np.zeros(3, dtype=np.float32)
+
+        # Euler Angles for rotation
+        self.yaw = -90.0
+        self.pitch = 0.0
+        # orientation turned incrementally instead of euler angles
+        self.orientation = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+        self.useQuaternion = False
+
+        # camera options
+        self.movementSpeed = 2.5
+        self.movementSensitivity = 0.00001
+        self.zoom = 45.0
+        self.aspect = 1.0
+        self.zNear = 0.2
+        self.zFar = 100.0
+
+        # cached matrices
+        self.view = np.identity(4, dtype=np.float32)
+        self.projection = np.zeros((4, 4), dtype=np.float32)
+        self.viewProjection = np.identity(4, dtype=np.float32)
+        self.viewQt = None
+        self.projectionQt = None
+        self.viewProjectionQt = None
+        self.viewDirty = True
+        self.projectionDirty = True
+        self.viewProjectionDirty = True
+        self.updateCameraVectors()
+
+    def viewChanged(self):
+        "mark view dependent matrices as dirty"
+        self.viewDirty = True
+        self.viewProjectionDirty = True
+        self.viewQt = None
+        self.viewProjectionQt = None
+
+    def projectionChanged(self):
+        "mark projection dependent matrices as dirty"
+        self.projectionDirty = True
+        self.viewProjectionDirty = True
+        self.projectionQt = None
+        self.viewProjectionQt = None
+
+    def updateCameraVectors(self):
+        "Update the camera vectors and compute a new front"
+        yawRadian = math.radians(self.yaw)
+        pitchRadian = math.radians(self.pitch)
+        pitchCos = math.cos(pitchRadian)
+        # unit length by construction
+        fx = math.cos(yawRadian) * pitchCos
+        fy = math.sin(pitchRadian)
+        fz = math.sin(yawRadian) * pitchCos
+        ux, uy, uz = (float(v) for v in self.worldUp)
+        # right = normalize(front x worldUp)
+        rx = fy * uz - fz * uy
+        ry = fz * ux - fx * uz
+        rz = fx * uy - fy * ux
+        norm = math.sqrt(rx * rx + ry * ry + rz * rz)
+        if norm > 0.0:
+            rx, ry, rz = rx / norm, ry / norm, rz / norm
+        self.front[0], self.front[1], self.front[2] = fx, fy, fz
+        self.right[0], self.right[1], self.right[2] = rx, ry, rz
+        # up = right x front, unit as both are unit and orthogonal
+        self.up[0] = ry * fz - rz * fy
+        self.up[1] = rz * fx - rx * fz
+        self.up[2] = rx * fy - ry * fx
+        self.viewChanged()
+
+    def setQuaternionMode(self, useQuaternion: bool):
+        "Turn the camera with a quaternion instead of euler angles"
+        self.useQuaternion = useQuaternion
+        if useQuaternion:
+            self.orientation[:] = fromYawPitch(self.yaw, self.pitch)[0]
+            self.updateFromOrientation()
+        else:
+            self.updateCameraVectors()
+
+    def updateFromOrientation(self):
+        "Camera vectors are the rotated x, y and z axes"
+        rotation = quaternionMatrices(self.orientation)[0]
+        self.front[:] = rotation[:3, 0]
+        self.up[:] = rotation[:3, 1]
+        self.right[:] = rotation[:3, 2]
+        self.viewChanged()
+
+    def setOrientation(self, quat):
+        """
+        Set orientation from a (w, x, y, z) unit quaternion.
+
+        Used to play camera paths interpolated with slerp, yaw and pitch
+        are recovered from the new front vector
+        """
+        self.orientation[:] = normalizeQuaternions(quat)[0]
+        self.updateFromOrientation()
+        fx, fy, fz = (float(v) for v in self.front)
+        self.pitch = math.degrees(math.asin(max(-1.0, min(1.0, fy))))
+        self.yaw = math.degrees(math.atan2(fz, fx))
+
+    def turnOrientation(self, yawOffset: float, pitchOffset: float):
+        "Yaw around world up and pitch around camera right"
+        yawTurn = fromAxisAngle(-yawOffset, self.worldUp)
+        pitchTurn = fromAxisAngle(pitchOffset, [0.0, 0.0, 1.0])
+        turned = multiplyQuaternions(
+            multiplyQuaternions(yawTurn, self.orientation), pitchTurn)
+        # keep unit length against rounding drift
+        self.orientation[:] = normalizeQuaternions(turned)[0]
+        self.updateFromOrientation()
+
+    def setPosition(self, x: float, y: float, z: float):
+        "Set camera position"
+        self.position[0], self.position[1], self.position[2] = x, y, z
+        self.viewChanged()
+
+    def setPerspective(self, aspect: float,
+                       zNear=None, zFar=None):
+        "Set aspect ratio and optionally clipping planes"
+        assert aspect != 0
+        self.aspect = aspect
+        if zNear is not None:
+            self.zNear = zNear
+        if zFar is not None:
+            self.zFar = zFar
+        assert self.zNear != self.zFar
+        self.projectionChanged()
+
+    def move(self, direction: str, deltaTime: float):
+        "Move camera in place"
+        velocity = self.movementSpeed * deltaTime
+        direction = direction.lower()
+        if direction not in self.availableMoves:
+            raise ValueError(
+                "Unknown direction {0}, available moves are {1}".format(
+                    direction, self.availableMoves
+                )
+            )
+        if direction == "forward":
+            np.multiply(self.front, velocity, out=self.step)
+        elif direction == "backward":
+            np.multiply(self.front, -velocity, out=self.step)
+        elif direction == "right":
+            np.multiply(self.right, velocity, out=self.step)
+        elif direction == "left":
+            np.multiply(self.right, -velocity, out=self.step)
+        self.position += self.step
+        self.viewChanged()
+
+    def moveLocal(self, forward: float, right: float):
+        "Move camera by distances along its front and right vectors"
+        np.multiply(self.front, forward, out=self.step)
+        self.position += self.step
+        np.multiply(self.right, right, out=self.step)
+        self.position += self.step
+        self.viewChanged()
+
+    def lookAround(self,
+                   xoffset: float,
+                   yoffset: float,
+                   pitchBound: bool):
+        "Look around with camera"
+        xoffset *= self.movementSensitivity
+        lastPitch = self.pitch
+        self.yaw += xoffset
+        self.pitch += yoffset * self.movementSensitivity
+
+        if pitchBound:
+            if self.pitch > 89.9:
+                self.pitch = 89.9
+            elif self.pitch < -89.9:
+                self.pitch = -89.9
+        #
+        if self.useQuaternion:
+            self.turnOrientation(xoffset, self.pitch - lastPitch)
+        else:
+            self.updateCameraVectors()
+
+    def zoomInOut(self, yoffset: float,
+                  zoomBound=45.0):
+        "Zoom with camera"
+        if self.zoom >= 1.0 and self.zoom <= zoomBound:
+            self.zoom -= yoffset
+        elif self.zoom <= 1.0:
+            self.zoom = 1.0
+        elif self.zoom >= zoomBound:
+            self.zoom = zoomBound
+        self.projectionChanged()
+
+    def getViewArray(self):
+        "row major view matrix, same as QMatrix4x4.lookAt"
+        if self.viewDirty:
+            view = self.view
+            view[0, :3] = self.right
+            view[1, :3] = self.up
+            np.negative(self.front, out=view[2, :3])
+            # translation is minus the position in camera space
+            np.dot(view[:3, :3], self.position, out=self.step)
+            np.negative(self.step, out=view[:3, 3])
+            self.viewDirty = False
+        return self.view
+
+    def getProjectionArray(self):
+        "row major perspective projection matrix"
+        if self.projectionDirty:
+            fieldHalfTan = math.tan(math.radians(self.zoom) / 2.0)
+            depth = self.zFar - self.zNear
+            proj = self.projection
+            proj[0, 0] = 1.0 / (self.aspect * fieldHalfTan)
+            proj[1, 1] = 1.0 / fieldHalfTan
+            proj[2, 2] = -(self.zFar + self.zNear) / depth
+            proj[2, 3] = -(2.0 * self.zFar * self.zNear) / depth
+            proj[3, 2] = -1.0
+            self.projectionDirty = False
+        return self.projection
+
+    def getViewProjectionArray(self):
+        "row major projection * view matrix"
+        if self.viewProjectionDirty:
+            np.matmul(self.getProjectionArray(), self.getViewArray(),
+                      out=self.viewProjection)
+            self.viewProjectionDirty = False
+        return self.viewProjection
+
+    def getViewMatrix(self):
+        "Obtain view matrix for camera"
+        if self.viewQt is None:
+            self.viewQt = QMatrix4x4(*self.getViewArray().ravel())
+        return self.viewQt
+
+    def getProjectionMatrix(self):
+        "Obtain projection matrix for camera"
+        if self.projectionQt is None:
+            self.projectionQt = QMatrix4x4(*self.getProjectionArray().ravel())
+        return self.projectionQt
+
+    def getViewProjectionMatrix(self):
+        "Obtain projection * view matrix for camera"
+        if self.viewProjectionQt is None:
+            self.viewProjectionQt = QMatrix4x4(
+                *self.getViewProjectionArray().ravel())
+        return self.viewProjectionQt
+
+    def getRay(self, x: float, y: float, width: int, height: int):
+        "World space ray under a widget position as origin and direction"
+        inverse = np.linalg.inv(self.getViewProjectionArray())
+        return cursorRay(x, y, width, height, inverse)
+
+    def pick(self, x: float, y: float, width: int, height: int, picker):
+        "Nearest box of a RayPicker under a widget position and its distance"
+        origin, direction = self.getRay(x, y, width, height)
+        return picker.pick(origin, direction)
@@ -0,0 +1,148 @@
+# author: Kaan Eraslan
+# input accumulated between frames and applied to a camera once per frame
+
+import math
+
+from PySide2.QtCore import Qt
+
+
+# held keys moving the camera
+KEY_DIRECTIONS = {
+    Qt.Key_W: "forward",
+    Qt.Key_Up: "forward",
+    Qt.Key_S: "backward",
+    Qt.Key_Down: "backward",
+    Qt.Key_A: "left",
+    Qt.Key_Left: "left",
+    Qt.Key_D: "right",
+    Qt.Key_Right: "right",
+}
+
+# sign of each direction along the camera front and right axes
+DIRECTION_AXES = {
+    "forward": (1.0, 0.0),
+    "backward": (-1.0, 0.0),
+    "right": (0.0, 1.0),
+    "left": (0.0, -1.0),
+}
+
+
+class InputController:
+    """
+    Per frame input state of a camera.
+
+    Events only record what happened: held keys, movement time budgets of
+    button clicks and summed turn offsets of mouse and sliders. apply
+    integrates all of it once per frame so the camera vectors and matrices
+    are updated at most once per presented frame. Held keys drive a
+    velocity that follows its target with an exponential response, the
+    camera speeds up and slows down smoothly instead of jumping.
+    """
+
+    def __init__(self, response=12.0):
+        # how fast velocity reaches its target, per second
+        self.response = response
+        self.heldDirections = set()
+        self.moveBudgets = {direction: 0.0 for direction in DIRECTION_AXES}
+        self.turn = [0.0, 0.0]
+        # velocity along camera front and right in units per second
+        self.velocity = [0.0, 0.0]
+
+    def keyEvent(self, key: int, pressed: bool):
+        "Record a key press or release, returns False for unknown keys"
+        direction = KEY_DIRECTIONS.get(key)
+        if direction is None:
+            return False
+        if pressed:
+            self.heldDirections.add(direction)
+        else:
+            self.heldDirections.discard(direction)
+        return True
+
+    def addMove(self, direction: str, seconds: float):
+        "Move at full speed in a direction for some seconds"
+        direction = direction.lower()
+        if direction not in self.moveBudgets:
+            raise ValueError(
+                "Unknown direction {0}, available moves are {1}".format(
+                    direction, list(self.moveBudgets.keys())
+                )
+            )
+        self.moveBudgets[direction] += seconds
+
+    def addTurn(self, xoffset: float, yoffset: float):
+        "Add turn offsets of sliders or mouse"
+        self.turn[0] += xoffset
+        self.turn[1] += yoffset
+
+    def isActive(self):
+        "True if applying input would still change the camera"
+        return bool(self.heldDirections or
+                    any(budget > 0.0 for budget in self.moveBudgets.values())
+                    or self.velocity[0] != 0.0 or self.velocity[1] != 0.0
+                    or self.turn[0] != 0.0 or self.turn[1] != 0.0)
+
+    def targetVelocity(self, speed: float):
+        "velocity asked by held keys, diagonals are not faster"
+        front = 0.0
+        right = 0.0
+        for direction in self.heldDirections:
+            axisFront, axisRight = DIRECTION_AXES[direction]
+            front += axisFront
+            right += axisRight
+        norm = math.sqrt(front * front + right * right)
+        if norm == 0.0:
+            return 0.0, 0.0
+        return front / norm * speed, right / norm * speed
+
+    def integrate(self, speed: float, steps: int, fixedStep: float):
+        "Distances along front and right covered in fixed steps"
+        front = 0.0
+        right = 0.0
+        targetFront, targetRight = self.targetVelocity(speed)
+        blend = min(1.0, self.response * fixedStep)
+        for _ in range(steps):
+            self.velocity[0] += (targetFront - self.velocity[0]) * blend
+            self.velocity[1] += (targetRight - self.velocity[1]) * blend
+            front += self.velocity[0] * fixedStep
+            right += self.velocity[1] * fixedStep
+        # stop instead of creeping forever
+        for axis in range(2):
+            if abs(self.velocity[axis]) < 1e-3 * max(speed, 1.0):
+                self.velocity[axis] = 0.0
+        # button clicks move at full speed until their budget is spent
+        moveTime = steps * fixedStep
+        for direction, budget in self.moveBudgets.items():
+            if budget <= 0.0:
+                continue
+            step = min(budget, moveTime)
+            axisFront, axisRight = DIRECTION_AXES[direction]
+            front += axisFront * speed * step
+            right += axisRight * speed * step
+            self.moveBudgets[direction] = budget - step
+        return front, right
+
+    def apply(self, camera, steps: int, fixedStep: float, pitchBound=True):
+        """
+        Apply input accumulated since the previous frame to a camera.
+
+        Returns True if the camera still has to move in the next frames
+        """
+        front, right = self.integrate(camera.movementSpeed, steps, fixedStep)
+        if front != 0.0 or right != 0.0:
+            camera.moveLocal(front, right)
+        if self.turn[0] != 0.0 or self.turn[1] != 0.0:
+            camera.lookAround(xoffset=self.turn[0],
+                              yoffset=self.turn[1],
+                              pitchBound=pitchBound)
+            self.turn[0] = 0.0
+            self.turn[1] = 0.0
+        return self.isActive()
+
+    def clear(self):
+        "Forget held keys and pending input, when focus is lost for example"
+        self.heldDirections.clear()
+        for direction in self.moveBudgets:
+            self.moveBudgets[direction] = 0.0
+        self.turn = [0.0, 0.0]
+        self.velocity = [0.0, 0.0]
@@ -0,0 +1,127 @@
+# author: Kaan Eraslan
+# view frustum culling of many objects at once
+#
+# Tests are done plane by plane on contiguous x, y, z columns, for a
+# handful of planes this is much faster than a (N, 3) x (3, 6) product.
+
+import numpy as np
+
+
+def frustumPlanes(viewProjection: np.ndarray):
+    """
+    Extract the 6 planes of the view frustum from projection * view.
+
+    The matrix is row major like computePerspectiveNp, planes are rows of
+    (a, b, c, d) with unit normals pointing inside the frustum in the
+    order left, right, bottom, top, near, far
+    """
+    mat = np.asarray(viewProjection, dtype=np.float32)
+    assert mat.shape == (4, 4)
+    planes = np.empty((6, 4), dtype=np.float32)
+    planes[0] = mat[3] + mat[0]  # left
+    planes[1] = mat[3] - mat[0]  # right
+    planes[2] = mat[3] + mat[1]  # bottom
+    planes[3] = mat[3] - mat[1]  # top
+    planes[4] = mat[3] + mat[2]  # near
+    planes[5] = mat[3] - mat[2]  # far
+    norms = np.linalg.norm(planes[:, :3], axis=1)
+    norms[norms == 0] = 1.0
+    return planes / norms[:, np.newaxis]
+
+
+def splitColumns(points: np.ndarray):
+    "contiguous x, y, z columns of (N, 3) points"
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+    return (np.ascontiguousarray(points[:, 0]),
+            np.ascontiguousarray(points[:, 1]),
+            np.ascontiguousarray(points[:, 2]))
+
+
+def planesTest(planes: np.ndarray, centers: np.ndarray, extents, sign):
+    """
+    Test centers against every plane.
+
+    With sign 1 an object is kept if center distance + its reach along the
+    plane normal is not negative for all planes, so it touches the
+    frustum. With sign -1 the reach is subtracted, so it is fully inside.
+    Extents are half sizes of boxes as (N, 3) or radii of spheres as a
+    scalar or (N,)
+    """
+    x, y, z = splitColumns(centers)
+    size = x.shape[0]
+    isBox = np.ndim(extents) == 2
+    if isBox:
+        ex, ey, ez = splitColumns(extents)
+    else:
+        radii = np.asarray(extents, dtype=np.float32)
+    visible = np.ones(size, dtype=np.bool_)
+    distance = np.empty(size, dtype=np.float32)
+    term = np.empty(size, dtype=np.float32)
+    for a, b, c, d in planes:
+        np.multiply(x, a, out=distance)
+        distance += np.multiply(y, b, out=term)
+        distance += np.multiply(z, c, out=term)
+        distance += d
+        if isBox:
+            # farthest corner along the normal
+            reach = np.multiply(ex, abs(a), out=term)
+            reach += ey * abs(b)
+            reach += ez * abs(c)
+        else:
+            reach = radii
+        if sign > 0:
+            distance += reach
+        else:
+            distance -= reach
+        visible &= distance >= 0
+    return visible
+
+
+def sphereVisibility(planes: np.ndarray, centers: np.ndarray, radii):
+    "Mask of spheres that are at least partly inside the frustum"
+    return planesTest(planes, centers, radii, 1)
+
+
+def aabbVisibility(planes: np.ndarray, mins: np.ndarray, maxs: np.ndarray):
+    "Mask of axis aligned boxes that are at least partly inside the frustum"
+    mins = np.asarray(mins, dtype=np.float32).reshape(-1, 3)
+    maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 3)
+    return planesTest(planes, (mins + maxs) * 0.5, (maxs - mins) * 0.5, 1)
+
+
+def aabbInsideFrustum(planes: np.ndarray, mins: np.ndarray,
+                      maxs: np.ndarray):
+    "Mask of axis aligned boxes that are completely inside the frustum"
+    mins = np.asarray(mins, dtype=np.float32).reshape(-1, 3)
+    maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 3)
+    return planesTest(planes, (mins + maxs) * 0.5, (maxs - mins) * 0.5, -1)
+
+
+def aabbFrustumTest(planes: np.ndarray, mins: np.ndarray, maxs: np.ndarray):
+    """
+    Masks of boxes touching and boxes completely inside the frustum.
+
+    Same as aabbVisibility and aabbInsideFrustum with a single pass over
+    the planes, for hierarchies that accept whole inner nodes
+    """
+    mins = np.asarray(mins, dtype=np.float32).reshape(-1, 3)
+    maxs = np.asarray(maxs, dtype=np.float32).reshape(-1, 3)
+    x, y, z = splitColumns((mins + maxs) * 0.5)
+    ex, ey, ez = splitColumns((maxs - mins) * 0.5)
+    size = x.shape[0]
+    touching = np.ones(size, dtype=np.bool_)
+    inside = np.ones(size, dtype=np.bool_)
+    distance = np.empty(size, dtype=np.float32)
+    reach = np.empty(size, dtype=np.float32)
+    term = np.empty(size, dtype=np.float32)
+    for a, b, c, d in planes:
+        np.multiply(x, a, out=distance)
+        distance += np.multiply(y, b, out=term)
+        distance += np.multiply(z, c, out=term)
+        distance += d
+        np.multiply(ex, abs(a), out=reach)
+        reach += np.multiply(ey, abs(b), out=term)
+        reach += np.multiply(ez, abs(c), out=term)
+        inside &= distance >= reach
+        touching &= distance >= -reach
+    return touching, inside
@@ -0,0 +1,368 @@
+# author: Kaan Eraslan
+# many meshes suballocated from shared vertex and index buffers
+
+import bisect
+import ctypes
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLBuffer
+
+from OpenGL import GL as pygl
+
+from tutorials.utils.buffers import IndexBuffer
+from tutorials.utils.buffers import allocateArray
+from tutorials.utils.buffers import writeArray
+from tutorials.utils.indirect import IndirectBuffer
+from tutorials.utils.indirect import elementsCommands
+from tutorials.utils.vertexlayout import VertexLayout
+
+
+class FreeListAllocator:
+    """
+    Ranges of a linear space handed out first fit.
+
+    Free ranges are kept sorted by offset, a freed range is merged with
+    its free neighbours so the list only holds holes between live ranges.
+    Sizes and offsets are in elements, vertices or indices for example.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.offsets = [0]  # start of every free range, sorted
+        self.sizes = [capacity]
+        self.used = {}  # offset: size of live ranges
+
+    def allocate(self, size: int):
+        "Offset of a new range or None if no hole is large enough"
+        if size <= 0:
+            raise ValueError("Can not allocate {0} elements".format(size))
+        for index, freeSize in enumerate(self.sizes):
+            if freeSize < size:
+                continue
+            offset = self.offsets[index]
+            if freeSize == size:
+                del self.offsets[index]
+                del self.sizes[index]
+            else:
+                self.offsets[index] += size
+                self.sizes[index] -= size
+            self.used[offset] = size
+            return offset
+        return None
+
+    def free(self, offset: int):
+        "Give back a range and merge it with free neighbours"
+        size = self.used.pop(offset)
+        index = bisect.bisect_left(self.offsets, offset)
+        # merge with the next free range
+        if (index < len(self.offsets) and
+                self.offsets[index] == offset + size):
+            size += self.sizes[index]
+            del self.offsets[index]
+            del self.sizes[index]
+        # merge with the previous free range
+        if (index > 0 and
+                self.offsets[index - 1] + self.sizes[index - 1] == offset):
+            self.sizes[index - 1] += size
+        else:
+            self.offsets.insert(index, offset)
+            self.sizes.insert(index, size)
+
+    def grow(self, capacity: int):
+        "Extend the space, the new elements are free"
+        if capacity <= self.capacity:
+            return
+        added = capacity - self.capacity
+        if self.offsets and self.offsets[-1] + self.sizes[-1] == self.capacity:
+            self.sizes[-1] += added
+        else:
+            self.offsets.append(self.capacity)
+            self.sizes.append(added)
+        self.capacity = capacity
+
+    def reset(self, used: dict):
+        "Replace live ranges, after compaction for example"
+        self.used = dict(used)
+        end = sum(used.values())
+        if end > self.capacity:
+            raise ValueError("Live ranges do not fit in the capacity")
+        self.offsets = [end] if end < self.capacity else []
+        self.sizes = [self.capacity - end] if end < self.capacity else []
+
+    def usedSize(self):
+        return sum(self.used.values())
+
+    def freeSize(self):
+        return sum(self.sizes)
+
+    def largestFree(self):
+        return max(self.sizes, default=0)
+
+    def fragmentation(self):
+        "0 when all free space is one range, close to 1 when it is scattered"
+        free = self.freeSize()
+        if free == 0:
+            return 0.0
+        return 1.0 - self.largestFree() / free
+
+
+class MeshHandle:
+    """
+    Where a mesh lives in a geometry pool.
+
+    Indices are relative to the mesh, draws add baseVertex to them. The
+    pool updates handles in place when it moves meshes.
+    """
+
+    __slots__ = ("baseVertex", "vertexCount", "firstIndex", "indexCount")
+
+    def __init__(self, baseVertex: int, vertexCount: int,
+                 firstIndex: int, indexCount: int):
+        self.baseVertex = baseVertex
+        self.vertexCount = vertexCount
+        self.firstIndex = firstIndex
+        self.indexCount = indexCount
+
+
+class GeometryPool:
+    """
+    Meshes of a vertex layout packed in one vertex and one index buffer.
+
+    Every mesh is drawn from the same vao with its baseVertex and
+    firstIndex, switching meshes changes no binding. Meshes of the draw
+    list are drawn with a single multi draw indirect call where the
+    context has it, one draw per mesh otherwise. Vertex and index
+    ranges come from free list allocators. When no hole is large enough
+    the pool is compacted if that makes room and grown otherwise. A copy
+    of the data is kept on the cpu side so moving meshes is a single
+    upload of each buffer.
+
+    Meshes are uploaded as they are added. The element buffer binding is
+    part of the vao state, uploads put back the binding they replaced so
+    meshes can be added with any vao bound.
+    """
+
+    def __init__(self, layout: VertexLayout,
+                 vertexCapacity=65536,
+                 indexCapacity=3 * 65536):
+        self.layout = layout
+        self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.indexBuffer = IndexBuffer()
+        self.indexBuffer.dtype = np.uint32
+        self.indexBuffer.glType = pygl.GL_UNSIGNED_INT
+        self.vertices = np.zeros(vertexCapacity, dtype=layout.dtype)
+        self.indices = np.zeros(indexCapacity, dtype=np.uint32)
+        self.vertexAllocator = FreeListAllocator(vertexCapacity)
+        self.indexAllocator = FreeListAllocator(indexCapacity)
+        self.meshes = []
+        # meshes drawn with a single multi draw indirect call
+        self.drawList = []
+        self.indirect = IndirectBuffer()
+
+    def create(self):
+        "create and allocate the underlying buffers"
+        created = self.vbo.create() and self.indexBuffer.create()
+        self.uploadAll()
+        return created
+
+    def uploadAll(self):
+        "(re)allocate both buffers with the cpu copies"
+        self.vbo.bind()
+        allocateArray(self.vbo, self.vertices)
+        self.vbo.release()
+        previous = self.bindElements()
+        allocateArray(self.indexBuffer.ebo, self.indices)
+        pygl.glBindBuffer(pygl.GL_ELEMENT_ARRAY_BUFFER, previous)
+
+    def bindElements(self):
+        """
+        Bind the element buffer and return the binding it replaced.
+
+        The element buffer binding belongs to the bound vao, releasing
+        would detach the index buffer of whatever vao is bound, the
+        previous binding is restored instead
+        """
+        previous = int(pygl.glGetIntegerv(
+            pygl.GL_ELEMENT_ARRAY_BUFFER_BINDING))
+        self.indexBuffer.ebo.bind()
+        return previous
+
+    def allocate(self, allocator: FreeListAllocator, size: int, kind: str):
+        "a range of size elements, compacts or grows the pool if needed"
+        offset = allocator.allocate(size)
+        if offset is None and allocator.freeSize() >= size:
+            self.defragment()
+            offset = allocator.allocate(size)
+        if offset is None:
+            self.grow(kind, max(2 * allocator.capacity,
+                                allocator.usedSize() + size))
+            offset = allocator.allocate(size)
+        return offset
+
+    def grow(self, kind: str, capacity: int):
+        "enlarge the vertex or index storage"
+        if kind == "vertex":
+            grown = np.zeros(capacity, dtype=self.vertices.dtype)
+            grown[:self.vertices.size] = self.vertices
+            self.vertices = grown
+            self.vertexAllocator.grow(capacity)
+        else:
+            grown = np.zeros(capacity, dtype=np.uint32)
+            grown[:self.indices.size] = self.indices
+            self.indices = grown
+            self.indexAllocator.grow(capacity)
+        if self.vbo.isCreated():
+            self.uploadAll()
+
+    def add(self, vertices: np.ndarray, indices=None):
+        "Store a mesh and return its handle, indices start at 0 per mesh"
+        vertices = self.layout.view(vertices)
+        vertexCount = vertices.size
+        if indices is not None:
+            indices = np.ascontiguousarray(indices, dtype=np.uint32)
+            indices = indices.reshape(-1)
+            if indices.size and int(indices.max()) >= vertexCount:
+                raise ValueError(
+                    "index {0} is out of range for {1} vertices".format(
+                        int(indices.max()), vertexCount))
+        baseVertex = self.allocate(self.vertexAllocator, vertexCount,
+                                   "vertex")
+        handle = MeshHandle(baseVertex, vertexCount, 0, 0)
+        self.vertices[baseVertex:baseVertex + vertexCount] = vertices
+        # registered before allocating indices, compaction may move it
+        self.meshes.append(handle)
+        if indices is not None and indices.size:
+            handle.firstIndex = self.allocate(self.indexAllocator,
+                                              indices.size, "index")
+            handle.indexCount = indices.size
+            start = handle.firstIndex
+            self.indices[start:start + indices.size] = indices
+            self.writeIndices(handle)
+        self.writeVertices(handle)
+        return handle
+
+    def writeVertices(self, handle: MeshHandle):
+        "upload the vertices of a mesh"
+        if not self.vbo.isCreated():
+            return
+        start = handle.baseVertex
+        self.vbo.bind()
+        writeArray(self.vbo, start * self.layout.stride,
+                   self.vertices[start:start + handle.vertexCount])
+        self.vbo.release()
+
+    def writeIndices(self, handle: MeshHandle):
+        "upload the indices of a mesh"
+        if not self.indexBuffer.ebo.isCreated():
+            return
+        start = handle.firstIndex
+        previous = self.bindElements()
+        writeArray(self.indexBuffer.ebo, start * 4,
+                   self.indices[start:start + handle.indexCount])
+        pygl.glBindBuffer(pygl.GL_ELEMENT_ARRAY_BUFFER, previous)
+
+    def remove(self, handle: MeshHandle):
+        "Free the ranges of a mesh"
+        self.meshes.remove(handle)
+        if handle in self.drawList:
+            self.drawList.remove(handle)
+            self.uploadCommands()
+        self.vertexAllocator.free(handle.baseVertex)
+        if handle.indexCount:
+            self.indexAllocator.free(handle.firstIndex)
+        handle.vertexCount = 0
+        handle.indexCount = 0
+
+    def defragment(self):
+        "Move every mesh to the start of the buffers, handles are updated"
+        vertices = np.zeros_like(self.vertices)
+        indices = np.zeros_like(self.indices)
+        vertexEnd = 0
+        indexEnd = 0
+        usedVertices = {}
+        usedIndices = {}
+        for handle in sorted(self.meshes, key=lambda mesh: mesh.baseVertex):
+            start = handle.baseVertex
+            count = handle.vertexCount
+            vertices[vertexEnd:vertexEnd + count] = \
+                self.vertices[start:start + count]
+            handle.baseVertex = vertexEnd
+            usedVertices[vertexEnd] = count
+            vertexEnd += count
+            if handle.indexCount:
+                start = handle.firstIndex
+                count = handle.indexCount
+                indices[indexEnd:indexEnd + count] = \
+                    self.indices[start:start + count]
+                handle.firstIndex = indexEnd
+                usedIndices[indexEnd] = count
+                indexEnd += count
+        self.vertices = vertices
+        self.indices = indices
+        self.vertexAllocator.reset(usedVertices)
+        self.indexAllocator.reset(usedIndices)
+        if self.vbo.isCreated():
+            self.uploadAll()
+            self.uploadCommands()
+
+    def bindings(self):
+        "bindings of the pool for a VertexArrayCache"
+        return [(self.layout, self.vbo)]
+
+    def draw(self, funcs, handle: MeshHandle, mode=pygl.GL_TRIANGLES):
+        "Draw a mesh, the vao of the pool should be bound"
+        if handle.indexCount == 0:
+            funcs.glDrawArrays(mode, handle.baseVertex, handle.vertexCount)
+            return
+        pygl.glDrawElementsBaseVertex(mode, handle.indexCount,
+                                      pygl.GL_UNSIGNED_INT,
+                                      ctypes.c_void_p(handle.firstIndex * 4),
+                                      handle.baseVertex)
+
+    def commands(self, handles: list, instanceCounts=1, baseInstances=0):
+        "DrawElementsIndirectCommand structs of indexed meshes"
+        if any(handle.indexCount == 0 for handle in handles):
+            raise ValueError("Indirect draws need indexed meshes")
+        ranges = np.array([(handle.indexCount, handle.firstIndex,
+                            handle.baseVertex) for handle in handles],
+                          dtype=np.int64).reshape(-1, 3)
+        return elementsCommands(ranges[:, 0], ranges[:, 1], ranges[:, 2],
+                                instanceCounts, baseInstances)
+
+    def setDrawList(self, handles: list):
+        """
+        Meshes drawn by drawIndirect.
+
+        Their commands are uploaded here and again only when the pool
+        moves meshes, drawing the list costs the same for any length. The
+        indirect buffer is created by the first call, the context should
+        be current
+        """
+        self.drawList = list(handles)
+        self.indirect.setCommands(self.commands(self.drawList))
+
+    def uploadCommands(self):
+        "upload commands of the draw list once it was set"
+        if self.indirect.commands is not None:
+            self.indirect.setCommands(self.commands(self.drawList))
+
+    def drawIndirect(self, mode=pygl.GL_TRIANGLES):
+        "Draw the draw list with one call, the vao of the pool should be bound"
+        self.indirect.draw(mode, pygl.GL_UNSIGNED_INT)
+
+    def stats(self):
+        "meshes, used elements and fragmentation of both buffers"
+        return {
+            "meshes": len(self.meshes),
+            "vertices": self.vertexAllocator.usedSize(),
+            "indices": self.indexAllocator.usedSize(),
+            "vertexFragmentation": self.vertexAllocator.fragmentation(),
+            "indexFragmentation": self.indexAllocator.fragmentation(),
+        }
+
+    def destroy(self):
+        "destroy the underlying buffers"
+        self.vbo.destroy()
+        self.indexBuffer.destroy()
+        self.indirect.destroy()
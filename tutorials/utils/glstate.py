@@ -0,0 +1,100 @@
+# author: Kaan Eraslan
+# redundant gl state change elimination
+
+from PySide2.QtGui import QOpenGLBuffer
+
+
+class GLStateCache:
+    """
+    Keep track of bound objects and drop calls that change nothing.
+
+    Every call that goes through the cache and reaches the driver is
+    counted as issued, every dropped call as skipped. The cache only
+    knows about calls made through it, call invalidate after code outside
+    of it changed the state, for example a QPainter on the widget.
+    """
+
+    def __init__(self, funcs):
+        self.funcs = funcs
+        self.issued = 0
+        self.skipped = 0
+        self.invalidate()
+
+    def invalidate(self):
+        "Forget everything, next calls reach the driver"
+        self.program = None
+        self.vertexArray = None
+        self.buffers = {}  # buffer type: buffer id
+        self.activeUnit = None
+        self.textures = {}  # texture unit: (target, texture id)
+        self.capabilities = {}  # capability: enabled
+
+    def invalidateBuffer(self, bufferType):
+        "Forget the buffer bound to a target"
+        self.buffers.pop(bufferType, None)
+
+    def invalidateTextures(self):
+        "Forget texture bindings, after textures were recreated"
+        self.activeUnit = None
+        self.textures = {}
+
+    def resetCounters(self):
+        self.issued = 0
+        self.skipped = 0
+
+    def stats(self):
+        "issued and skipped call counts"
+        return {"issued": self.issued, "skipped": self.skipped}
+
+    def changed(self, isChanged: bool):
+        "count a call"
+        if isChanged:
+            self.issued += 1
+        else:
+            self.skipped += 1
+        return isChanged
+
+    def useProgram(self, program):
+        "bind a QOpenGLShaderProgram"
+        programId = program.programId()
+        if self.changed(self.program != programId):
+            program.bind()
+            self.program = programId
+
+    def bindVertexArray(self, vao):
+        "bind a QOpenGLVertexArrayObject"
+        vaoId = vao.objectId()
+        if self.changed(self.vertexArray != vaoId):
+            vao.bind()
+            self.vertexArray = vaoId
+            # element buffer binding belongs to the vao
+            self.invalidateBuffer(QOpenGLBuffer.IndexBuffer)
+
+    def bindBuffer(self, buffer):
+        "bind a QOpenGLBuffer"
+        bufferType = buffer.type()
+        bufferId = buffer.bufferId()
+        if self.changed(self.buffers.get(bufferType) != bufferId):
+            buffer.bind()
+            self.buffers[bufferType] = bufferId
+
+    def bindTexture(self, texture, unit: int):
+        "bind a QOpenGLTexture to a texture unit"
+        key = (texture.target(), texture.textureId())
+        if self.changed(self.textures.get(unit) != key):
+            # QOpenGLTexture.bind also makes the unit active
+            texture.bind(unit)
+            self.textures[unit] = key
+            self.activeUnit = unit
+
+    def enable(self, capability: int):
+        "glEnable"
+        if self.changed(self.capabilities.get(capability) is not True):
+            self.funcs.glEnable(capability)
+            self.capabilities[capability] = True
+
+    def disable(self, capability: int):
+        "glDisable"
+        if self.changed(self.capabilities.get(capability) is not False):
+            self.funcs.glDisable(capability)
+            self.capabilities[capability] = False
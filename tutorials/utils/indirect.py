@@ -0,0 +1,183 @@
+# author: Kaan Eraslan
+# draw commands read by the gpu from a buffer
+
+import ctypes
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLContext
+
+from OpenGL import GL as pygl
+from OpenGL import error as glerror
+
+
+# layouts of the structs read by glMultiDraw*Indirect
+DRAW_ARRAYS_COMMAND = np.dtype([
+    ("count", np.uint32),
+    ("instanceCount", np.uint32),
+    ("first", np.uint32),
+    ("baseInstance", np.uint32),
+])
+
+DRAW_ELEMENTS_COMMAND = np.dtype([
+    ("count", np.uint32),
+    ("instanceCount", np.uint32),
+    ("firstIndex", np.uint32),
+    ("baseVertex", np.int32),
+    ("baseInstance", np.uint32),
+])
+
+# bytes of an index of each gl index type
+INDEX_SIZES = {
+    pygl.GL_UNSIGNED_BYTE: 1,
+    pygl.GL_UNSIGNED_SHORT: 2,
+    pygl.GL_UNSIGNED_INT: 4,
+}
+
+
+def multiDrawIndirectSupported():
+    """
+    True if the current context has glMultiDraw*Indirect.
+
+    That is desktop opengl 4.3 or GL_ARB_multi_draw_indirect, which itself
+    needs the GL_DRAW_INDIRECT_BUFFER target of GL_ARB_draw_indirect
+    """
+    context = QOpenGLContext.currentContext()
+    if context is None or context.isOpenGLES():
+        return False
+    surfaceFormat = context.format()
+    version = (surfaceFormat.majorVersion(), surfaceFormat.minorVersion())
+    if version >= (4, 3):
+        return True
+    return (context.hasExtension(b"GL_ARB_draw_indirect") and
+            context.hasExtension(b"GL_ARB_multi_draw_indirect"))
+
+
+def arraysCommands(counts, firsts, instanceCounts=1, baseInstances=0):
+    "DrawArraysIndirectCommand structs, arguments broadcast like numpy"
+    counts = np.asarray(counts).reshape(-1)
+    commands = np.zeros(counts.size, dtype=DRAW_ARRAYS_COMMAND)
+    commands["count"] = counts
+    commands["instanceCount"] = instanceCounts
+    commands["first"] = firsts
+    commands["baseInstance"] = baseInstances
+    return commands
+
+
+def elementsCommands(counts, firstIndices, baseVertices,
+                     instanceCounts=1, baseInstances=0):
+    "DrawElementsIndirectCommand structs, arguments broadcast like numpy"
+    counts = np.asarray(counts).reshape(-1)
+    commands = np.zeros(counts.size, dtype=DRAW_ELEMENTS_COMMAND)
+    commands["count"] = counts
+    commands["instanceCount"] = instanceCounts
+    commands["firstIndex"] = firstIndices
+    commands["baseVertex"] = baseVertices
+    commands["baseInstance"] = baseInstances
+    return commands
+
+
+class IndirectBuffer:
+    """
+    Draw commands in a GL_DRAW_INDIRECT_BUFFER.
+
+    setCommands uploads a structured array of DRAW_ARRAYS_COMMAND or
+    DRAW_ELEMENTS_COMMAND, draw submits all of them with a single
+    glMultiDrawArraysIndirect or glMultiDrawElementsIndirect call, so the
+    python side cost of a frame does not depend on the number of objects.
+    QOpenGLBuffer has no indirect buffer type, the buffer is handled with
+    plain gl calls. The buffer is created by the first setCommands and
+    only if the context has multi draw indirect, other contexts never
+    touch the indirect target and get one instanced draw per command.
+    """
+
+    def __init__(self):
+        self.bufferId = None
+        self.capacity = 0
+        self.commands = None
+        self.multiDrawSupported = None
+        # unknown until commands are set with a current context
+        self.multiDrawSupported = None
+
+    def create(self):
+        "create the underlying buffer, False without multi draw indirect"
+        if self.multiDrawSupported is None:
+            self.multiDrawSupported = multiDrawIndirectSupported()
+        if not self.multiDrawSupported:
+            return False
+        if self.bufferId is None:
+            self.bufferId = int(pygl.glGenBuffers(1))
+        return self.bufferId != 0
+
+    def setCommands(self, commands: np.ndarray):
+        "Keep commands and upload them, the buffer grows if needed"
+        if commands.dtype not in (DRAW_ARRAYS_COMMAND, DRAW_ELEMENTS_COMMAND):
+            raise ValueError(
+                "Unknown draw command dtype {0}".format(commands.dtype))
+        commands = np.ascontiguousarray(commands)
+        self.commands = commands
+        if not self.create():
+            return
+        pygl.glBindBuffer(pygl.GL_DRAW_INDIRECT_BUFFER, self.bufferId)
+        if commands.nbytes > self.capacity:
+            pygl.glBufferData(pygl.GL_DRAW_INDIRECT_BUFFER, commands.nbytes,
+                              commands, pygl.GL_DYNAMIC_DRAW)
+            self.capacity = commands.nbytes
+        elif commands.nbytes:
+            pygl.glBufferSubData(pygl.GL_DRAW_INDIRECT_BUFFER, 0,
+                                 commands.nbytes, commands)
+        pygl.glBindBuffer(pygl.GL_DRAW_INDIRECT_BUFFER, 0)
+
+    def draw(self, mode: int, indexType=pygl.GL_UNSIGNED_INT):
+        """
+        Submit the uploaded commands.
+
+        The vao holding vertex, instance and index buffers should be bound,
+        indexType is only used by element commands
+        """
+        if self.commands is None or self.commands.size == 0:
+            return
+        elements = self.commands.dtype == DRAW_ELEMENTS_COMMAND
+        if self.multiDrawSupported:
+            pygl.glBindBuffer(pygl.GL_DRAW_INDIRECT_BUFFER, self.bufferId)
+            try:
+                if elements:
+                    pygl.glMultiDrawElementsIndirect(
+                        mode, indexType, None, self.commands.size,
+                        DRAW_ELEMENTS_COMMAND.itemsize)
+                else:
+                    pygl.glMultiDrawArraysIndirect(
+                        mode, None, self.commands.size,
+                        DRAW_ARRAYS_COMMAND.itemsize)
+                return
+            except (glerror.NullFunctionError, glerror.GLError):
+                self.multiDrawSupported = False
+            finally:
+                pygl.glBindBuffer(pygl.GL_DRAW_INDIRECT_BUFFER, 0)
+        self.drawEach(mode, indexType, elements)
+
+    def drawEach(self, mode: int, indexType: int, elements: bool):
+        "one draw call per command, without multi draw indirect"
+        if np.any(self.commands["baseInstance"]):
+            raise ValueError(
+                "baseInstance needs multi draw indirect support")
+        indexSize = INDEX_SIZES[indexType]
+        for command in self.commands.tolist():
+            if elements:
+                count, instanceCount, firstIndex, baseVertex, _ = command
+                pygl.glDrawElementsInstancedBaseVertex(
+                    mode, count, indexType,
+                    ctypes.c_void_p(firstIndex * indexSize),
+                    instanceCount, baseVertex)
+            else:
+                count, instanceCount, first, _ = command
+                pygl.glDrawArraysInstanced(mode, first, count, instanceCount)
+
+    def destroy(self):
+        "destroy the underlying buffer"
+        if self.bufferId is not None:
+            pygl.glDeleteBuffers(1, [self.bufferId])
+        self.bufferId = None
+        self.capacity = 0
+        self.commands = None
+        self.multiDrawSupported = None
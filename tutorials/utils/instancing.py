@@ -0,0 +1,100 @@
+# author: Kaan Eraslan
+# per instance data for instanced rendering
+
+import numpy as np
+
+from tutorials.utils.buffers import StreamingBuffer
+from tutorials.utils.buffers import allocateArray
+from tutorials.utils.buffers import writeArray
+from tutorials.utils.transform import toColumnMajor
+from tutorials.utils.vertexlayout import VertexLayout
+
+from PySide2.QtGui import QOpenGLBuffer
+
+from OpenGL import GL as pygl
+
+
+class InstanceBuffer:
+    """
+    Model matrices of every instance in a single vertex buffer.
+
+    A mat4 attribute takes 4 consecutive locations, one per column, so the
+    matrices are stored in column major order and each column gets an
+    attribute divisor of 1 which makes it advance once per instance
+    instead of once per vertex.
+
+    With streaming the matrices go to a StreamingBuffer ring, matrices
+    changing every frame are written without waiting for the gpu. The
+    data then moves between regions and pointAttributes should be called
+    with the vao bound after setMatrices.
+    """
+
+    def __init__(self, location: int, streaming=False, regions=3):
+        self.location = location
+        self.layout = VertexLayout([("aModel", np.float32, (4, 4))],
+                                   locations={"aModel": location},
+                                   divisor=1)
+        self.stream = None
+        if streaming:
+            self.stream = StreamingBuffer(regions=regions)
+            self.vbo = self.stream.buffer
+        else:
+            self.vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+            self.vbo.setUsagePattern(QOpenGLBuffer.DynamicDraw)
+        self.count = 0
+        # byte offset of the matrices and where the attributes point
+        self.offset = 0
+        self.pointedOffset = 0
+
+    def create(self):
+        "create the underlying buffer"
+        if self.stream is not None:
+            return self.stream.create()
+        return self.vbo.create()
+
+    def setMatrices(self, matrices: np.ndarray):
+        "Upload row major (N, 4, 4) model matrices"
+        data = toColumnMajor(matrices)
+        self.count = data.shape[0]
+        if self.stream is not None:
+            self.offset = self.stream.write(data, np.float32)
+            return
+        self.vbo.bind()
+        if data.nbytes > self.vbo.size():
+            allocateArray(self.vbo, data, np.float32)
+        else:
+            writeArray(self.vbo, 0, data, np.float32)
+        self.vbo.release()
+
+    def setupAttributes(self, funcs):
+        "Set instanced attribute pointers, the vao should be bound"
+        self.vbo.bind()
+        self.layout.setupAttributes(funcs)
+        self.vbo.release()
+
+    def pointAttributes(self, funcs):
+        "Point attributes at the last matrices, the vao should be bound"
+        if self.pointedOffset == self.offset:
+            return
+        self.vbo.bind()
+        self.layout.setupAttributes(funcs, self.offset)
+        self.vbo.release()
+        self.pointedOffset = self.offset
+
+    def draw(self, mode: int, first: int, vertexCount: int):
+        "Draw every instance with a single draw call"
+        if self.count == 0:
+            return
+        pygl.glDrawArraysInstanced(mode, first, vertexCount, self.count)
+        if self.stream is not None:
+            self.stream.fence()
+
+    def destroy(self):
+        "destroy the underlying buffer"
+        if self.stream is not None:
+            self.stream.destroy()
+        else:
+            self.vbo.destroy()
+        self.count = 0
+        self.offset = 0
+        self.pointedOffset = 0
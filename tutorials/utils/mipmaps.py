@@ -0,0 +1,230 @@
+# author: Kaan Eraslan
+# mipmap chains computed with numpy and cached on disk
+
+import hashlib
+import math
+import os
+
+import numpy as np
+
+from PySide2.QtGui import QImage
+from PySide2.QtGui import QOpenGLTexture
+
+from tutorials.utils.buffers import dataPointer
+
+
+# half width of each filter in units of the source pixel spacing
+FILTER_SUPPORT = {
+    "box": 0.5,
+    "lanczos": 3.0,
+}
+
+
+def lanczos(x: np.ndarray, a=3.0):
+    "lanczos kernel with a lobes"
+    x = np.abs(x)
+    return np.where(x < a, np.sinc(x) * np.sinc(x / a), 0.0)
+
+
+def resampleWeights(size: int, newSize: int, filterName: str):
+    """
+    Source indices and weights of every output sample along an axis.
+
+    Returns two (newSize, taps) arrays, weights of a row sum to 1 and
+    indices out of the source are clamped to its edges
+    """
+    if filterName not in FILTER_SUPPORT:
+        raise ValueError(
+            "Unknown filter {0}, available filters are {1}".format(
+                filterName, list(FILTER_SUPPORT.keys())))
+    scale = max(size / newSize, 1.0)
+    support = FILTER_SUPPORT[filterName] * scale
+    centers = (np.arange(newSize) + 0.5) * scale - 0.5
+    taps = int(math.ceil(support * 2)) + 1
+    first = np.floor(centers - support).astype(np.int64) + 1
+    indices = first[:, np.newaxis] + np.arange(taps)
+    distances = (indices - centers[:, np.newaxis]) / scale
+    if filterName == "box":
+        weights = (np.abs(distances) <= 0.5).astype(np.float64)
+    else:
+        weights = lanczos(distances, FILTER_SUPPORT[filterName])
+    sums = weights.sum(axis=1, keepdims=True)
+    sums[sums == 0] = 1.0
+    weights = (weights / sums).astype(np.float32)
+    return np.clip(indices, 0, size - 1), weights
+
+
+def resampleAxis(pixels: np.ndarray, newSize: int, axis: int,
+                 filterName: str):
+    "Resample a (H, W, C) float32 array along one axis"
+    indices, weights = resampleWeights(pixels.shape[axis], newSize,
+                                       filterName)
+    shape = [1, 1, 1]
+    shape[axis] = newSize
+    result = None
+    # one gather per tap, vectorized over the whole image
+    for tap in range(indices.shape[1]):
+        weight = weights[:, tap].reshape(shape)
+        sample = np.take(pixels, indices[:, tap], axis=axis) * weight
+        if result is None:
+            result = sample
+        else:
+            result += sample
+    return result
+
+
+def downsample(pixels: np.ndarray, filterName: str):
+    "Next mip level of a (H, W, C) float32 array"
+    height, width = pixels.shape[:2]
+    pixels = resampleAxis(pixels, max(1, height // 2), 0, filterName)
+    return resampleAxis(pixels, max(1, width // 2), 1, filterName)
+
+
+def resize(pixels: np.ndarray, width: int, height: int, filterName="lanczos"):
+    "(H, W, 4) uint8 image resampled to another size"
+    current = pixels.astype(np.float32)
+    if current.shape[0] != height:
+        current = resampleAxis(current, height, 0, filterName)
+    if current.shape[1] != width:
+        current = resampleAxis(current, width, 1, filterName)
+    return np.clip(np.rint(current), 0, 255).astype(np.uint8)
+
+
+def mipLevelCount(width: int, height: int):
+    "levels down to 1x1"
+    return int(math.floor(math.log2(max(width, height, 1)))) + 1
+
+
+def buildMipChain(pixels: np.ndarray, filterName="lanczos"):
+    "All mip levels of a (H, W, 4) uint8 image as uint8 arrays"
+    levels = [np.ascontiguousarray(pixels, dtype=np.uint8)]
+    current = levels[0].astype(np.float32)
+    for _ in range(mipLevelCount(pixels.shape[1], pixels.shape[0]) - 1):
+        current = downsample(current, filterName)
+        levels.append(
+            np.clip(np.rint(current), 0, 255).astype(np.uint8))
+    return levels
+
+
+def imageArray(image: QImage):
+    "Copy of a RGBA8888 QImage as a (H, W, 4) uint8 array"
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    width = image.width()
+    height = image.height()
+    rowBytes = image.bytesPerLine()
+    buffer = np.frombuffer(image.constBits(), dtype=np.uint8,
+                           count=rowBytes * height)
+    # rows may be padded
+    return buffer.reshape(height, rowBytes)[:, :width * 4].reshape(
+        height, width, 4).copy()
+
+
+def uploadMipChain(texture: QOpenGLTexture, levels: list):
+    "Allocate immutable storage and upload every level of a chain"
+    height, width = levels[0].shape[:2]
+    texture.setAutoMipMapGenerationEnabled(False)
+    texture.setFormat(QOpenGLTexture.RGBA8_UNorm)
+    texture.setSize(width, height)
+    texture.setMipLevels(len(levels))
+    texture.allocateStorage(QOpenGLTexture.RGBA, QOpenGLTexture.UInt8)
+    for level, pixels in enumerate(levels):
+        texture.setData(level, QOpenGLTexture.RGBA, QOpenGLTexture.UInt8,
+                        dataPointer(np.ascontiguousarray(pixels), np.uint8))
+
+
+def defaultCacheDir():
+    "cache folder, can be changed with TUTORIALS_MIPMAP_CACHE"
+    return os.environ.get(
+        "TUTORIALS_MIPMAP_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache",
+                     "pyside-opengl-tutorials", "mipmaps")
+    )
+
+
+class MipmapCache:
+    """
+    Mip chains stored on disk as one .npy file per level.
+
+    Entries are keyed by image path, size, modification time and filter,
+    an edited image gets a new entry. Levels are read with memory mapping
+    so they go from the page cache to the upload without a decode.
+    """
+
+    def __init__(self, cacheDir=None):
+        self.cacheDir = defaultCacheDir() if cacheDir is None else cacheDir
+
+    def key(self, path: str, filterName: str):
+        "cache key of an image"
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        hasher = hashlib.sha256()
+        hasher.update(
+            "{0}|{1}|{2}|{3}".format(path, stat.st_size, stat.st_mtime_ns,
+                                     filterName).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def levelPath(self, key: str, level: int):
+        "file of a level"
+        return os.path.join(self.cacheDir,
+                            "{0}.{1}.npy".format(key, level))
+
+    def load(self, path: str, filterName: str):
+        "Cached levels of an image or None"
+        key = self.key(path, filterName)
+        firstPath = self.levelPath(key, 0)
+        if not os.path.exists(firstPath):
+            return None
+        try:
+            levels = [np.load(firstPath, mmap_mode="r")]
+            height, width = levels[0].shape[:2]
+            for level in range(1, mipLevelCount(width, height)):
+                levels.append(np.load(self.levelPath(key, level),
+                                      mmap_mode="r"))
+        except (OSError, ValueError):
+            # partly written or corrupted entry
+            return None
+        return levels
+
+    def save(self, path: str, filterName: str, levels: list):
+        "Store levels, level 0 is written last so partial entries miss"
+        os.makedirs(self.cacheDir, exist_ok=True)
+        key = self.key(path, filterName)
+        for level in reversed(range(len(levels))):
+            target = self.levelPath(key, level)
+            temporary = target + ".tmp"
+            with open(temporary, "wb") as f:
+                np.save(f, levels[level])
+            os.replace(temporary, target)
+
+
+_sharedCache = None
+
+
+def sharedMipmapCache():
+    "Mipmap cache shared by all widgets"
+    global _sharedCache
+    if _sharedCache is None:
+        _sharedCache = MipmapCache()
+    return _sharedCache
+
+
+def decodeMipChain(path: str, filterName="lanczos", cache=None):
+    """
+    Mip chain of an image, from the cache if possible.
+
+    Runs on any thread, QImage is reentrant
+    """
+    cache = sharedMipmapCache() if cache is None else cache
+    levels = cache.load(path, filterName)
+    if levels is None:
+        image = QImage(path)
+        if image.isNull():
+            raise ValueError("Could not load image {0}".format(path))
+        # flipped for opengl texture coordinates
+        levels = buildMipChain(imageArray(image.mirrored()), filterName)
+        try:
+            cache.save(path, filterName, levels)
+        except OSError as error:
+            # a read only cache only costs the next start
+            print(error)
+    return levels
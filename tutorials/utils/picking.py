@@ -0,0 +1,90 @@
+# author: Kaan Eraslan
+# mouse picking of instances with rays cast from the camera
+
+import numpy as np
+
+from tutorials.utils.bvh import inverseDirections
+from tutorials.utils.culling import splitColumns
+
+
+def cursorRay(x: float, y: float,
+              width: int, height: int,
+              inverseViewProjection: np.ndarray):
+    """
+    World space ray under a cursor position in widget coordinates.
+
+    The point is unprojected on the near and the far plane, the ray starts
+    on the near plane and its direction is normalized
+    """
+    ndcX = 2.0 * x / width - 1.0
+    ndcY = 1.0 - 2.0 * y / height  # widget y axis points down
+    points = np.array([[ndcX, ndcY, -1.0, 1.0],
+                       [ndcX, ndcY, 1.0, 1.0]], dtype=np.float32)
+    points = points @ np.asarray(inverseViewProjection, dtype=np.float32).T
+    points = points[:, :3] / points[:, 3:]
+    direction = points[1] - points[0]
+    direction /= np.linalg.norm(direction)
+    return points[0], direction
+
+
+class RayPicker:
+    """
+    Nearest axis aligned box hit by a ray.
+
+    Boxes are kept as contiguous x, y, z columns and the slab test runs one
+    axis at a time in preallocated buffers, which keeps a query on 100k
+    boxes under a millisecond. Call setBoxes again when instances move.
+    """
+
+    def __init__(self, mins=None, maxs=None):
+        self.count = 0
+        if mins is not None:
+            self.setBoxes(mins, maxs)
+
+    def setBoxes(self, mins: np.ndarray, maxs: np.ndarray):
+        "Set (N, 3) box bounds"
+        self.minColumns = splitColumns(mins)
+        self.maxColumns = splitColumns(maxs)
+        self.count = self.minColumns[0].shape[0]
+        self.near = np.empty(self.count, dtype=np.float32)
+        self.far = np.empty(self.count, dtype=np.float32)
+        self.t = np.empty(self.count, dtype=np.float32)
+        self.missed = np.empty(self.count, dtype=np.bool_)
+
+    def distances(self, origin: np.ndarray, direction: np.ndarray):
+        """
+        Distance along the ray to every box, inf for missed boxes.
+
+        The returned array is reused by the next query
+        """
+        origin = np.asarray(origin, dtype=np.float32).reshape(3)
+        invDir = inverseDirections(direction)[0]
+        near, far, t = self.near, self.far, self.t
+        # boxes behind the origin are cut by starting at 0
+        near.fill(0.0)
+        far.fill(np.inf)
+        for axis in range(3):
+            # the sign of the direction tells which slab plane comes first
+            enters, leaves = self.minColumns[axis], self.maxColumns[axis]
+            if invDir[axis] < 0:
+                enters, leaves = leaves, enters
+            np.subtract(enters, origin[axis], out=t)
+            t *= invDir[axis]
+            np.maximum(near, t, out=near)
+            np.subtract(leaves, origin[axis], out=t)
+            t *= invDir[axis]
+            np.minimum(far, t, out=far)
+        np.greater(near, far, out=self.missed)
+        np.copyto(near, np.inf, where=self.missed)
+        return near
+
+    def pick(self, origin: np.ndarray, direction: np.ndarray):
+        "Index of the nearest box hit and its distance, -1 and inf on miss"
+        if self.count == 0:
+            return -1, np.inf
+        distances = self.distances(origin, direction)
+        index = int(np.argmin(distances))
+        distance = float(distances[index])
+        if distance == np.inf:
+            return -1, distance
+        return index, distance
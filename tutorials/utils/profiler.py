@@ -0,0 +1,271 @@
+# author: Kaan Eraslan
+# cpu and gpu frame profiler for the tutorial widgets
+
+import contextlib
+import csv
+import json
+import time
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLTimerQuery
+from PySide2.QtWidgets import QOpenGLWidget
+
+
+EVENT_DTYPE = np.dtype([
+    ("scope", np.int32),  # index in FrameProfiler.scopeNames
+    ("frame", np.int64),
+    ("start", np.int64),  # perf_counter_ns at start
+    ("duration", np.int64),  # nanoseconds
+    ("gpu", np.bool_),
+])
+
+
+class EventRingBuffer:
+    "Fixed size buffer of timing events, the oldest ones are overwritten"
+
+    def __init__(self, capacity: int):
+        assert capacity > 0
+        self.capacity = capacity
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.index = 0
+        self.count = 0
+
+    def append(self, scope: int, frame: int, start: int,
+               duration: int, gpu: bool):
+        "add an event"
+        event = self.events[self.index]
+        event["scope"] = scope
+        event["frame"] = frame
+        event["start"] = start
+        event["duration"] = duration
+        event["gpu"] = gpu
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        "events from oldest to newest"
+        if self.count < self.capacity:
+            return self.events[:self.count]
+        return np.concatenate(
+            (self.events[self.index:], self.events[:self.index])
+        )
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+
+class FrameProfiler:
+    """
+    Time cpu scopes with perf_counter_ns and gpu work with timer queries.
+
+    Gpu results arrive a few frames late, a small pool of queries is cycled
+    so that reading a result does not wait for the gpu in most cases.
+    """
+
+    def __init__(self, capacity: int = 4096, gpuQueries: int = 4):
+        self.buffer = EventRingBuffer(capacity)
+        self.scopeNames = []
+        self.scopeIds = {}
+        self.frame = 0
+        self.frameStart = 0
+        self.gpuQueryCount = gpuQueries
+        self.gpuQueries = []
+        self.gpuPending = {}  # query index: (frame, cpu start)
+        self.gpuActive = None
+
+    def scopeId(self, name: str):
+        "index of a scope name"
+        if name not in self.scopeIds:
+            self.scopeIds[name] = len(self.scopeNames)
+            self.scopeNames.append(name)
+        return self.scopeIds[name]
+
+    def record(self, name: str, start: int, duration: int,
+               gpu=False, frame=None):
+        "record a finished event"
+        frame = self.frame if frame is None else frame
+        self.buffer.append(self.scopeId(name), frame, start, duration, gpu)
+
+    @contextlib.contextmanager
+    def scope(self, name: str):
+        "Time the enclosed block on cpu"
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter_ns() - start)
+
+    def beginFrame(self):
+        "start a new frame"
+        self.frame += 1
+        self.frameStart = time.perf_counter_ns()
+
+    def endFrame(self):
+        "end current frame and collect available gpu results"
+        self.record("frame", self.frameStart,
+                    time.perf_counter_ns() - self.frameStart)
+        self.collectGpu(wait=False)
+
+    def createGpuQueries(self):
+        """
+        Create gpu timer queries, the context should be current.
+
+        Returns False if timer queries are not supported by the context
+        """
+        self.gpuQueries = []
+        for i in range(self.gpuQueryCount):
+            query = QOpenGLTimerQuery()
+            if not query.create():
+                self.gpuQueries = []
+                return False
+            self.gpuQueries.append(query)
+        return True
+
+    def beginGpu(self):
+        "start timing gpu work of current frame"
+        if not self.gpuQueries:
+            return
+        index = self.frame % len(self.gpuQueries)
+        if index in self.gpuPending:
+            # pool is exhausted, this waits for an old frame
+            self.collectQuery(index, wait=True)
+        self.gpuQueries[index].begin()
+        self.gpuActive = index
+
+    def endGpu(self):
+        "stop timing gpu work of current frame"
+        if self.gpuActive is None:
+            return
+        self.gpuQueries[self.gpuActive].end()
+        self.gpuPending[self.gpuActive] = (self.frame, self.frameStart)
+        self.gpuActive = None
+
+    def collectQuery(self, index: int, wait: bool):
+        "record result of a pending query"
+        query = self.gpuQueries[index]
+        if not wait and not query.isResultAvailable():
+            return False
+        frame, start = self.gpuPending.pop(index)
+        self.record("gpu", start, query.waitForResult(), gpu=True,
+                    frame=frame)
+        return True
+
+    def collectGpu(self, wait=False):
+        "record results of pending gpu queries"
+        for index in list(self.gpuPending.keys()):
+            self.collectQuery(index, wait)
+
+    def destroyGpuQueries(self):
+        "destroy timer queries, the context should be current"
+        for query in self.gpuQueries:
+            query.destroy()
+        self.gpuQueries = []
+        self.gpuPending = {}
+
+    def durations(self, name: str):
+        "durations of a scope in milliseconds from oldest to newest"
+        if name not in self.scopeIds:
+            return np.zeros(0, dtype=np.float64)
+        events = self.buffer.ordered()
+        mask = events["scope"] == self.scopeIds[name]
+        return events["duration"][mask] / 1e6
+
+    def stats(self):
+        "p50, p95, p99, mean and max of every scope in milliseconds"
+        result = {}
+        for name in self.scopeNames:
+            durations = self.durations(name)
+            if durations.size == 0:
+                continue
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            result[name] = {
+                "count": int(durations.size),
+                "mean": float(durations.mean()),
+                "max": float(durations.max()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+            }
+        return result
+
+    def exportCsv(self, path: str):
+        "write recorded events to a csv file"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope", "frame", "start_ms",
+                             "duration_ms", "gpu"])
+            for event in self.buffer.ordered():
+                writer.writerow([
+                    self.scopeNames[event["scope"]],
+                    int(event["frame"]),
+                    event["start"] / 1e6,
+                    event["duration"] / 1e6,
+                    int(event["gpu"]),
+                ])
+
+    def exportChromeTrace(self, path: str):
+        """
+        Write recorded events in chrome trace event format.
+
+        Open the file with chrome://tracing or https://ui.perfetto.dev, cpu
+        scopes are on thread 0, gpu frames on thread 1 and start at the
+        cpu start of their frame
+        """
+        traceEvents = []
+        for event in self.buffer.ordered():
+            traceEvents.append({
+                "name": self.scopeNames[event["scope"]],
+                "ph": "X",
+                "ts": event["start"] / 1e3,
+                "dur": event["duration"] / 1e3,
+                "pid": 0,
+                "tid": int(event["gpu"]),
+                "args": {"frame": int(event["frame"])},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": traceEvents,
+                       "displayTimeUnit": "ms"}, f)
+
+
+def profiledWidget(widgetClass, profiler=None):
+    """
+    Subclass a tutorial widget so that initializeGL and paintGL are timed.
+
+    The profiler is available as the profiler attribute of the widget
+    """
+
+    def __init__(self, *args, **kwargs):
+        widgetClass.__init__(self, *args, **kwargs)
+        self.profiler = FrameProfiler() if profiler is None else profiler
+
+    def initializeGL(self):
+        with self.profiler.scope("initializeGL"):
+            widgetClass.initializeGL(self)
+        self.profiler.createGpuQueries()
+        # tutorial widgets shadow context() with an attribute, queries
+        # belong to the context of the widget itself
+        widgetContext = QOpenGLWidget.context(self)
+        widgetContext.aboutToBeDestroyed.connect(self.cleanUpProfiler)
+
+    def cleanUpProfiler(self):
+        "free the timer queries before the context goes away"
+        self.makeCurrent()
+        self.profiler.destroyGpuQueries()
+        self.doneCurrent()
+
+    def paintGL(self):
+        self.profiler.beginFrame()
+        self.profiler.beginGpu()
+        with self.profiler.scope("paintGL"):
+            widgetClass.paintGL(self)
+        self.profiler.endGpu()
+        self.profiler.endFrame()
+
+    return type("Profiled" + widgetClass.__name__,
+                (widgetClass,),
+                {"__init__": __init__,
+                 "initializeGL": initializeGL,
+                 "cleanUpProfiler": cleanUpProfiler,
+                 "paintGL": paintGL})
@@ -0,0 +1,139 @@
+# author: Kaan Eraslan
+# batched quaternions
+# quaternions are rows of (N, 4) float32 arrays in (w, x, y, z) order,
+# same as QQuaternion(scalar, x, y, z). Angles are in degrees and
+# rotations follow the right hand rule like QMatrix4x4.rotate
+
+import numpy as np
+
+from tutorials.utils.transform import asBatch
+from tutorials.utils.transform import asScalarBatch
+from tutorials.utils.transform import identityMatrices
+from tutorials.utils.transform import normalizeVectors
+
+
+def identityQuaternions(size: int):
+    "Create a batch of identity quaternions"
+    quats = np.zeros((size, 4), dtype=np.float32)
+    quats[:, 0] = 1.0
+    return quats
+
+
+def normalizeQuaternions(quats):
+    "Normalize (N, 4) quaternions, zero rows are left as is"
+    return normalizeVectors(asBatch(quats, 4))
+
+
+def conjugateQuaternions(quats):
+    "Conjugates, also inverses of unit quaternions"
+    quats = asBatch(quats, 4).copy()
+    quats[:, 1:] *= -1.0
+    return quats
+
+
+def fromAxisAngle(angles, axes):
+    "Unit quaternions rotating around axes with angles in degrees"
+    axes = asBatch(axes, 3)
+    size = max(axes.shape[0], np.asarray(angles).size)
+    angles = asScalarBatch(angles, size)
+    if axes.shape[0] != size:
+        axes = np.repeat(axes, size, axis=0)
+    axes = normalizeVectors(axes)
+    halfRadians = np.radians(angles) * 0.5
+    quats = np.empty((size, 4), dtype=np.float32)
+    quats[:, 0] = np.cos(halfRadians)
+    quats[:, 1:] = axes * np.sin(halfRadians)[:, np.newaxis]
+    return quats
+
+
+def multiplyQuaternions(quats1, quats2):
+    """
+    Hamilton products of quaternion batches.
+
+    Rotating with the product is rotating with quats2 first then with
+    quats1, like multiplying rotation matrices. Batches of size 1 are
+    broadcast.
+    """
+    quats1 = asBatch(quats1, 4)
+    quats2 = asBatch(quats2, 4)
+    w1, x1, y1, z1 = quats1[:, 0], quats1[:, 1], quats1[:, 2], quats1[:, 3]
+    w2, x2, y2, z2 = quats2[:, 0], quats2[:, 1], quats2[:, 2], quats2[:, 3]
+    size = max(quats1.shape[0], quats2.shape[0])
+    quats = np.empty((size, 4), dtype=np.float32)
+    quats[:, 0] = w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2
+    quats[:, 1] = w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2
+    quats[:, 2] = w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2
+    quats[:, 3] = w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2
+    return quats
+
+
+def rotateVectors(quats, vecs):
+    "Rotate (N, 3) vectors with unit quaternions, size 1 batches broadcast"
+    quats = asBatch(quats, 4)
+    vecs = asBatch(vecs, 3)
+    w = quats[:, 0:1]
+    u = quats[:, 1:]
+    # v + 2w (u x v) + 2 u x (u x v)
+    t = 2.0 * np.cross(u, vecs)
+    return (vecs + w * t + np.cross(u, t)).astype(np.float32)
+
+
+def slerp(quats1, quats2, ts):
+    """
+    Spherical linear interpolation between unit quaternions.
+
+    Interpolates along the shortest arc, nearly equal quaternions are
+    interpolated linearly then normalized. ts is a scalar or (N,)
+    """
+    quats1 = asBatch(quats1, 4)
+    quats2 = asBatch(quats2, 4)
+    size = max(quats1.shape[0], quats2.shape[0], np.asarray(ts).size)
+    ts = asScalarBatch(ts, size)[:, np.newaxis]
+    dots = np.einsum("ij,ij->i",
+                     np.broadcast_to(quats1, (size, 4)),
+                     np.broadcast_to(quats2, (size, 4)))
+    # q and -q are the same rotation, take the closer one
+    quats2 = np.where((dots < 0.0)[:, np.newaxis], -quats2, quats2)
+    dots = np.abs(dots)
+    close = dots > 0.9995
+    theta = np.arccos(np.clip(dots, -1.0, 1.0))[:, np.newaxis]
+    sinTheta = np.sin(theta)
+    sinTheta[close] = 1.0
+    weights1 = np.sin((1.0 - ts) * theta) / sinTheta
+    weights2 = np.sin(ts * theta) / sinTheta
+    weights1[close] = 1.0 - ts[close]
+    weights2[close] = ts[close]
+    quats = weights1 * quats1 + weights2 * quats2
+    return normalizeVectors(quats.astype(np.float32))
+
+
+def quaternionMatrices(quats):
+    "Row major (N, 4, 4) rotation matrices of unit quaternions"
+    quats = asBatch(quats, 4)
+    w, x, y, z = quats[:, 0], quats[:, 1], quats[:, 2], quats[:, 3]
+    mats = identityMatrices(quats.shape[0])
+    mats[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    mats[:, 0, 1] = 2.0 * (x * y - w * z)
+    mats[:, 0, 2] = 2.0 * (x * z + w * y)
+    mats[:, 1, 0] = 2.0 * (x * y + w * z)
+    mats[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    mats[:, 1, 2] = 2.0 * (y * z - w * x)
+    mats[:, 2, 0] = 2.0 * (x * z - w * y)
+    mats[:, 2, 1] = 2.0 * (y * z + w * x)
+    mats[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    return mats
+
+
+def fromYawPitch(yaws, pitches):
+    """
+    Camera orientations from euler angles in degrees.
+
+    Rotating the x axis with them gives the front vector of the cameras:
+    (cos yaw cos pitch, sin pitch, sin yaw cos pitch), the y axis gives
+    their up vector and the z axis their right vector
+    """
+    yaws = np.asarray(yaws, dtype=np.float32).reshape(-1)
+    pitches = np.asarray(pitches, dtype=np.float32).reshape(-1)
+    yawRotations = fromAxisAngle(-yaws, [0.0, 1.0, 0.0])
+    pitchRotations = fromAxisAngle(pitches, [0.0, 0.0, 1.0])
+    return multiplyQuaternions(yawRotations, pitchRotations)
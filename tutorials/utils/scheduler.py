@@ -0,0 +1,95 @@
+# author: Kaan Eraslan
+# frame scheduling for widgets that render on demand
+
+from PySide2.QtCore import QElapsedTimer
+from PySide2.QtCore import QObject
+from PySide2.QtCore import QTimer
+from PySide2.QtCore import Qt
+
+
+class FrameScheduler(QObject):
+    """
+    Schedule frames on demand with an optional frame cap.
+
+    Input handlers call requestFrame instead of updating the widget. Every
+    request made before the next frame is presented is merged into that
+    frame, so the widget should keep input as pending state and apply it
+    once at the start of paintGL after calling beginFrame. Time between
+    presented frames is measured with a QElapsedTimer and can be consumed
+    in fixed steps for deterministic movement.
+    """
+
+    def __init__(self, render,
+                 maxFramesPerSecond=None,
+                 fixedStep=1.0 / 120.0,
+                 maxDeltaTime=0.1,
+                 parent=None):
+        super().__init__(parent)
+        # render schedules a repaint, QOpenGLWidget.update for example
+        self.render = render
+        self.fixedStep = fixedStep
+        # long pauses between frames on demand are not simulated
+        self.maxDeltaTime = maxDeltaTime
+        self.minInterval = 0
+        self.setMaxFramesPerSecond(maxFramesPerSecond)
+        self.clock = QElapsedTimer()
+        self.clock.start()
+        self.lastFrame = None
+        self.accumulator = 0.0
+        self.deltaTime = 0.0
+        self.frames = 0
+        self.requests = 0
+        self.pending = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.present)
+
+    def setMaxFramesPerSecond(self, maxFramesPerSecond):
+        "Cap presented frames per second, None for no cap"
+        if maxFramesPerSecond:
+            self.minInterval = int(1000.0 / maxFramesPerSecond)
+        else:
+            self.minInterval = 0
+
+    def requestFrame(self):
+        "Ask for a frame, requests before it is presented are merged"
+        self.requests += 1
+        if self.pending:
+            return
+        self.pending = True
+        wait = 0
+        if self.minInterval and self.lastFrame is not None:
+            sinceLast = (self.clock.nsecsElapsed() - self.lastFrame) // 1000000
+            wait = max(0, self.minInterval - sinceLast)
+        # a zero timer fires after queued input events are handled
+        self.timer.start(wait)
+
+    def present(self):
+        "timer slot"
+        self.pending = False
+        self.render()
+
+    def beginFrame(self):
+        "Start a frame and return seconds since the previous one"
+        now = self.clock.nsecsElapsed()
+        if self.lastFrame is None:
+            deltaTime = 0.0
+        else:
+            deltaTime = (now - self.lastFrame) / 1e9
+        self.lastFrame = now
+        self.deltaTime = min(deltaTime, self.maxDeltaTime)
+        self.accumulator = min(self.accumulator + self.deltaTime,
+                               self.maxDeltaTime)
+        self.frames += 1
+        return self.deltaTime
+
+    def takeFixedSteps(self):
+        "Number of fixed steps elapsed, the remainder is kept for later"
+        steps = int(self.accumulator // self.fixedStep)
+        self.accumulator -= steps * self.fixedStep
+        return steps
+
+    def stats(self):
+        "presented frames and frame requests"
+        return {"frames": self.frames, "requests": self.requests}
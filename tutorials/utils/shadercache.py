@@ -0,0 +1,204 @@
+# author: Kaan Eraslan
+# on disk cache of linked shader program binaries
+
+import ctypes
+import hashlib
+import os
+import struct
+
+from PySide2.QtGui import QOpenGLShader
+from PySide2.QtGui import QOpenGLShaderProgram
+
+from OpenGL import GL as pygl
+from OpenGL import error as glerror
+
+
+SHADER_TYPES = {
+    "vertex": QOpenGLShader.Vertex,
+    "fragment": QOpenGLShader.Fragment,
+}
+
+# magic, binary format, binary size
+HEADER = struct.Struct("<4sII")
+MAGIC = b"GLPB"
+
+
+def defaultCacheDir():
+    "cache folder, can be changed with TUTORIALS_SHADER_CACHE"
+    return os.environ.get(
+        "TUTORIALS_SHADER_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache",
+                     "pyside-opengl-tutorials", "shaders")
+    )
+
+
+class ShaderCache:
+    """
+    Linked shader programs stored on disk with glGetProgramBinary.
+
+    An entry is keyed by the hash of the shader sources, attribute
+    locations and the driver information string. A driver update changes
+    the key, and a binary that the driver refuses anyway is treated as
+    stale: the program is compiled from sources and the entry rewritten.
+    """
+
+    def __init__(self, cacheDir=None):
+        self.cacheDir = defaultCacheDir() if cacheDir is None else cacheDir
+        self.binarySupported = True
+        self.hits = 0
+        self.misses = 0
+
+    def programKey(self, sources: dict, attrLocs: dict, glInfo: str):
+        "hash of everything that goes into a linked program"
+        sha = hashlib.sha256()
+        for shaderType in sorted(sources.keys()):
+            sha.update(shaderType.encode("utf-8"))
+            sha.update(sources[shaderType])
+        for name in sorted(attrLocs.keys()):
+            sha.update("{0}={1};".format(name, attrLocs[name]).encode("utf-8"))
+        sha.update(glInfo.encode("utf-8"))
+        return sha.hexdigest()
+
+    def entryPath(self, key: str):
+        return os.path.join(self.cacheDir, key + ".bin")
+
+    def removeEntry(self, key: str):
+        "remove a stale entry"
+        try:
+            os.remove(self.entryPath(key))
+        except OSError:
+            pass
+
+    def loadProgram(self,
+                    context,
+                    shaderPaths: dict,
+                    attrLocs: dict,
+                    glInfo: str):
+        """
+        Get a linked program for shaders like {"vertex": path, ...}.
+
+        The context should be current
+        """
+        sources = {}
+        for shaderType, path in shaderPaths.items():
+            with open(path, "rb") as f:
+                sources[shaderType] = f.read()
+        key = self.programKey(sources, attrLocs, glInfo)
+        program = QOpenGLShaderProgram(context)
+        program.create()
+        if self.loadBinary(program, key):
+            self.hits += 1
+            return program
+        self.misses += 1
+        self.compileProgram(program, sources, shaderPaths, attrLocs)
+        self.saveBinary(program, key)
+        return program
+
+    def compileProgram(self,
+                       program: QOpenGLShaderProgram,
+                       sources: dict,
+                       shaderPaths: dict,
+                       attrLocs: dict):
+        "compile and link program from sources"
+        for shaderType, source in sources.items():
+            isCompiled = program.addShaderFromSourceCode(
+                SHADER_TYPES[shaderType], source)
+            if isCompiled is False:
+                print(program.log())
+                raise ValueError(
+                    "{0} shader {1} is not compiled".format(
+                        shaderType, shaderPaths[shaderType]
+                    )
+                )
+        for name, location in attrLocs.items():
+            program.bindAttributeLocation(name, location)
+        if self.binarySupported:
+            try:
+                pygl.glProgramParameteri(
+                    program.programId(),
+                    pygl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT,
+                    pygl.GL_TRUE)
+            except (glerror.NullFunctionError, glerror.GLError):
+                self.binarySupported = False
+        if program.link() is False:
+            print(program.log())
+            raise ValueError(
+                "program of {0} is not linked".format(
+                    list(shaderPaths.values())
+                )
+            )
+
+    def loadBinary(self, program: QOpenGLShaderProgram, key: str):
+        "Load a cached binary into program, returns False on a miss"
+        if not self.binarySupported:
+            return False
+        path = self.entryPath(key)
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            self.removeEntry(key)
+            return False
+        magic, binaryFormat, size = HEADER.unpack_from(data)
+        if magic != MAGIC or size != len(data) - HEADER.size:
+            self.removeEntry(key)
+            return False
+        binary = (ctypes.c_ubyte * size).from_buffer_copy(data, HEADER.size)
+        try:
+            pygl.glProgramBinary(program.programId(), binaryFormat,
+                                 binary, size)
+        except glerror.NullFunctionError:
+            self.binarySupported = False
+            return False
+        except glerror.GLError:
+            self.removeEntry(key)
+            return False
+        # without attached shaders link only checks the link status
+        # of the uploaded binary
+        if program.link() is False:
+            self.removeEntry(key)
+            return False
+        return True
+
+    def saveBinary(self, program: QOpenGLShaderProgram, key: str):
+        "Store linked program binary on disk"
+        if not self.binarySupported:
+            return False
+        programId = program.programId()
+        try:
+            size = int(pygl.glGetProgramiv(programId,
+                                           pygl.GL_PROGRAM_BINARY_LENGTH))
+            if size <= 0:
+                return False
+            binary = (ctypes.c_ubyte * size)()
+            written = ctypes.c_int(0)
+            binaryFormat = ctypes.c_uint(0)
+            pygl.glGetProgramBinary(programId, size,
+                                    ctypes.byref(written),
+                                    ctypes.byref(binaryFormat),
+                                    binary)
+        except glerror.NullFunctionError:
+            self.binarySupported = False
+            return False
+        except glerror.GLError:
+            return False
+        os.makedirs(self.cacheDir, exist_ok=True)
+        path = self.entryPath(key)
+        tmpPath = path + ".tmp"
+        with open(tmpPath, "wb") as f:
+            f.write(HEADER.pack(MAGIC, binaryFormat.value, written.value))
+            f.write(bytes(binary)[:written.value])
+        os.replace(tmpPath, path)
+        return True
+
+
+_sharedCache = None
+
+
+def sharedShaderCache():
+    "Shader cache shared by all widgets"
+    global _sharedCache
+    if _sharedCache is None:
+        _sharedCache = ShaderCache()
+    return _sharedCache
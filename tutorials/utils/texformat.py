@@ -0,0 +1,176 @@
+# author: Kaan Eraslan
+# gpu ready texture files read with memory mapping
+#
+# Usage from the folder containing setup.py:
+#
+#   python -m tutorials.utils.texformat tutorials/media/images
+#
+# Every image of the folder gets a .gltex file next to it. Texture loading
+# uses the .gltex file when it is newer than its image and decodes the
+# image otherwise.
+#
+# Layout, little endian:
+#
+#   magic     4 bytes   b"GLTX"
+#   version   uint16
+#   format    uint16    1 for RGBA8
+#   width     uint32
+#   height    uint32
+#   levels    uint32    number of mip levels
+#   filter    16 bytes  ascii name of the mip filter, zero padded
+#   offsets   levels * uint64, byte offset of each level from file start
+#
+# Level data is tightly packed rows, bottom row first, aligned to 16 bytes.
+
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+from PySide2.QtGui import QImage
+
+from tutorials.utils.mipmaps import buildMipChain
+from tutorials.utils.mipmaps import imageArray
+from tutorials.utils.mipmaps import mipLevelCount
+
+
+MAGIC = b"GLTX"
+VERSION = 1
+FORMAT_RGBA8 = 1
+HEADER = struct.Struct("<4sHHIII16s")
+OFFSET = struct.Struct("<Q")
+ALIGNMENT = 16
+EXTENSION = ".gltex"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tga")
+
+
+def texturePath(imagePath: str):
+    "gltex file of an image"
+    return os.path.splitext(imagePath)[0] + EXTENSION
+
+
+def align(offset: int):
+    "next aligned offset"
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def writeTexture(path: str, levels: list, filterName: str):
+    "Write mip levels of (H, W, 4) uint8 arrays, already flipped"
+    height, width = levels[0].shape[:2]
+    header = HEADER.pack(MAGIC, VERSION, FORMAT_RGBA8, width, height,
+                         len(levels), filterName.encode("ascii"))
+    offset = align(len(header) + OFFSET.size * len(levels))
+    offsets = []
+    for pixels in levels:
+        offsets.append(offset)
+        offset = align(offset + pixels.nbytes)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+        for offset, pixels in zip(offsets, levels):
+            f.seek(offset)
+            # written through the buffer protocol, no bytes copy
+            f.write(np.ascontiguousarray(pixels, dtype=np.uint8).data)
+        # trailing padding of the last level
+        f.truncate(align(f.tell()))
+    os.replace(temporary, path)
+
+
+def readTexture(path: str):
+    """
+    Mip levels of a gltex file and the filter that built them.
+
+    Levels are read only views of a single memory map, nothing is read
+    before the upload touches the pages
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if data.size < HEADER.size:
+        raise ValueError("Truncated texture file {0}".format(path))
+    (magic, version, texelFormat, width, height, levelCount,
+     filterName) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a gltex file {0}".format(path))
+    if texelFormat != FORMAT_RGBA8:
+        raise ValueError(
+            "Unsupported texel format {0} in {1}".format(texelFormat, path))
+    if levelCount != mipLevelCount(width, height) and levelCount != 1:
+        raise ValueError("Wrong level count in {0}".format(path))
+    offsets = np.frombuffer(data, dtype="<u8", count=levelCount,
+                            offset=HEADER.size)
+    levels = []
+    for level in range(levelCount):
+        levelWidth = max(1, width >> level)
+        levelHeight = max(1, height >> level)
+        start = int(offsets[level])
+        end = start + levelWidth * levelHeight * 4
+        if end > data.size:
+            raise ValueError("Truncated texture file {0}".format(path))
+        levels.append(data[start:end].reshape(levelHeight, levelWidth, 4))
+    return levels, filterName.rstrip(b"\0").decode("ascii")
+
+
+def loadTexture(imagePath: str, filterName=None):
+    """
+    Levels of an image from its gltex file or None.
+
+    None is returned if there is no up to date file or if it was built
+    with another mip filter. Without filterName only level 0 is returned
+    """
+    path = texturePath(imagePath)
+    try:
+        if os.stat(path).st_mtime_ns < os.stat(imagePath).st_mtime_ns:
+            return None
+        levels, builtWith = readTexture(path)
+    except (OSError, ValueError):
+        return None
+    if filterName is None:
+        return levels[:1]
+    if builtWith != filterName or len(levels) == 1:
+        return None
+    return levels
+
+
+def convertImage(imagePath: str, filterName="lanczos"):
+    "Write the gltex file of an image and return its path"
+    image = QImage(imagePath)
+    if image.isNull():
+        raise ValueError("Could not load image {0}".format(imagePath))
+    # flipped for opengl texture coordinates
+    levels = buildMipChain(imageArray(image.mirrored()), filterName)
+    path = texturePath(imagePath)
+    writeTexture(path, levels, filterName)
+    return path
+
+
+def parseArguments(argv: list):
+    "parse converter arguments"
+    parser = argparse.ArgumentParser(
+        description="Convert images to memory mappable gltex files")
+    parser.add_argument("paths", nargs="+",
+                        help="images or folders of images")
+    parser.add_argument("--filter", default="lanczos",
+                        choices=["box", "lanczos"])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
+    imagePaths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            imagePaths.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            imagePaths.append(path)
+    for imagePath in imagePaths:
+        print(convertImage(imagePath, args.filter))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
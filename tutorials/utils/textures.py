@@ -0,0 +1,288 @@
+# author: Kaan Eraslan
+# textures shared between widgets and contexts
+
+import os
+from collections import OrderedDict
+
+from PySide2.QtGui import QColor
+from PySide2.QtGui import QImage
+from PySide2.QtGui import QOpenGLContext
+from PySide2.QtGui import QOpenGLTexture
+
+from tutorials.utils.assets import decodeTexture
+from tutorials.utils.mipmaps import uploadMipChain
+
+
+# minification filters sampling mip levels
+MIPMAP_FILTERS = {
+    int(QOpenGLTexture.NearestMipMapNearest),
+    int(QOpenGLTexture.NearestMipMapLinear),
+    int(QOpenGLTexture.LinearMipMapNearest),
+    int(QOpenGLTexture.LinearMipMapLinear),
+}
+
+
+def defaultBudget():
+    "gpu memory budget in bytes, can be changed with TUTORIALS_TEXTURE_BUDGET"
+    return int(os.environ.get("TUTORIALS_TEXTURE_BUDGET", 256 * 1024 * 1024))
+
+
+def placeholderImage():
+    "a single grey pixel shown until the real image is uploaded"
+    image = QImage(1, 1, QImage.Format_RGBA8888)
+    image.fill(QColor(128, 128, 128, 255))
+    return image
+
+
+def textureBytes(texture: QOpenGLTexture, bytesPerPixel=4):
+    "Bytes used by all mipmap levels of a 2d texture"
+    width = texture.width()
+    height = texture.height()
+    total = 0
+    for level in range(max(1, texture.mipLevels())):
+        total += (max(1, width >> level) *
+                  max(1, height >> level) *
+                  bytesPerPixel)
+    return total
+
+
+class TextureEntry:
+    "a texture with its reference count"
+
+    def __init__(self, key: tuple, texture: QOpenGLTexture, size: int):
+        self.key = key
+        self.texture = texture
+        self.size = size
+        self.refCount = 0
+        # placeholder data until the decoded image is uploaded
+        self.pending = False
+
+
+class TextureManager:
+    """
+    Registry of textures keyed by image path and sampler settings.
+
+    Contexts that share resources belong to the same share group and get
+    the same texture objects, each group has its own registry. A texture
+    is kept after its last release so that it can be acquired again
+    without decoding and uploading, unreferenced textures are destroyed
+    least recently used first when the resident bytes of a group exceed
+    the budget. acquire and release should be called with a context of
+    the group current, in initializeGL or cleanUpGl for example.
+
+    With an AssetLoader images are decoded on worker threads. acquire then
+    returns at once with a texture holding a placeholder pixel and
+    uploadPending replaces placeholders with decoded images on the gl
+    thread, at the start of paintGL for example.
+
+    Textures with a mipmap minification filter get a mip chain built with
+    mipFilter and cached on disk, Qt does not generate mipmaps at upload.
+
+    An upload destroys and recreates the texture object, which may get
+    back the name of another texture. generation counts uploads, texture
+    bindings cached before it changed should be forgotten.
+    """
+
+    def __init__(self, budget=None, mipFilter="lanczos"):
+        self.budget = defaultBudget() if budget is None else budget
+        self.mipFilter = mipFilter
+        # share group: OrderedDict of key: TextureEntry, oldest first
+        self.groups = {}
+        # python id of texture: (share group, key)
+        self.owners = {}
+        # textures showing a placeholder in all groups
+        self.pendingTotal = 0
+        # number of uploads, texture names may have changed since
+        self.generation = 0
+
+    def currentGroup(self):
+        "share group of the current context"
+        context = QOpenGLContext.currentContext()
+        if context is None:
+            raise RuntimeError("Textures need a current opengl context")
+        group = context.shareGroup()
+        if group not in self.groups:
+            self.groups[group] = OrderedDict()
+            # textures die with the last context of the group
+            group.destroyed.connect(lambda: self.forgetGroup(group))
+        return group
+
+    def forgetGroup(self, group):
+        "drop entries of a destroyed share group"
+        entries = self.groups.pop(group, OrderedDict())
+        for entry in entries.values():
+            self.owners.pop(id(entry.texture), None)
+            self.pendingTotal -= entry.pending
+
+    def makeKey(self, path: str, minFilter, magFilter, wrapMode):
+        "registry key of a texture"
+        return (os.path.realpath(path),
+                int(minFilter), int(magFilter), int(wrapMode))
+
+    def mipFilterOf(self, key: tuple):
+        "filter building the mip chain of a texture, None without mipmaps"
+        if key[1] in MIPMAP_FILTERS:
+            return self.mipFilter
+        return None
+
+    def decode(self, key: tuple):
+        "image or mip chain of a texture decoded on this thread"
+        return decodeTexture(key[0], self.mipFilterOf(key))
+
+    def uploadImage(self, texture: QOpenGLTexture, image, key: tuple):
+        """
+        (re)specify texture storage and sampler settings.
+
+        image is a QImage or a list of mip levels, possibly memory mapped
+        """
+        path, minFilter, magFilter, wrapMode = key
+        if texture.isStorageAllocated():
+            # storage size can not change, start over with a new object
+            texture.destroy()
+        texture.create()
+        self.generation += 1
+        if isinstance(image, QImage):
+            # a single pixel placeholder is a complete mip chain
+            texture.setData(image, QOpenGLTexture.DontGenerateMipMaps)
+        else:
+            uploadMipChain(texture, image)
+        texture.setMinMagFilters(QOpenGLTexture.Filter(minFilter),
+                                 QOpenGLTexture.Filter(magFilter))
+        texture.setWrapMode(QOpenGLTexture.DirectionS,
+                            QOpenGLTexture.WrapMode(wrapMode))
+        texture.setWrapMode(QOpenGLTexture.DirectionT,
+                            QOpenGLTexture.WrapMode(wrapMode))
+
+    def acquire(self, path: str,
+                minFilter=QOpenGLTexture.Linear,
+                magFilter=QOpenGLTexture.Linear,
+                wrapMode=QOpenGLTexture.Repeat,
+                loader=None):
+        """
+        Texture of an image, loaded only if the share group has none yet.
+
+        Without a loader the image is decoded here, with one the texture
+        holds a placeholder until the image is decoded and uploadPending
+        is called
+        """
+        group = self.currentGroup()
+        entries = self.groups[group]
+        key = self.makeKey(path, minFilter, magFilter, wrapMode)
+        entry = entries.get(key)
+        if entry is None:
+            texture = QOpenGLTexture(QOpenGLTexture.Target2D)
+            entry = TextureEntry(key, texture, 0)
+            mipFilter = self.mipFilterOf(key)
+            if loader is None:
+                self.uploadImage(texture, self.decode(key), key)
+            elif loader.isReady(path, mipFilter):
+                self.uploadImage(texture, loader.image(path, mipFilter), key)
+                self.forgetDecoded(loader, key)
+            else:
+                loader.request(path, mipFilter)
+                self.uploadImage(texture, placeholderImage(), key)
+                entry.pending = True
+                self.pendingTotal += 1
+            entry.size = textureBytes(texture)
+            entries[key] = entry
+            self.owners[id(texture)] = (group, key)
+        entry.refCount += 1
+        entries.move_to_end(key)
+        self.evict(group)
+        return entry.texture
+
+    def uploadPending(self, loader):
+        """
+        Upload decoded images of the current share group.
+
+        Returns the number of textures that got their real image
+        """
+        if self.pendingTotal == 0:
+            return 0
+        group = self.currentGroup()
+        uploaded = 0
+        doneKeys = []
+        for entry in self.groups[group].values():
+            path = entry.key[0]
+            mipFilter = self.mipFilterOf(entry.key)
+            if not entry.pending or not loader.isReady(path, mipFilter):
+                continue
+            entry.pending = False
+            self.pendingTotal -= 1
+            # the same image may be used with other sampler settings
+            doneKeys.append(entry.key)
+            try:
+                image = loader.image(path, mipFilter)
+            except (OSError, ValueError) as error:
+                # keep the placeholder
+                print(error)
+                continue
+            self.uploadImage(entry.texture, image, entry.key)
+            entry.size = textureBytes(entry.texture)
+            uploaded += 1
+        for key in doneKeys:
+            self.forgetDecoded(loader, key)
+        if uploaded:
+            self.evict(group)
+        return uploaded
+
+    def forgetDecoded(self, loader, key: tuple):
+        "free a decoded image unless a texture still waits for it"
+        mipFilter = self.mipFilterOf(key)
+        for entries in self.groups.values():
+            for entry in entries.values():
+                if (entry.pending and entry.key[0] == key[0] and
+                        self.mipFilterOf(entry.key) == mipFilter):
+                    return
+        loader.forget(key[0], mipFilter)
+
+    def release(self, texture: QOpenGLTexture):
+        "Give back a texture, it stays resident while the budget allows"
+        owner = self.owners.get(id(texture))
+        if owner is None:
+            return
+        group, key = owner
+        entries = self.groups[group]
+        entry = entries[key]
+        entry.refCount = max(0, entry.refCount - 1)
+        entries.move_to_end(key)
+        self.evict(group)
+
+    def evict(self, group):
+        "Destroy unreferenced textures until the group is within budget"
+        entries = self.groups[group]
+        total = sum(entry.size for entry in entries.values())
+        for key in list(entries.keys()):
+            if total <= self.budget:
+                break
+            entry = entries[key]
+            if entry.refCount > 0:
+                continue
+            entry.texture.destroy()
+            total -= entry.size
+            self.pendingTotal -= entry.pending
+            del entries[key]
+            self.owners.pop(id(entry.texture), None)
+
+    def residentBytes(self):
+        "bytes of each resident texture keyed by path and sampler settings"
+        return {key: entry.size
+                for entries in self.groups.values()
+                for key, entry in entries.items()}
+
+    def totalBytes(self):
+        "bytes of all resident textures"
+        return sum(entry.size
+                   for entries in self.groups.values()
+                   for entry in entries.values())
+
+
+_sharedManager = None
+
+
+def sharedTextureManager():
+    "Texture manager shared by all widgets"
+    global _sharedManager
+    if _sharedManager is None:
+        _sharedManager = TextureManager()
+    return _sharedManager
@@ -0,0 +1,190 @@
+# author: Kaan Eraslan
+# batched transformation matrices
+# every function here works on N inputs at once and returns contiguous
+# (N, 4, 4) float32 arrays in the same row major convention as
+# computeLookAtMatrixNp and computePerspectiveNp of utils.py
+# use toColumnMajor before sending the matrices to opengl
+
+import numpy as np
+
+
+def asBatch(arr, width: int):
+    "Make a (N, width) float32 array out of a single vector or a batch"
+    arr = np.asarray(arr, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    if arr.ndim != 2 or arr.shape[1] != width:
+        raise ValueError(
+            "Expected an array of shape (N, {0}) got {1}".format(
+                width, arr.shape
+            )
+        )
+    return arr
+
+
+def asScalarBatch(arr, size: int):
+    "Make a (size,) float32 array out of a scalar or a batch"
+    arr = np.asarray(arr, dtype=np.float32).reshape(-1)
+    if arr.size == 1:
+        arr = np.repeat(arr, size)
+    if arr.size != size:
+        raise ValueError(
+            "Expected {0} values got {1}".format(size, arr.size)
+        )
+    return arr
+
+
+def identityMatrices(size: int):
+    "Create a batch of identity matrices"
+    mats = np.zeros((size, 4, 4), dtype=np.float32)
+    mats[:, 0, 0] = 1.0
+    mats[:, 1, 1] = 1.0
+    mats[:, 2, 2] = 1.0
+    mats[:, 3, 3] = 1.0
+    return mats
+
+
+def normalizeVectors(vecs: np.ndarray):
+    "Normalize each row of a (N, k) array, zero rows are left as is"
+    norms = np.sqrt(np.einsum("ij,ij->i", vecs, vecs))
+    norms[norms == 0] = 1.0
+    return vecs / norms[:, np.newaxis]
+
+
+def translateMatrices(translations):
+    "Translation matrices from (N, 3) translation vectors"
+    translations = asBatch(translations, 3)
+    mats = identityMatrices(translations.shape[0])
+    mats[:, :3, 3] = translations
+    return mats
+
+
+def scaleMatrices(scales):
+    """
+    Scale matrices from (N, 3) scale factors or (N,) uniform factors.
+
+    A single array of 3 values is read as one scale vector
+    """
+    scales = np.asarray(scales, dtype=np.float32)
+    if scales.ndim <= 1 and (scales.ndim == 0 or scales.shape[0] != 3):
+        scales = np.repeat(scales.reshape(-1, 1), 3, axis=1)
+    scales = asBatch(scales, 3)
+    mats = identityMatrices(scales.shape[0])
+    mats[:, 0, 0] = scales[:, 0]
+    mats[:, 1, 1] = scales[:, 1]
+    mats[:, 2, 2] = scales[:, 2]
+    return mats
+
+
+def rotateMatrices(angles, axes):
+    """
+    Rotation matrices around axes with angles in degrees.
+
+    Reproduces QMatrix4x4.rotate(angle, vector): the axis is normalized and
+    the rotation is counter clockwise
+    """
+    axes = asBatch(axes, 3)
+    size = max(axes.shape[0], np.asarray(angles).size)
+    angles = asScalarBatch(angles, size)
+    if axes.shape[0] != size:
+        axes = np.repeat(axes, size, axis=0)
+    axes = normalizeVectors(axes)
+    radians = np.radians(angles)
+    c = np.cos(radians)
+    s = np.sin(radians)
+    ic = 1.0 - c
+    x = axes[:, 0]
+    y = axes[:, 1]
+    z = axes[:, 2]
+    mats = identityMatrices(size)
+    mats[:, 0, 0] = x * x * ic + c
+    mats[:, 0, 1] = x * y * ic - z * s
+    mats[:, 0, 2] = x * z * ic + y * s
+    mats[:, 1, 0] = y * x * ic + z * s
+    mats[:, 1, 1] = y * y * ic + c
+    mats[:, 1, 2] = y * z * ic - x * s
+    mats[:, 2, 0] = z * x * ic - y * s
+    mats[:, 2, 1] = z * y * ic + x * s
+    mats[:, 2, 2] = z * z * ic + c
+    return mats
+
+
+def lookAtMatrices(positions, targets, worldUps):
+    "Batched computeLookAtMatrixNp"
+    positions = asBatch(positions, 3)
+    targets = asBatch(targets, 3)
+    worldUps = asBatch(worldUps, 3)
+    size = max(positions.shape[0], targets.shape[0], worldUps.shape[0])
+    positions = np.broadcast_to(positions, (size, 3))
+    targets = np.broadcast_to(targets, (size, 3))
+    worldUps = np.broadcast_to(worldUps, (size, 3))
+    zaxis = normalizeVectors(positions - targets)
+    # positive xaxis at right
+    xaxis = normalizeVectors(np.cross(normalizeVectors(worldUps), zaxis))
+    # camera up
+    yaxis = np.cross(zaxis, xaxis)
+    mats = identityMatrices(size)
+    mats[:, 0, :3] = xaxis
+    mats[:, 1, :3] = yaxis
+    mats[:, 2, :3] = zaxis
+    mats[:, 0, 3] = -np.einsum("ij,ij->i", xaxis, positions)
+    mats[:, 1, 3] = -np.einsum("ij,ij->i", yaxis, positions)
+    mats[:, 2, 3] = -np.einsum("ij,ij->i", zaxis, positions)
+    return mats
+
+
+def perspectiveMatrices(fieldOfViews, aspects, zNears, zFars):
+    "Batched computePerspectiveNp, field of views are in degrees"
+    size = max(np.asarray(v).size
+               for v in (fieldOfViews, aspects, zNears, zFars))
+    fieldOfViews = asScalarBatch(fieldOfViews, size)
+    aspects = asScalarBatch(aspects, size)
+    zNears = asScalarBatch(zNears, size)
+    zFars = asScalarBatch(zFars, size)
+    assert np.all(aspects != 0)
+    assert np.all(zNears != zFars)
+    fieldHalfTan = np.tan(np.radians(fieldOfViews) / 2)
+    depth = zFars - zNears
+    mats = np.zeros((size, 4, 4), dtype=np.float32)
+    mats[:, 0, 0] = 1 / (aspects * fieldHalfTan)
+    mats[:, 1, 1] = 1 / fieldHalfTan
+    mats[:, 2, 2] = -(zFars + zNears) / depth
+    mats[:, 3, 2] = -1
+    mats[:, 2, 3] = -(2 * zFars * zNears) / depth
+    return mats
+
+
+def batchMatMul(mats1: np.ndarray, mats2: np.ndarray, out=None):
+    "Multiply two batches of matrices, a single matrix is broadcasted"
+    mats1 = np.asarray(mats1, dtype=np.float32)
+    mats2 = np.asarray(mats2, dtype=np.float32)
+    return np.matmul(mats1, mats2, out=out)
+
+
+def batchInverse(mats: np.ndarray):
+    "Invert a batch of matrices"
+    mats = np.asarray(mats, dtype=np.float32)
+    return np.ascontiguousarray(np.linalg.inv(mats), dtype=np.float32)
+
+
+def affineInverse(mats: np.ndarray):
+    """
+    Invert a batch of affine matrices (last row is 0, 0, 0, 1).
+
+    Cheaper than batchInverse for model and view matrices since only
+    the upper 3x3 block needs a real inversion
+    """
+    mats = np.asarray(mats, dtype=np.float32)
+    if mats.ndim == 2:
+        mats = mats[np.newaxis]
+    linear = np.linalg.inv(mats[:, :3, :3])
+    result = identityMatrices(mats.shape[0])
+    result[:, :3, :3] = linear
+    result[:, :3, 3] = -np.einsum("nij,nj->ni", linear, mats[:, :3, 3])
+    return result
+
+
+def toColumnMajor(mats: np.ndarray):
+    "Contiguous column major copy of a batch of matrices for opengl"
+    mats = np.asarray(mats, dtype=np.float32)
+    return np.ascontiguousarray(np.swapaxes(mats, -1, -2))
@@ -0,0 +1,85 @@
+# author: Kaan Eraslan
+# uniform location and value cache of a shader program
+
+from OpenGL import GL as pygl
+
+
+IMMUTABLE_TYPES = (bool, int, float)
+
+
+class UniformCache:
+    """
+    Uniform locations resolved once and last uploaded values of a program.
+
+    Locations of all active uniforms are queried right after link, so that
+    setting a value does not look the name up in the driver. A value of
+    the same type and equal to the last one uploaded to a location is not
+    uploaded again. Uniform values are program state, they stay as long
+    as the program is alive.
+    """
+
+    def __init__(self, program):
+        self.program = program
+        self.locations = {}
+        self.values = {}
+        self.uploads = 0
+        self.avoided = 0
+        self.resolve()
+
+    def resolve(self):
+        "Query locations of active uniforms, the program should be linked"
+        programId = self.program.programId()
+        count = int(pygl.glGetProgramiv(programId, pygl.GL_ACTIVE_UNIFORMS))
+        self.locations = {}
+        for index in range(count):
+            name = pygl.glGetActiveUniform(programId, index)[0]
+            if isinstance(name, bytes):
+                name = name.decode("utf-8")
+            # arrays are reported as name[0]
+            if name.endswith("[0]"):
+                name = name[:-3]
+            self.locations[name] = self.program.uniformLocation(name)
+        self.values = {}
+
+    def invalidate(self):
+        "Forget uploaded values, after the program was changed elsewhere"
+        self.values = {}
+
+    def beginFrame(self):
+        "reset per frame counters"
+        self.uploads = 0
+        self.avoided = 0
+
+    def stats(self):
+        "uploads and avoided uploads since beginFrame"
+        return {"uploads": self.uploads, "avoided": self.avoided}
+
+    def location(self, name: str):
+        "location of a uniform, -1 if it is not active"
+        return self.locations.get(name, -1)
+
+    def setUniformValue(self, name: str, value):
+        """
+        Upload value unless it is the last one uploaded.
+
+        The program should be bound. Returns True if value is uploaded
+        """
+        location = self.locations.get(name, -1)
+        if location == -1:
+            # inactive uniform, opengl ignores it anyway
+            return False
+        last = self.values.get(location)
+        # True == 1 == 1.0 but they go through different setUniformValue
+        # overloads, a value of another type is uploaded
+        if (last is not None and type(last) is type(value) and
+                last == value):
+            self.avoided += 1
+            return False
+        self.program.setUniformValue(location, value)
+        if isinstance(value, IMMUTABLE_TYPES):
+            self.values[location] = value
+        else:
+            # QMatrix4x4, QVector3D etc. can change in place, keep a copy
+            self.values[location] = type(value)(value)
+        self.uploads += 1
+        return True
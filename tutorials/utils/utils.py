@@ -25,7 +25,8 @@ def normalize_tuple(vec: tuple):
     if vecSum == 0:
         return vec
     else:
-        return tuple([v/vecSum for v in vec])
+        vecNorm = vecSum ** 0.5
+        return tuple([v / vecNorm for v in vec])
 
 
 def crossProduct(vec1, vec2):
@@ -40,15 +41,13 @@ def crossProduct(vec1, vec2):
 def vec2vecDot(vec1, vec2):
     "vector to vector dot product"
     assert len(vec1) == len(vec2)
-    return tuple(
-        sum(v1*v2 for v1, v2 in zip(vec1, vec2))
-    )
+    return sum(v1*v2 for v1, v2 in zip(vec1, vec2))
 
 
 def sliceCol(colInd: int, matrix):
     "slice column values from matrix"
     rownb = len(matrix)
-    return [matrix[i, colInd] for i in range(rownb)]
+    return [matrix[i][colInd] for i in range(rownb)]
 
 
 def mat2matDot(mat1: list, mat2: list):
@@ -89,12 +88,6 @@ def vec2vecSubs(vec1, vec2):
     )
 
 
-def computeLookAtPure(pos: tuple,
-                      center: tuple,
-                      up: tuple):
-    ""
-
-
 def computePerspectiveNp(fieldOfView: float,
                          aspect: float,
                          zNear: float, zFar: float):
@@ -137,14 +130,14 @@ def computeLookAtPure(pos: tuple,
                                          zaxis))
     yaxis = crossProduct(zaxis, xaxis)
     translation = [
-        [1 for i in range(4)] for k in range(4)
+        [float(i == k) for i in range(4)] for k in range(4)
     ]
     translation[0][3] = -pos[0]
     translation[1][3] = -pos[1]  # third col, second row
     translation[2][3] = -pos[2]
 
     rotation = [
-        [1 for i in range(4)] for k in range(4)
+        [float(i == k) for i in range(4)] for k in range(4)
     ]
     rotation[0][0] = xaxis[0]
     rotation[0][1] = xaxis[1]
@@ -155,7 +148,8 @@ def computeLookAtPure(pos: tuple,
     rotation[2][0] = zaxis[0]
     rotation[2][1] = zaxis[1]
     rotation[2][2] = zaxis[2]
-    return mat2matDot(translation, rotation)
+    # translate to camera origin first then rotate
+    return mat2matDot(rotation, translation)
 
 
 def computeLookAtMatrixNp(position: np.ndarray,
@@ -173,13 +167,13 @@ def computeLookAtMatrixNp(position: np.ndarray,
     yaxis = np.cross(zaxis, xaxis)
 
     # compute translation matrix
-    translation = np.ones((4, 4), dtype=np.float)
+    translation = np.identity(4, dtype=float)
     translation[0, 3] = -position[0]  # third col, first row
     translation[1, 3] = -position[1]  # third col, second row
     translation[2, 3] = -position[2]
 
     # compute rotation matrix
-    rotation = np.ones((4, 4), dtype=np.float)
+    rotation = np.identity(4, dtype=float)
     rotation[0, 0] = xaxis[0]
     rotation[0, 1] = xaxis[1]
     rotation[0, 2] = xaxis[2]
@@ -190,7 +184,8 @@ def computeLookAtMatrixNp(position: np.ndarray,
     rotation[2, 1] = zaxis[1]
     rotation[2, 2] = zaxis[2]
 
-    return np.dot(translation, rotation)
+    # translate to camera origin first then rotate
+    return np.dot(rotation, translation)
 
 
 def computeLookAtMatrixQt(position: np.ndarray,
@@ -230,3 +225,25 @@ def arr2qmat(arr: np.ndarray):
         mat4.setRow(rowNb, rowvec)
     #
     return mat4
+
+
+def vecs2arr(vecs: list):
+    "convert a list of QVector3D to a (N, 3) float32 array"
+    arr = np.empty((len(vecs), 3), dtype=np.float32)
+    for i, vec in enumerate(vecs):
+        arr[i, 0] = vec.x()
+        arr[i, 1] = vec.y()
+        arr[i, 2] = vec.z()
+    return arr
+
+
+def qmat2arr(mat: QMatrix4x4):
+    "matrix 4x4 to a row major (4, 4) float32 array"
+    arr = np.empty((4, 4), dtype=np.float32)
+    for rowNb in range(4):
+        rowvec = mat.row(rowNb)
+        arr[rowNb, 0] = rowvec.x()
+        arr[rowNb, 1] = rowvec.y()
+        arr[rowNb, 2] = rowvec.z()
+        arr[rowNb, 3] = rowvec.w()
+    return arr
@@ -0,0 +1,178 @@
+# author: Kaan Eraslan
+# vertex formats described by structured numpy dtypes
+
+import numpy as np
+
+from PySide2.QtGui import QOpenGLVertexArrayObject
+from PySide2.shiboken2 import VoidPtr
+
+from OpenGL import GL as pygl
+
+
+GL_TYPES = {
+    np.dtype(np.float32): pygl.GL_FLOAT,
+    np.dtype(np.int8): pygl.GL_BYTE,
+    np.dtype(np.uint8): pygl.GL_UNSIGNED_BYTE,
+    np.dtype(np.int16): pygl.GL_SHORT,
+    np.dtype(np.uint16): pygl.GL_UNSIGNED_SHORT,
+    np.dtype(np.int32): pygl.GL_INT,
+    np.dtype(np.uint32): pygl.GL_UNSIGNED_INT,
+}
+
+
+class VertexAttribute:
+    "A single attribute pointer"
+
+    def __init__(self,
+                 name: str,
+                 location: int,
+                 size: int,
+                 glType: int,
+                 offset: int,
+                 normalized: bool):
+        self.name = name
+        self.location = location
+        self.size = size
+        self.glType = glType
+        self.offset = offset
+        self.normalized = normalized
+
+
+class VertexLayout:
+    """
+    Vertex format derived from a structured numpy dtype.
+
+    Every field of the dtype is an attribute of the shader, for example
+    [("aPos", np.float32, 3), ("aTexCoord", np.float32, 2)] gives an
+    interleaved layout with a stride of 5 floats. A (4, 4) field is a mat4
+    and takes 4 locations, one per column, so its data should be column
+    major. Locations follow the field order unless they are given.
+    """
+
+    def __init__(self,
+                 fields,
+                 locations=None,
+                 divisor=0,
+                 normalized=()):
+        self.dtype = np.dtype(fields)
+        if self.dtype.names is None:
+            raise ValueError("Vertex layout needs a structured dtype")
+        self.stride = self.dtype.itemsize
+        self.divisor = divisor
+        locations = {} if locations is None else locations
+        self.attributes = []
+        nextLocation = 0
+        for name in self.dtype.names:
+            fieldType, fieldOffset = self.dtype.fields[name][:2]
+            baseType = fieldType.base
+            shape = fieldType.shape if fieldType.shape else (1,)
+            if baseType not in GL_TYPES:
+                raise ValueError(
+                    "Unsupported type {0} of attribute {1}".format(
+                        baseType, name
+                    )
+                )
+            if len(shape) == 1:
+                columns, size = 1, shape[0]
+            elif len(shape) == 2:
+                columns, size = shape
+            else:
+                raise ValueError(
+                    "Attribute {0} has shape {1}".format(name, shape)
+                )
+            if size > 4:
+                raise ValueError(
+                    "Attribute {0} has {1} components, at most 4".format(
+                        name, size
+                    )
+                )
+            location = locations.get(name, nextLocation)
+            for column in range(columns):
+                self.attributes.append(
+                    VertexAttribute(
+                        name=name,
+                        location=location + column,
+                        size=size,
+                        glType=GL_TYPES[baseType],
+                        offset=fieldOffset + column * size * baseType.itemsize,
+                        normalized=name in normalized
+                    )
+                )
+            nextLocation = location + columns
+
+    def attributeLocations(self):
+        "first location of every attribute, to bind them in the program"
+        locations = {}
+        for attribute in self.attributes:
+            locations.setdefault(attribute.name, attribute.location)
+        return locations
+
+    def vertexCount(self, data: np.ndarray):
+        "number of vertices in structured or flat vertex data"
+        return data.nbytes // self.stride
+
+    def view(self, data: np.ndarray):
+        "structured view of flat vertex data"
+        return np.ascontiguousarray(data).view(self.dtype).reshape(-1)
+
+    def setupAttributes(self, funcs, baseOffset=0):
+        """
+        Enable and point attributes, the vertex buffer should be bound.
+
+        baseOffset is the byte offset of the first vertex in the buffer
+        """
+        for attribute in self.attributes:
+            funcs.glEnableVertexAttribArray(attribute.location)
+            funcs.glVertexAttribPointer(attribute.location,
+                                        attribute.size,
+                                        int(attribute.glType),
+                                        int(attribute.normalized),
+                                        self.stride,
+                                        VoidPtr(baseOffset +
+                                                attribute.offset))
+            if self.divisor:
+                pygl.glVertexAttribDivisor(attribute.location, self.divisor)
+
+
+class VertexArrayCache:
+    """
+    Vertex array objects built once per combination of layouts and buffers.
+
+    A binding is a (layout, QOpenGLBuffer) pair, a vao can take several of
+    them, for example per vertex and per instance data, and an index
+    buffer.
+    """
+
+    def __init__(self):
+        self.vertexArrays = {}
+
+    def key(self, bindings: list, indexBuffer=None):
+        key = tuple((id(layout), buffer.bufferId())
+                    for layout, buffer in bindings)
+        if indexBuffer is not None:
+            key += (indexBuffer.ebo.bufferId(),)
+        return key
+
+    def get(self, funcs, bindings: list, indexBuffer=None):
+        "Get or build the vao of bindings"
+        key = self.key(bindings, indexBuffer)
+        if key in self.vertexArrays:
+            return self.vertexArrays[key]
+        vao = QOpenGLVertexArrayObject()
+        vao.create()
+        vao.bind()
+        for layout, buffer in bindings:
+            buffer.bind()
+            layout.setupAttributes(funcs)
+            buffer.release()
+        if indexBuffer is not None:
+            indexBuffer.bind()
+        vao.release()
+        self.vertexArrays[key] = vao
+        return vao
+
+    def destroy(self):
+        "destroy all vaos"
+        for vao in self.vertexArrays.values():
+            vao.destroy()
+        self.vertexArrays = {}
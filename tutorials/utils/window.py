@@ -1,5 +1,6 @@
 # window for showing widgets
 from PySide2 import QtWidgets, QtCore, QtGui
+from tutorials.utils.profiler import profiledWidget
 
 
 def createSlider():
@@ -24,6 +25,10 @@ class GLWindow(QtWidgets.QMainWindow):
         #
         self.glLayout = QtWidgets.QVBoxLayout()
         self.glLabel = QtWidgets.QLabel("OpenGL Widget")
+        # time initializeGL and paintGL, results are written on close
+        self.profile = "--profile" in QtCore.QCoreApplication.arguments()
+        if self.profile:
+            glwidget = profiledWidget(glwidget)
         self.glWidget = glwidget()
         self.glLayout.addWidget(self.glLabel)
         self.glLayout.addWidget(self.glWidget)
@@ -120,6 +125,15 @@ class GLWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("PySide2 OpenGL Test Window")
         self.setMinimumSize(800, 600)
 
+    def closeEvent(self, event):
+        if self.profile:
+            profiler = self.glWidget.profiler
+            for name, stats in profiler.stats().items():
+                print(name, stats)
+            profiler.exportCsv("profile.csv")
+            profiler.exportChromeTrace("profile.trace.json")
+        super().closeEvent(event)
+
     def keyPressEvent(self, event):
         if event.key() == QtCore.Qt.Key_Escape:
             self.close()